@@ -3,11 +3,94 @@ import numpy as np
 from typing import Dict, Tuple
 import logging
 
+from ai.indicators import IncrementalIndicators
+from utils.metrics import REGISTRY, PHASE_BUCKETS
+from utils.models import Recommendation, CandleBuffer
+
+# Коды действий в батч-анализе
+ACTION_HOLD, ACTION_BUY, ACTION_SELL = 0, 1, -1
+ACTION_NAMES = {ACTION_HOLD: 'HOLD', ACTION_BUY: 'BUY', ACTION_SELL: 'SELL'}
+
+# Фазы цикла анализа (общее семейство с main.TradingBot)
+CYCLE_PHASE_SECONDS = REGISTRY.histogram(
+    'trading_bot_cycle_phase_seconds', 'Duration of analysis cycle phases', ('phase',), buckets=PHASE_BUCKETS
+)
+_PHASE_INDICATORS = CYCLE_PHASE_SECONDS.labels('indicators')
+_PHASE_SCORING = CYCLE_PHASE_SECONDS.labels('scoring')
+
 class AIAnalysisEngine:
-    def __init__(self, openai_api_key: str = None):
+    # Колонки индикаторов, нужные для многофакторного анализа
+    SCORE_COLUMNS = (
+        'rsi', 'ma_5', 'ma_20', 'ma_50', 'macd', 'macd_signal', 'macd_histogram',
+        'bb_position', 'volume_ratio', 'price_change_1h'
+    )
+    
+    # Веса факторов в общем счете
+    FACTOR_WEIGHTS = {
+        'rsi': 0.2,        # Weight: 20%
+        'ma': 0.25,        # Weight: 25%
+        'macd': 0.15,      # Weight: 15%
+        'bb': 0.15,        # Weight: 15%
+        'volume': 0.1,     # Weight: 10%
+        'momentum': 0.15   # Weight: 15%
+    }
+    
+    # Веса таймфреймов в мультитаймфреймовом счете (get_multi_timeframe_recommendation)
+    TIMEFRAME_WEIGHTS = {
+        '5m': 0.1,
+        '15m': 0.15,
+        '30m': 0.25,
+        '60m': 0.25,
+        '4h': 0.25
+    }
+    
+    # Меньше свечей - индикаторы таймфрейма (MA50) еще не определены, он не учитывается
+    MIN_TIMEFRAME_CANDLES = 50
+    
+    # Пороги факторов и итогового счета
+    DEFAULT_THRESHOLDS = {
+        'rsi_oversold': 30,
+        'rsi_overbought': 70,
+        'bb_lower': 0.1,
+        'bb_upper': 0.9,
+        'volume_ratio': 1.5,
+        'momentum': 0.02,   # 2% за час
+        'score': 0.3
+    }
+    
+    # Пояснения к значениям факторов
+    FACTOR_REASONS = {
+        'rsi': {1.0: "RSI в зоне перепроданности", -1.0: "RSI в зоне перекупленности"},
+        'ma': {
+            1.0: "Все скользящие средние выстроены в бычьем порядке",
+            -1.0: "Все скользящие средние выстроены в медвежьем порядке",
+            0.5: "Краткосрочный тренд восходящий",
+            -0.5: "Краткосрочный тренд нисходящий"
+        },
+        'macd': {1.0: "MACD показывает бычью дивергенцию", -1.0: "MACD показывает медвежью дивергенцию"},
+        'bb': {1.0: "Цена у нижней границы Боллинджера", -1.0: "Цена у верхней границы Боллинджера"},
+        'volume': {0.5: "Высокий объем подтверждает движение", -0.5: "Высокий объем подтверждает движение"},
+        'momentum': {0.5: "Сильный восходящий импульс", -0.5: "Сильный нисходящий импульс"}
+    }
+    
+    def __init__(self, openai_api_key: str = None, incremental: bool = False,
+                 weights: Dict[str, float] = None, thresholds: Dict[str, float] = None,
+                 timeframe_weights: Dict[str, float] = None):
         self.openai_api_key = openai_api_key
         self.logger = logging.getLogger(__name__)
         
+        # Веса и пороги можно переопределить (например, результатом ai.optimizer)
+        self.factor_weights = dict(self.FACTOR_WEIGHTS, **(weights or {}))
+        self.thresholds = dict(self.DEFAULT_THRESHOLDS, **(thresholds or {}))
+        self.timeframe_weights = dict(self.TIMEFRAME_WEIGHTS, **(timeframe_weights or {}))
+        
+        # Инкрементальный режим: состояние индикаторов хранится по символам
+        # и обновляется только новыми/измененными свечами. Состояние считает
+        # индикаторы по окну из len(data) свечей и совпадает с pandas на том же
+        # окне; сигнальная линия MACD пересчитывается по ценам окна (см. IncrementalIndicators)
+        self.incremental = incremental
+        self._indicator_states: Dict[str, IncrementalIndicators] = {}
+        
     def calculate_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """Расчет расширенных технических индикаторов"""
         try:
@@ -50,123 +133,199 @@ class AIAnalysisEngine:
             self.logger.error(f"Error calculating indicators: {e}")
             return df
     
-    def get_ai_recommendation(self, symbol: str, data: pd.DataFrame) -> Dict:
-        """Получить улучшенную рекомендацию от AI"""
+    def get_ai_recommendation(self, symbol: str, data: pd.DataFrame) -> Recommendation:
+        """Получить улучшенную рекомендацию от AI (data - DataFrame свечей или CandleBuffer)"""
         try:
-            df_with_indicators = self.calculate_technical_indicators(data)
-            
-            # Use last valid row
-            latest = df_with_indicators.iloc[-1]
+            with _PHASE_INDICATORS.time():
+                latest = self._latest_indicators(symbol, data)
             
             # Multi-factor analysis
-            recommendation = self._advanced_analysis(latest, symbol)
+            with _PHASE_SCORING.time():
+                recommendation = self._advanced_analysis(latest, symbol)
             
-            return {
-                'action': recommendation['action'],
-                'confidence': recommendation['confidence'],
-                'analysis': recommendation['analysis'],
-                'reasoning': recommendation['reasoning']
-            }
+            # Строка индикаторов, по которой принято решение (для дашборда)
+            recommendation['indicators'] = dict(latest)
+            return Recommendation.from_dict(recommendation, symbol)
             
         except Exception as e:
             self.logger.error(f"Error in AI recommendation: {e}")
-            return self._get_fallback_recommendation()
+            return self._get_fallback_recommendation(symbol)
     
-    def _advanced_analysis(self, data: pd.Series, symbol: str) -> Dict:
-        """Продвинутый многофакторный анализ"""
-        factors = []
-        reasoning = []
+    def get_multi_timeframe_recommendation(self, symbol: str, frames: Dict[str, pd.DataFrame],
+                                           primary: str = None) -> Recommendation:
+        """Рекомендация по нескольким таймфреймам одного символа
         
-        # 1. RSI Analysis
-        rsi_score = 0
-        if data['rsi'] < 30:
-            rsi_score = 1.0
-            reasoning.append("RSI в зоне перепроданности")
-        elif data['rsi'] > 70:
-            rsi_score = -1.0
-            reasoning.append("RSI в зоне перекупленности")
-        else:
-            rsi_score = 0
-        factors.append(('rsi', rsi_score, 0.2))  # Weight: 20%
-        
-        # 2. Moving Average Analysis
-        ma_score = 0
-        if data['ma_5'] > data['ma_20'] > data['ma_50']:
-            ma_score = 1.0
-            reasoning.append("Все скользящие средние выстроены в бычьем порядке")
-        elif data['ma_5'] < data['ma_20'] < data['ma_50']:
-            ma_score = -1.0
-            reasoning.append("Все скользящие средние выстроены в медвежьем порядке")
-        elif data['ma_5'] > data['ma_20']:
-            ma_score = 0.5
-            reasoning.append("Краткосрочный тренд восходящий")
-        else:
-            ma_score = -0.5
-            reasoning.append("Краткосрочный тренд нисходящий")
-        factors.append(('ma', ma_score, 0.25))  # Weight: 25%
-        
-        # 3. MACD Analysis
-        macd_score = 0
-        if data['macd'] > data['macd_signal'] and data['macd_histogram'] > 0:
-            macd_score = 1.0
-            reasoning.append("MACD показывает бычью дивергенцию")
-        elif data['macd'] < data['macd_signal'] and data['macd_histogram'] < 0:
-            macd_score = -1.0
-            reasoning.append("MACD показывает медвежью дивергенцию")
-        factors.append(('macd', macd_score, 0.15))  # Weight: 15%
-        
-        # 4. Bollinger Bands Analysis
-        bb_score = 0
-        if data['bb_position'] < 0.1:
-            bb_score = 1.0
-            reasoning.append("Цена у нижней границы Боллинджера")
-        elif data['bb_position'] > 0.9:
-            bb_score = -1.0
-            reasoning.append("Цена у верхней границы Боллинджера")
-        factors.append(('bb', bb_score, 0.15))  # Weight: 15%
-        
-        # 5. Volume Analysis
-        volume_score = 0
-        if data['volume_ratio'] > 1.5:
-            volume_score = 0.5 * (1 if data['price_change_1h'] > 0 else -1)
-            reasoning.append("Высокий объем подтверждает движение")
-        factors.append(('volume', volume_score, 0.1))  # Weight: 10%
-        
-        # 6. Momentum Analysis
-        momentum_score = 0
-        if data['price_change_1h'] > 0.02:  # 2% growth in 1h
-            momentum_score = 0.5
-            reasoning.append("Сильный восходящий импульс")
-        elif data['price_change_1h'] < -0.02:  # 2% drop in 1h
-            momentum_score = -0.5
-            reasoning.append("Сильный нисходящий импульс")
-        factors.append(('momentum', momentum_score, 0.15))  # Weight: 15%
+        frames - DataFrame или CandleBuffer на интервал (например,
+        api.resampler.CandleResampler.frames()). Факторы всех таймфреймов
+        считаются одним векторным проходом, их счета усредняются с весами
+        timeframe_weights. Цена, индикаторы и пояснения факторов берутся из
+        primary (по умолчанию - таймфрейм с наибольшим весом).
+        """
+        try:
+            with _PHASE_INDICATORS.time():
+                rows = {}
+                for interval, data in frames.items():
+                    if isinstance(data, CandleBuffer):
+                        data = data.frame()
+                    if len(data) >= self.MIN_TIMEFRAME_CANDLES:
+                        rows[interval] = self._latest_indicators(f"{symbol}@{interval}", data)
+            
+            if not rows:
+                self.logger.warning(f"⚠️ {symbol}: ни в одном таймфрейме нет {self.MIN_TIMEFRAME_CANDLES} свечей")
+                return self._get_fallback_recommendation(symbol)
+            
+            with _PHASE_SCORING.time():
+                recommendation = self._multi_timeframe_analysis(rows, primary)
+            
+            recommendation['indicators'] = dict(rows[recommendation.pop('primary')])
+            return Recommendation.from_dict(recommendation, symbol)
+            
+        except Exception as e:
+            self.logger.error(f"Error in multi-timeframe recommendation: {e}")
+            return self._get_fallback_recommendation(symbol)
+    
+    def _latest_indicators(self, key: str, data):
+        """Строка индикаторов последней свечи (key - состояние инкрементального режима)"""
+        if isinstance(data, CandleBuffer):
+            data = data.frame()
+        if self.incremental and 'open_time' in data.columns:
+            return self._update_incremental(key, data)
+        df_with_indicators = self.calculate_technical_indicators(data)
+        
+        # Use last valid row
+        return df_with_indicators.iloc[-1]
+    
+    def _update_incremental(self, symbol: str, data: pd.DataFrame) -> Dict:
+        """Обновить состояние индикаторов символа только новыми свечами"""
+        state = self._indicator_states.get(symbol)
+        if state is None or state.window != len(data):
+            # Окно другой длины (первый вызов или другой klines_limit) - новое состояние
+            state = self._indicator_states[symbol] = IncrementalIndicators(window=len(data))
+        
+        open_times = data['open_time'].to_numpy()
+        closes = data['close'].to_numpy(dtype=float)
+        volumes = data['volume'].to_numpy(dtype=float)
+        
+        # Ищем в новых данных последнюю известную свечу; если ее нет
+        # (разрыв истории или правка старых свечей) - пересчитываем с нуля
+        start = 0
+        last_open_time = state.last_open_time
+        if last_open_time is not None:
+            start = int(np.searchsorted(open_times, last_open_time))
+            if start >= len(open_times) or open_times[start] != last_open_time:
+                self.logger.info(f"🔄 Разрыв истории {symbol}, полный пересчет индикаторов")
+                state.reset()
+                start = 0
+        
+        try:
+            for i in range(start, len(open_times)):
+                state.update(open_times[i], closes[i], volumes[i])
+        except ValueError as e:
+            self.logger.warning(f"⚠️ {e}")
+            state.reset()
+            for i in range(len(open_times)):
+                state.update(open_times[i], closes[i], volumes[i])
+        
+        return state.latest()
+    
+    def analyze_batch(self, df: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Многофакторный анализ всех строк DataFrame с индикаторами сразу
+        
+        Returns:
+            Dict: массивы факторов (rsi, ma, macd, bb, volume, momentum),
+                score (нормированный счет), action (коды ACTION_*) и confidence
+        """
+        return self._score_arrays({
+            column: df[column].to_numpy(dtype=float) for column in self.SCORE_COLUMNS
+        })
+    
+    def _score_arrays(self, columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """Векторный расчет факторов, счета и действия (сравнения с NaN ложны)"""
+        rsi = columns['rsi']
+        ma_5, ma_20, ma_50 = columns['ma_5'], columns['ma_20'], columns['ma_50']
+        macd, macd_signal = columns['macd'], columns['macd_signal']
+        macd_histogram = columns['macd_histogram']
+        bb_position = columns['bb_position']
+        volume_ratio = columns['volume_ratio']
+        price_change_1h = columns['price_change_1h']
+        thresholds = self.thresholds
+        
+        scores = {
+            # 1. RSI: перепроданность / перекупленность
+            'rsi': np.select(
+                [rsi < thresholds['rsi_oversold'], rsi > thresholds['rsi_overbought']], [1.0, -1.0], 0.0
+            ),
+            # 2. Moving Averages: порядок MA5 / MA20 / MA50
+            'ma': np.select(
+                [(ma_5 > ma_20) & (ma_20 > ma_50), (ma_5 < ma_20) & (ma_20 < ma_50), ma_5 > ma_20],
+                [1.0, -1.0, 0.5], -0.5
+            ),
+            # 3. MACD относительно сигнальной линии
+            'macd': np.select(
+                [(macd > macd_signal) & (macd_histogram > 0), (macd < macd_signal) & (macd_histogram < 0)],
+                [1.0, -1.0], 0.0
+            ),
+            # 4. Bollinger Bands: положение цены в канале
+            'bb': np.select(
+                [bb_position < thresholds['bb_lower'], bb_position > thresholds['bb_upper']], [1.0, -1.0], 0.0
+            ),
+            # 5. Volume: высокий объем подтверждает направление часового движения
+            'volume': np.where(
+                volume_ratio > thresholds['volume_ratio'], np.where(price_change_1h > 0, 0.5, -0.5), 0.0
+            ),
+            # 6. Momentum: сильное изменение цены за час
+            'momentum': np.select(
+                [price_change_1h > thresholds['momentum'], price_change_1h < -thresholds['momentum']],
+                [0.5, -0.5], 0.0
+            ),
+        }
         
         # Calculate weighted score
-        total_score = sum(score * weight for _, score, weight in factors)
-        total_weight = sum(weight for _, _, weight in factors)
+        total_score = 0
+        for name, weight in self.factor_weights.items():
+            total_score = total_score + scores[name] * weight
+        total_weight = sum(self.factor_weights.values())
+        normalized_score = total_score / total_weight if total_weight > 0 else total_score * 0
         
-        if total_weight > 0:
-            normalized_score = total_score / total_weight
-        else:
-            normalized_score = 0
+        action, confidence = self._decide(normalized_score)
+        scores.update({'score': normalized_score, 'action': action, 'confidence': confidence})
+        return scores
+    
+    def _decide(self, normalized_score: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Нормированный счет -> коды действий и уверенность"""
+        thresholds = self.thresholds
         
         # Convert score to action and confidence
-        if normalized_score > 0.3:
-            action = "BUY"
-            confidence = min(0.5 + (normalized_score * 0.5), 0.95)
-        elif normalized_score < -0.3:
-            action = "SELL"
-            confidence = min(0.5 + (abs(normalized_score) * 0.5), 0.9)
-        else:
-            action = "HOLD"
-            confidence = 0.5
+        action = np.select(
+            [normalized_score > thresholds['score'], normalized_score < -thresholds['score']],
+            [ACTION_BUY, ACTION_SELL], ACTION_HOLD
+        ).astype(np.int8)
+        confidence = np.select(
+            [action == ACTION_BUY, action == ACTION_SELL],
+            [np.minimum(0.5 + normalized_score * 0.5, 0.95),
+             np.minimum(0.5 + np.abs(normalized_score) * 0.5, 0.9)],
+            0.5
+        )
+        return action, confidence
+    
+    def _advanced_analysis(self, data: pd.Series, symbol: str) -> Dict:
+        """Продвинутый многофакторный анализ (одна строка батч-расчета)"""
+        scores = self._score_arrays({
+            column: np.array([data[column]], dtype=float) for column in self.SCORE_COLUMNS
+        })
+        
+        reasoning = []
+        for name in self.factor_weights:
+            message = self.FACTOR_REASONS[name].get(float(scores[name][0]))
+            if message:
+                reasoning.append(message)
         
+        normalized_score = float(scores['score'][0])
         reasoning.append(f"Общий счет: {normalized_score:.2f}")
         
         return {
-            'action': action,
-            'confidence': confidence,
+            'action': ACTION_NAMES[int(scores['action'][0])],
+            'confidence': float(scores['confidence'][0]),
             'analysis': {
                 'current_price': data['close'],
                 'rsi': data['rsi'],
@@ -178,14 +337,54 @@ class AIAnalysisEngine:
             'reasoning': " | ".join(reasoning)
         }
     
-    def _get_fallback_recommendation(self) -> Dict:
-        """Резервная рекомендация при ошибках"""
+    def _multi_timeframe_analysis(self, rows: Dict[str, pd.Series], primary: str = None) -> Dict:
+        """Счета таймфреймов (строки батч-расчета) -> взвешенный общий счет"""
+        intervals = list(rows)
+        scores = self._score_arrays({
+            column: np.array([rows[interval][column] for interval in intervals], dtype=float)
+            for column in self.SCORE_COLUMNS
+        })
+        
+        weights = np.array([self.timeframe_weights.get(interval, 0.0) for interval in intervals])
+        if weights.sum() <= 0:
+            weights = np.ones(len(intervals))
+        combined = float(np.dot(weights, scores['score']) / weights.sum())
+        action, confidence = self._decide(np.array([combined]))
+        
+        if primary not in rows:
+            primary = intervals[int(np.argmax(weights))]
+        index = intervals.index(primary)
+        
+        reasoning = []
+        for name in self.factor_weights:
+            message = self.FACTOR_REASONS[name].get(float(scores[name][index]))
+            if message:
+                reasoning.append(f"{primary}: {message}")
+        reasoning.append("Таймфреймы: " + ", ".join(
+            f"{interval} {ACTION_NAMES[int(scores['action'][i])]} {scores['score'][i]:+.2f}"
+            for i, interval in enumerate(intervals)
+        ))
+        reasoning.append(f"Общий счет: {combined:.2f}")
+        
+        data = rows[primary]
         return {
-            'action': 'HOLD',
-            'confidence': 0.3,
+            'action': ACTION_NAMES[int(action[0])],
+            'confidence': float(confidence[0]),
             'analysis': {
-                'current_price': 121812.54,
-                'rsi': 50.0
+                'current_price': data['close'],
+                'rsi': data['rsi'],
+                'ma_20': data.get('ma_20', 0),
+                'ma_50': data.get('ma_50', 0),
+                'macd': data.get('macd', 0),
+                'volume_ratio': data.get('volume_ratio', 0)
             },
-            'reasoning': 'Резервный режим: недостаточно данных для анализа'
-        }
\ No newline at end of file
+            'reasoning': " | ".join(reasoning),
+            'primary': primary
+        }
+    
+    def _get_fallback_recommendation(self, symbol: str = None) -> Recommendation:
+        """Резервная рекомендация при ошибках"""
+        return Recommendation(
+            'HOLD', 0.3, price=121812.54, rsi=50.0,
+            reasoning='Резервный режим: недостаточно данных для анализа', symbol=symbol
+        )
\ No newline at end of file
@@ -0,0 +1,143 @@
+import logging
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from ai.analysis_engine import AIAnalysisEngine, ACTION_BUY, ACTION_SELL
+from api.mexc_client import INTERVAL_MS
+
+
+class Backtester:
+    """Векторизованный бэктест сигналов AIAnalysisEngine
+
+    Модель исполнения повторяет бота: только длинная позиция, BUY с
+    уверенностью выше confidence_threshold открывает ее, такой же SELL -
+    закрывает. Решение по закрытию бара t исполняется по open бара t+1
+    с проскальзыванием slippage и комиссией fee_rate за сторону.
+    """
+
+    def __init__(self, engine: AIAnalysisEngine = None, interval: str = '30m',
+                 fee_rate: float = 0.001, slippage: float = 0.0005,
+                 confidence_threshold: float = 0.7, initial_capital: float = 10000.0):
+        self.engine = engine or AIAnalysisEngine()
+        self.interval = interval
+        self.fee_rate = fee_rate
+        self.slippage = slippage
+        self.confidence_threshold = confidence_threshold
+        self.initial_capital = initial_capital
+        self.logger = logging.getLogger(__name__)
+
+        interval_ms = INTERVAL_MS.get(interval, INTERVAL_MS['30m'])
+        self.bars_per_year = 365 * 24 * 3600 * 1000 / interval_ms
+
+    def run(self, df: pd.DataFrame) -> Dict:
+        """Индикаторы, сигналы и симуляция по всей истории свечей"""
+        df = self.engine.calculate_technical_indicators(df.copy())
+        signals = self.engine.analyze_batch(df)
+        return self.simulate(
+            df['open'].to_numpy(dtype=float),
+            df['close'].to_numpy(dtype=float),
+            signals['action'],
+            signals['confidence']
+        )
+
+    def simulate(self, open_: np.ndarray, close: np.ndarray,
+                 action: np.ndarray, confidence: np.ndarray) -> Dict:
+        """Симуляция исполнения по готовым массивам сигналов"""
+        bars = len(close)
+        confident = confidence > self.confidence_threshold
+
+        # Целевая позиция после бара t: последний уверенный BUY (1) или SELL (0)
+        target = np.full(bars, np.nan)
+        target[confident & (action == ACTION_BUY)] = 1.0
+        target[confident & (action == ACTION_SELL)] = 0.0
+        target = pd.Series(target).ffill().fillna(0.0).to_numpy()
+
+        # Позиция в баре t установлена по open этого бара
+        position = np.zeros(bars)
+        position[1:] = target[:-1]
+        previous = np.zeros(bars)
+        previous[1:] = position[:-1]
+
+        entry = (position == 1) & (previous == 0)
+        exit_ = (position == 0) & (previous == 1)
+        hold = (position == 1) & (previous == 1)
+
+        prev_close = np.empty(bars)
+        prev_close[0] = close[0]
+        prev_close[1:] = close[:-1]
+
+        growth = np.ones(bars)
+        growth[hold] = close[hold] / prev_close[hold]
+        growth[entry] = close[entry] / (open_[entry] * (1 + self.slippage)) * (1 - self.fee_rate)
+        growth[exit_] = open_[exit_] * (1 - self.slippage) / prev_close[exit_] * (1 - self.fee_rate)
+
+        equity = self.initial_capital * np.cumprod(growth)
+        returns = growth - 1
+
+        std = returns.std()
+        sharpe_ratio = float(returns.mean() / std * np.sqrt(self.bars_per_year)) if std > 0 else 0.0
+        drawdown = 1 - equity / np.maximum.accumulate(equity)
+
+        # Доходность каждой сделки: произведение роста от входа до выхода
+        trade_id = np.cumsum(entry)
+        in_trade = (position == 1) | exit_
+        trade_log_returns = np.bincount(trade_id[in_trade], weights=np.log(growth[in_trade]),
+                                        minlength=trade_id[-1] + 1 if bars else 1)[1:]
+        total_trades = int(entry.sum())
+
+        return {
+            'equity_curve': equity,
+            'returns': returns,
+            'position': position,
+            'final_equity': float(equity[-1]) if bars else self.initial_capital,
+            'total_return': float(equity[-1] / self.initial_capital - 1) if bars else 0.0,
+            'sharpe_ratio': sharpe_ratio,
+            'max_drawdown': float(drawdown.max()) if bars else 0.0,
+            'win_rate': float((trade_log_returns > 0).mean()) if total_trades else 0.0,
+            'total_trades': total_trades,
+            'bars': bars
+        }
+
+
+def load_candles(store, symbol: str, interval: str = '30m', limit: int = 10_000_000) -> pd.DataFrame:
+    """Свечи из CandleStore в виде DataFrame для бэктеста"""
+    klines = store.get_klines(symbol, interval, limit)
+    return pd.DataFrame(klines, columns=[
+        'open_time', 'open', 'high', 'low', 'close', 'volume',
+        'close_time', 'quote_asset_volume'
+    ])
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import sys
+    import time
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api.candle_store import CandleStore
+    from config.settings import DATA_SETTINGS
+
+    parser = argparse.ArgumentParser(description="Бэктест стратегии AIAnalysisEngine по локальным свечам")
+    parser.add_argument('symbol', nargs='?', default='BTCUSDT')
+    parser.add_argument('--interval', default='30m')
+    parser.add_argument('--fee', type=float, default=0.001)
+    parser.add_argument('--slippage', type=float, default=0.0005)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    store = CandleStore(os.path.join(project_root, DATA_SETTINGS['candle_store_path']))
+    candles = load_candles(store, args.symbol, args.interval)
+    if candles.empty:
+        sys.exit(f"Нет сохраненных свечей {args.symbol} {args.interval}")
+
+    started = time.perf_counter()
+    result = Backtester(interval=args.interval, fee_rate=args.fee, slippage=args.slippage).run(candles)
+    elapsed = time.perf_counter() - started
+
+    print(f"📊 {args.symbol} {args.interval}: {result['bars']} свечей за {elapsed:.2f}с")
+    for key in ('total_return', 'sharpe_ratio', 'max_drawdown', 'win_rate', 'total_trades', 'final_equity'):
+        print(f"  {key}: {result[key]}")
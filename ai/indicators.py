@@ -0,0 +1,319 @@
+import math
+from collections import deque
+from typing import Dict, Optional
+
+import pandas as pd
+
+NAN = float('nan')
+INF = float('inf')
+
+# Пересчитываем накопленные суммы с нуля раз в N закрытых свечей,
+# чтобы ошибка округления не копилась в долгоживущем процессе
+_RESYNC_EVERY = 1024
+
+
+def _div(a: float, b: float) -> float:
+    """Деление с семантикой IEEE (как у pandas/numpy), без ZeroDivisionError"""
+    if b == 0.0:
+        if a == 0.0 or a != a:
+            return NAN
+        return math.copysign(INF, a) * math.copysign(1.0, b)
+    return a / b
+
+
+class _EWMState:
+    """Рекуррентное EWM, повторяющее pandas ewm(...).mean() при adjust=True"""
+
+    def __init__(self, alpha: float):
+        self.factor = 1.0 - alpha
+        self.weighted = NAN
+        self.old_wt = 1.0
+        self.count = 0
+
+    def peek(self, value: float) -> float:
+        """Значение EWM, если добавить value, без изменения состояния"""
+        if self.count == 0:
+            return value
+        old_wt = self.old_wt * self.factor
+        if self.weighted != value:
+            return (old_wt * self.weighted + value) / (old_wt + 1.0)
+        return self.weighted
+
+    def push(self, value: float):
+        if self.count == 0:
+            self.weighted = value
+            self.old_wt = 1.0
+        else:
+            self.old_wt *= self.factor
+            if self.weighted != value:
+                self.weighted = (self.old_wt * self.weighted + value) / (self.old_wt + 1.0)
+            self.old_wt += 1.0
+        self.count += 1
+
+
+class _WindowEWMState:
+    """EWM pandas (adjust=True) по последним window значениям за O(1)
+
+    Числитель и знаменатель - суммы с весами factor**k; уходящее из окна
+    значение вычитается с весом factor**(window - 1). Как и _RollingState,
+    хранит window - 1 закрытых значений, последнее берется из текущей свечи.
+    zero_first - первое значение окна считается нулем (diff() первой строки
+    окна дает NaN, а where(...) превращает его в 0 - так у прироста RSI).
+    """
+
+    def __init__(self, alpha: float, window: int, zero_first: bool = False):
+        self.factor = 1.0 - alpha
+        self.window = window
+        self.zero_first = zero_first
+        self.tail = self.factor ** (window - 1)
+        self.values = deque()
+        self.numerator = 0.0
+        self.denominator = 0.0
+        self.pushes = 0
+
+    def peek(self, value: float) -> float:
+        """Значение EWM окна из закрытых значений + value, без изменения состояния"""
+        numerator = self.factor * self.numerator + value
+        denominator = self.factor * self.denominator + 1.0
+        if self.zero_first:
+            first = self.values[0] if self.values else value
+            numerator -= self.factor ** len(self.values) * first
+        return numerator / denominator
+
+    def push(self, value: float):
+        self.values.append(value)
+        self.numerator = self.factor * self.numerator + value
+        self.denominator = self.factor * self.denominator + 1.0
+
+        if len(self.values) > self.window - 1:
+            old = self.values.popleft()
+            self.numerator -= self.tail * old
+            self.denominator -= self.tail
+
+        self.pushes += 1
+        if self.pushes % _RESYNC_EVERY == 0:
+            self._resync()
+
+    def _resync(self):
+        n = len(self.values)
+        weights = [self.factor ** (n - 1 - i) for i in range(n)]
+        self.numerator = math.fsum(w * v for w, v in zip(weights, self.values))
+        self.denominator = math.fsum(weights)
+
+
+def macd_signal(closes) -> float:
+    """Сигнальная линия MACD последней свечи, как в AIAnalysisEngine.calculate_technical_indicators"""
+    close = pd.Series(closes, dtype=float)
+    macd = close.ewm(span=12).mean() - close.ewm(span=26).mean()
+    return float(macd.ewm(span=9).mean().iloc[-1])
+
+
+class _RollingState:
+    """Скользящее окно на бегущих суммах (среднее и std с ddof=1)
+
+    Хранит только window - 1 закрытых значений: последнее значение окна
+    всегда берется из текущей (возможно, еще формирующейся) свечи.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.pushes = 0
+
+    def peek(self, value: float):
+        """(mean, std) окна из закрытых значений + value"""
+        n = len(self.values) + 1
+        if n < self.window:
+            return NAN, NAN
+        mean = (self.total + value) / n
+        delta = value - self.mean
+        new_mean = self.mean + delta / n
+        m2 = self.m2 + delta * (value - new_mean)
+        var = max(m2, 0.0) / (n - 1) if n > 1 else NAN
+        return mean, math.sqrt(var)
+
+    def push(self, value: float):
+        self.values.append(value)
+        self.total += value
+        n = len(self.values)
+        delta = value - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (value - self.mean)
+
+        if n > self.window - 1:
+            old = self.values.popleft()
+            self.total -= old
+            n -= 1
+            if n == 0:
+                self.mean = 0.0
+                self.m2 = 0.0
+            else:
+                delta = old - self.mean
+                self.mean -= delta / n
+                self.m2 -= delta * (old - self.mean)
+
+        self.pushes += 1
+        if self.pushes % _RESYNC_EVERY == 0:
+            self._resync()
+
+    def _resync(self):
+        n = len(self.values)
+        self.total = math.fsum(self.values)
+        self.mean = self.total / n if n else 0.0
+        self.m2 = math.fsum((v - self.mean) ** 2 for v in self.values)
+
+
+class IncrementalIndicators:
+    """Потоковый расчет индикаторов AIAnalysisEngine для одного символа
+
+    Закрытые свечи сворачиваются в O(1) рекуррентные состояния, а последняя
+    (формирующаяся) свеча хранится отдельно и может пересчитываться сколько
+    угодно раз без изменения состояния. Значения совпадают с
+    AIAnalysisEngine.calculate_technical_indicators, примененным ко всей
+    истории свечей, переданной в update() с момента последнего reset(),
+    а с window - к последним window свечам (скользящее окно бота).
+
+    В режиме окна сигнальная линия MACD считается pandas по ценам окна (O(window)):
+    каждое значение MACD в окне зависит от его начала, и при сдвиге окна меняется
+    вся линия - рекуррентно ее не обновить. Остальные индикаторы - за O(1).
+    """
+
+    MA_PERIODS = (5, 10, 20, 50)
+    BB_PERIOD = 20
+    VOLUME_PERIOD = 20
+    # 2 периода = 1 час, 8 периодов = 4 часа для 30-минутных свечей
+    MOMENTUM_PERIODS = {'price_change_1h': 2, 'price_change_4h': 8}
+
+    def __init__(self, window: int = None):
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        """Сбросить состояние (например, при разрыве истории)"""
+        if self.window is None:
+            self._rsi_gain = _EWMState(1 / 14)
+            self._rsi_loss = _EWMState(1 / 14)
+            self._ema_fast = _EWMState(2 / 13)
+            self._ema_slow = _EWMState(2 / 27)
+            self._macd_signal = _EWMState(2 / 10)
+            self._window_closes = None
+        else:
+            self._rsi_gain = _WindowEWMState(1 / 14, self.window, zero_first=True)
+            self._rsi_loss = _WindowEWMState(1 / 14, self.window, zero_first=True)
+            self._ema_fast = _WindowEWMState(2 / 13, self.window)
+            self._ema_slow = _WindowEWMState(2 / 27, self.window)
+            self._macd_signal = None
+            self._window_closes = deque(maxlen=self.window - 1)
+        self._committed = 0
+        self._ma = {period: _RollingState(period) for period in self.MA_PERIODS}
+        self._bb = self._ma[self.BB_PERIOD]
+        self._volume = _RollingState(self.VOLUME_PERIOD)
+        self._closes = deque(maxlen=max(self.MOMENTUM_PERIODS.values()))
+        self._pending = None
+        self._latest = None
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        """open_time последней (формирующейся) свечи"""
+        return self._pending[0] if self._pending is not None else None
+
+    def update(self, open_time: int, close: float, volume: float) -> Dict[str, float]:
+        """Добавить новую свечу или пересчитать последнюю
+
+        Raises:
+            ValueError: если open_time меньше open_time последней свечи -
+                такую правку нельзя применить инкрементально.
+        """
+        close = float(close)
+        volume = float(volume)
+
+        if self._pending is not None:
+            if open_time < self._pending[0]:
+                raise ValueError(
+                    f"Свеча {open_time} старше последней {self._pending[0]}, нужен полный пересчет"
+                )
+            if open_time > self._pending[0]:
+                self._commit(*self._pending)
+
+        self._pending = (open_time, close, volume)
+        self._latest = self._evaluate(open_time, close, volume)
+        return self._latest
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        """Индикаторы последней свечи в виде строки (ключи как у DataFrame)"""
+        return self._latest
+
+    def _commit(self, open_time: int, close: float, volume: float):
+        gain, loss = self._gain_loss(close)
+        self._rsi_gain.push(gain)
+        self._rsi_loss.push(loss)
+
+        self._ema_fast.push(close)
+        self._ema_slow.push(close)
+        if self._macd_signal is not None:
+            self._macd_signal.push(self._ema_fast.weighted - self._ema_slow.weighted)
+        else:
+            self._window_closes.append(close)
+
+        for state in self._ma.values():
+            state.push(close)
+        self._volume.push(volume)
+        self._closes.append(close)
+        self._committed += 1
+
+    def _gain_loss(self, close: float):
+        # Первая свеча: diff() дает NaN, а where(...) превращает его в 0
+        if not self._closes:
+            return 0.0, 0.0
+        delta = close - self._closes[-1]
+        return (delta if delta > 0 else 0.0), (-delta if delta < 0 else 0.0)
+
+    def _evaluate(self, open_time: int, close: float, volume: float) -> Dict[str, float]:
+        row = {'open_time': open_time, 'close': close, 'volume': volume}
+        # Свечей в окне вместе с текущей: короче периода - NaN, как у rolling() на окне
+        count = self._committed + 1
+        if self.window is not None:
+            count = min(count, self.window)
+
+        # RSI
+        gain, loss = self._gain_loss(close)
+        rs = _div(self._rsi_gain.peek(gain), self._rsi_loss.peek(loss))
+        row['rsi'] = 100 - _div(100, 1 + rs)
+
+        # Moving Averages
+        for period, state in self._ma.items():
+            row[f'ma_{period}'], std = state.peek(close) if count >= period else (NAN, NAN)
+            if period == self.BB_PERIOD:
+                bb_std = std
+
+        # MACD
+        macd = self._ema_fast.peek(close) - self._ema_slow.peek(close)
+        row['macd'] = macd
+        if self._macd_signal is not None:
+            row['macd_signal'] = self._macd_signal.peek(macd)
+        else:
+            row['macd_signal'] = macd_signal(list(self._window_closes) + [close])
+        row['macd_histogram'] = macd - row['macd_signal']
+
+        # Bollinger Bands
+        row['bb_middle'] = row[f'ma_{self.BB_PERIOD}']
+        row['bb_upper'] = row['bb_middle'] + bb_std * 2
+        row['bb_lower'] = row['bb_middle'] - bb_std * 2
+        row['bb_position'] = _div(close - row['bb_lower'], row['bb_upper'] - row['bb_lower'])
+
+        # Volume
+        row['volume_sma'], _ = self._volume.peek(volume) if count >= self.VOLUME_PERIOD else (NAN, NAN)
+        row['volume_ratio'] = _div(volume, row['volume_sma'])
+
+        # Momentum
+        history = min(len(self._closes), count - 1)
+        for name, periods in self.MOMENTUM_PERIODS.items():
+            if history >= periods:
+                row[name] = _div(close, self._closes[-periods]) - 1
+            else:
+                row[name] = NAN
+
+        return row
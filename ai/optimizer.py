@@ -0,0 +1,215 @@
+import os
+import random
+import logging
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+
+from ai.analysis_engine import AIAnalysisEngine
+from ai.backtest import Backtester
+
+# Пространство поиска по умолчанию: ключ "weights.<фактор>" или "thresholds.<порог>"
+PARAM_SPACE = {
+    'weights.rsi': [0.1, 0.2, 0.3],
+    'weights.ma': [0.15, 0.25, 0.35],
+    'weights.macd': [0.05, 0.15, 0.25],
+    'weights.bb': [0.05, 0.15, 0.25],
+    'weights.volume': [0.0, 0.1, 0.2],
+    'weights.momentum': [0.05, 0.15, 0.25],
+    'thresholds.rsi_oversold': [20, 25, 30, 35],
+    'thresholds.rsi_overbought': [65, 70, 75, 80],
+    'thresholds.bb_lower': [0.05, 0.1, 0.2],
+    'thresholds.bb_upper': [0.8, 0.9, 0.95],
+    'thresholds.score': [0.2, 0.3, 0.4, 0.5],
+}
+
+# Метрики, у которых лучше меньшее значение (остальные сортируются по убыванию)
+LOWER_IS_BETTER = ('max_drawdown',)
+
+# Состояние процесса-воркера: представление массивов поверх общей памяти
+_worker = {}
+
+
+def grid_search(space: Dict[str, List]) -> Iterator[Dict]:
+    """Все сочетания значений пространства поиска"""
+    keys = list(space)
+    for values in itertools.product(*(space[key] for key in keys)):
+        yield _unflatten(dict(zip(keys, values)))
+
+
+def random_search(space: Dict[str, List], samples: int, seed: int = None) -> Iterator[Dict]:
+    """samples случайных сочетаний значений пространства поиска"""
+    rng = random.Random(seed)
+    for _ in range(samples):
+        yield _unflatten({key: rng.choice(values) for key, values in space.items()})
+
+
+def refine_search(best: List[Dict], space: Dict[str, List], samples: int, seed: int = None) -> Iterator[Dict]:
+    """Локальный поиск вокруг лучших наборов: сдвиг пары значений на соседние по сетке"""
+    rng = random.Random(seed)
+    flat_best = [_flatten(params) for params in best]
+    for _ in range(samples):
+        params = dict(rng.choice(flat_best))
+        for key in rng.sample(list(space), k=min(2, len(space))):
+            values = space[key]
+            index = values.index(params[key]) if params.get(key) in values else rng.randrange(len(values))
+            index = min(max(index + rng.choice((-1, 1)), 0), len(values) - 1)
+            params[key] = values[index]
+        yield _unflatten(params)
+
+
+def _unflatten(flat: Dict) -> Dict:
+    params = {'weights': {}, 'thresholds': {}}
+    for key, value in flat.items():
+        group, name = key.split('.', 1)
+        params[group][name] = value
+    return params
+
+
+def _flatten(params: Dict) -> Dict:
+    return {f"{group}.{name}": value
+            for group, values in params.items() for name, value in values.items()}
+
+
+def _attach_worker(shm_name: str, shape: tuple, columns: List[str], backtest_kwargs: Dict):
+    """Инициализатор воркера: подключение к общей памяти без копирования массивов"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    matrix = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+    _worker['shm'] = shm  # держим ссылку, иначе буфер будет закрыт
+    _worker['columns'] = {name: matrix[index] for index, name in enumerate(columns)}
+    _worker['backtester'] = Backtester(**backtest_kwargs)
+    logging.getLogger('ai.analysis_engine').setLevel(logging.WARNING)
+
+
+def _evaluate_chunk(param_sets: List[Dict]) -> List[Dict]:
+    """Оценка пачки наборов параметров в воркере"""
+    columns = _worker['columns']
+    backtester = _worker['backtester']
+    results = []
+    for params in param_sets:
+        engine = AIAnalysisEngine(weights=params['weights'], thresholds=params['thresholds'])
+        signals = engine._score_arrays(columns)
+        stats = backtester.simulate(columns['open'], columns['close'],
+                                    signals['action'], signals['confidence'])
+        results.append({
+            'params': params,
+            'sharpe_ratio': stats['sharpe_ratio'],
+            'total_return': stats['total_return'],
+            'max_drawdown': stats['max_drawdown'],
+            'win_rate': stats['win_rate'],
+            'total_trades': stats['total_trades']
+        })
+    return results
+
+
+class ParameterSweep:
+    """Перебор весов и порогов AIAnalysisEngine на истории свечей
+
+    Индикаторы считаются один раз в родительском процессе и кладутся в
+    multiprocessing.shared_memory. Воркеры ProcessPoolExecutor подключаются
+    к ней в инициализаторе, поэтому задачам передаются только сами
+    наборы параметров. Каждый набор - векторный бэктест Backtester.simulate.
+    """
+
+    def __init__(self, candles: pd.DataFrame, interval: str = '30m', workers: int = None,
+                 fee_rate: float = 0.001, slippage: float = 0.0005,
+                 confidence_threshold: float = 0.7, metric: str = 'sharpe_ratio',
+                 chunk_size: int = 32):
+        self.interval = interval
+        self.workers = workers or os.cpu_count() or 1
+        self.metric = metric
+        self.chunk_size = chunk_size
+        self.backtest_kwargs = {
+            'interval': interval,
+            'fee_rate': fee_rate,
+            'slippage': slippage,
+            'confidence_threshold': confidence_threshold
+        }
+        self.logger = logging.getLogger(__name__)
+
+        data = AIAnalysisEngine().calculate_technical_indicators(candles.copy())
+        self.columns = list(AIAnalysisEngine.SCORE_COLUMNS) + ['open', 'close']
+        self.matrix = np.vstack([data[name].to_numpy(dtype=np.float64) for name in self.columns])
+
+    def run(self, param_sets, top: int = 10) -> List[Dict]:
+        """Оценить все наборы и вернуть top лучших по metric (max_drawdown - по возрастанию)"""
+        param_sets = list(param_sets)
+        chunks = [param_sets[i:i + self.chunk_size] for i in range(0, len(param_sets), self.chunk_size)]
+        self.logger.info(f"🔬 Перебор {len(param_sets)} наборов на {self.matrix.shape[1]} свечах, "
+                         f"процессов: {self.workers}")
+
+        shm = shared_memory.SharedMemory(create=True, size=self.matrix.nbytes)
+        try:
+            shared = np.ndarray(self.matrix.shape, dtype=np.float64, buffer=shm.buf)
+            shared[:] = self.matrix
+
+            results = []
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=_attach_worker,
+                                     initargs=(shm.name, self.matrix.shape, self.columns,
+                                               self.backtest_kwargs)) as executor:
+                futures = [executor.submit(_evaluate_chunk, chunk) for chunk in chunks]
+                for future in as_completed(futures):
+                    results.extend(future.result())
+            del shared
+        finally:
+            shm.close()
+            shm.unlink()
+
+        results.sort(key=lambda result: result[self.metric], reverse=self.metric not in LOWER_IS_BETTER)
+        return results[:top]
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from ai.backtest import load_candles
+    from api.candle_store import CandleStore
+    from config.settings import DATA_SETTINGS
+
+    parser = argparse.ArgumentParser(description="Подбор весов и порогов AIAnalysisEngine")
+    parser.add_argument('symbol', nargs='?', default='BTCUSDT')
+    parser.add_argument('--interval', default='30m')
+    parser.add_argument('--mode', choices=('grid', 'random'), default='random')
+    parser.add_argument('--samples', type=int, default=2000, help="число наборов для random")
+    parser.add_argument('--refine', type=int, default=0, help="наборов локального поиска вокруг лучших")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--metric', choices=('sharpe_ratio', 'total_return', 'win_rate', 'max_drawdown'),
+                        default='sharpe_ratio', help="критерий отбора лучших наборов")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    store = CandleStore(os.path.join(project_root, DATA_SETTINGS['candle_store_path']))
+    candles = load_candles(store, args.symbol, args.interval)
+    if candles.empty:
+        sys.exit(f"Нет сохраненных свечей {args.symbol} {args.interval}")
+
+    sweep = ParameterSweep(candles, interval=args.interval, workers=args.workers, metric=args.metric)
+    if args.mode == 'grid':
+        param_sets = grid_search(PARAM_SPACE)
+    else:
+        param_sets = random_search(PARAM_SPACE, args.samples, args.seed)
+
+    started = time.perf_counter()
+    best = sweep.run(param_sets, top=max(args.top, 10))
+    if args.refine:
+        best = sweep.run(itertools.chain((r['params'] for r in best),
+                                         refine_search([r['params'] for r in best], PARAM_SPACE,
+                                                       args.refine, args.seed)),
+                         top=args.top)
+    elapsed = time.perf_counter() - started
+
+    print(f"🏆 {args.symbol} {args.interval}: лучшие наборы за {elapsed:.1f}с")
+    for rank, result in enumerate(best[:args.top], 1):
+        print(f"{rank:2d}. sharpe={result['sharpe_ratio']:.3f} return={result['total_return']:.2%} "
+              f"drawdown={result['max_drawdown']:.2%} trades={result['total_trades']}")
+        print(f"    {result['params']}")
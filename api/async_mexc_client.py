@@ -0,0 +1,225 @@
+import asyncio
+import time
+import logging
+from typing import Dict, List
+
+import aiohttp
+
+from api.mexc_client import MexcClient, VALID_INTERVALS, resolve_interval
+from api.rate_limiter import RateLimiter
+
+
+class AsyncTokenBucket:
+    """Асинхронный token bucket: rate токенов в секунду, запас до capacity"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: float = 1.0):
+        """Дождаться и забрать tokens токенов (очередь FIFO)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+
+class AsyncMexcClient:
+    """Асинхронный клиент MEXC поверх одной keep-alive сессии aiohttp
+
+    Повторяет интерфейс MexcClient, но методы - корутины. Все запросы
+    проходят через общий AsyncTokenBucket, поэтому десятки символов можно
+    запрашивать одновременно, не превышая лимит и не открывая новое
+    TLS-соединение на каждый вызов. С rate_limiter (api.rate_limiter)
+    вместо него действуют веса endpoint и бюджет, общий с MexcClient.
+    """
+
+    # Подпись и резервные данные те же, что у синхронного клиента
+    _generate_signature = MexcClient._generate_signature
+    _generate_fallback_data = MexcClient._generate_fallback_data
+    _generate_fallback_array = MexcClient._generate_fallback_array
+
+    def __init__(self, api_key: str, secret_key: str, base_url: str = "https://api.mexc.com",
+                 rate: float = 10.0, burst: float = 20.0, max_connections: int = 20,
+                 rate_limiter: RateLimiter = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.logger = logging.getLogger(__name__)
+
+        self.valid_intervals = dict(VALID_INTERVALS)
+
+        # Rate limiting: rate запросов в секунду с запасом burst
+        self.rate_limiter = AsyncTokenBucket(rate, burst)
+        self.shared_limiter = rate_limiter
+        self.max_connections = max_connections
+        self._session = None
+
+    async def __aenter__(self):
+        await self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                keepalive_timeout=60,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=15)
+            )
+        return self._session
+
+    async def close(self):
+        """Закрыть сессию и все соединения пула"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _rate_limit(self, method: str, endpoint: str):
+        """Дождаться права на запрос (общий лимитер или собственный token bucket)"""
+        if self.shared_limiter is not None:
+            await self.shared_limiter.acquire_async(method, endpoint)
+        else:
+            await self.rate_limiter.acquire()
+
+    async def _request(self, method: str, endpoint: str, params: Dict = None, headers: Dict = None):
+        """Выполнить запрос с учетом лимита, вернуть (status, json или текст)"""
+        await self._rate_limit(method, endpoint)
+        return await self._send(method, endpoint, params, headers)
+
+    async def _signed_request(self, method: str, endpoint: str, params: Dict = None):
+        """Подписанный запрос, как MexcClient._signed_request"""
+        # Ждем лимит до подписи: timestamp должен уложиться в recvWindow
+        await self._rate_limit(method, endpoint)
+        params = dict(params or {})
+        params['timestamp'] = int(time.time() * 1000)
+        params['recvWindow'] = 5000
+        # Параметры уходят в том же порядке, в котором подписаны
+        params = dict(sorted(params.items()))
+        params['signature'] = self._generate_signature(params)
+        return await self._send(method, endpoint, params, {'X-MEXC-APIKEY': self.api_key})
+
+    async def _send(self, method: str, endpoint: str, params: Dict = None, headers: Dict = None):
+        session = await self._get_session()
+        async with session.request(method, f"{self.base_url}{endpoint}",
+                                   params=params, headers=headers) as response:
+            if self.shared_limiter is not None:
+                self.shared_limiter.update(method, endpoint, response.status, response.headers.get('Retry-After'))
+            try:
+                data = await response.json(content_type=None)
+            except ValueError:
+                data = await response.text()
+            return response.status, data
+
+    async def get_current_price(self, symbol: str = 'BTCUSDT') -> float:
+        """Получить текущую цену с биржи"""
+        try:
+            status, data = await self._request('GET', "/api/v3/ticker/price", params={'symbol': symbol})
+
+            if status == 200:
+                price = float(data['price'])
+                self.logger.info(f"✅ Текущая цена {symbol}: ${price:.2f}")
+                return price
+            else:
+                self.logger.error(f"❌ Ошибка получения цены: {status}")
+                return 121812.54  # Fallback price
+
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка получения текущей цены: {e}")
+            return 121812.54  # Fallback price
+
+    async def get_klines(self, symbol: str, interval: str = '30m', limit: int = 100) -> List:
+        """Get candle data with improved error handling"""
+        endpoint = "/api/v3/klines"
+        mexc_interval = resolve_interval(interval, self.valid_intervals)
+
+        params = {
+            'symbol': symbol,
+            'interval': mexc_interval,
+            'limit': limit
+        }
+
+        try:
+            self.logger.info(f"📡 Запрос данных {symbol} с интервалом {mexc_interval}")
+            status, data = await self._request('GET', endpoint, params=params)
+
+            if status != 200:
+                self.logger.error(f"❌ MEXC API error {status}: {data}")
+                return self._generate_fallback_data()
+
+            if isinstance(data, dict) and 'code' in data:
+                self.logger.error(f"❌ MEXC API returned error: {data}")
+                return self._generate_fallback_data()
+
+            if not data or len(data) == 0:
+                self.logger.warning("⚠️ MEXC API returned empty data")
+                return self._generate_fallback_data()
+
+            self.logger.info(f"✅ Успешно получено {len(data)} свечей для {symbol}")
+            return data
+
+        except asyncio.TimeoutError:
+            self.logger.error("⏰ Таймаут запроса к MEXC API")
+            return self._generate_fallback_data()
+        except aiohttp.ClientConnectionError:
+            self.logger.error("🔌 Ошибка подключения к MEXC API")
+            return self._generate_fallback_data()
+        except Exception as e:
+            self.logger.error(f"❌ Неожиданная ошибка при запросе к MEXC: {e}")
+            return self._generate_fallback_data()
+
+    async def get_klines_many(self, symbols: List[str], interval: str = '30m', limit: int = 100) -> Dict[str, List]:
+        """Запросить свечи сразу для нескольких символов"""
+        results = await asyncio.gather(*(self.get_klines(symbol, interval, limit) for symbol in symbols))
+        return dict(zip(symbols, results))
+
+    async def get_ticker_price(self, symbol: str) -> Dict:
+        """Получить текущую цену тикера"""
+        try:
+            status, data = await self._request('GET', "/api/v3/ticker/price", params={'symbol': symbol})
+            if status == 200:
+                self.logger.info(f"Current {symbol} price: {data.get('price')}")
+                return data
+            else:
+                self.logger.error(f"Error getting ticker price: {status}")
+                return {'symbol': symbol, 'price': '121695.25'}
+        except Exception as e:
+            self.logger.error(f"Error fetching ticker price: {e}")
+            return {'symbol': symbol, 'price': '121695.25'}
+
+    async def get_account_info(self) -> Dict:
+        """Get account information"""
+        _, data = await self._signed_request('GET', "/api/v3/account")
+        return data
+
+    async def create_order(self, symbol: str, side: str, order_type: str, quantity: float, price: float = None,
+                           client_order_id: str = None) -> Dict:
+        """Create order (client_order_id - newClientOrderId, как в MexcClient.create_order)"""
+        params = {
+            'symbol': symbol,
+            'side': side.upper(),  # BUY or SELL
+            'type': order_type.upper(),  # LIMIT, MARKET
+            'quantity': quantity
+        }
+
+        if price:
+            params['price'] = price
+        if client_order_id:
+            params['newClientOrderId'] = client_order_id
+
+        _, data = await self._signed_request('POST', "/api/v3/order", params)
+        return data
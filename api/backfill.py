@@ -0,0 +1,237 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from api.mexc_client import INTERVAL_MS, MAX_KLINES_LIMIT
+from api.kline_parser import KLINE_FIELDS, empty_klines, parse_klines
+
+# Имена файлов: 1m и 1M на нечувствительных к регистру ФС совпали бы
+FILE_INTERVALS = {'1M': '1mon'}
+
+
+def history_path(directory: str, symbol: str, interval: str) -> str:
+    """Файл истории символа и интервала: <directory>/<symbol>/<interval>.npz"""
+    return os.path.join(directory, symbol, f"{FILE_INTERVALS.get(interval, interval)}.npz")
+
+
+def load_history(directory: str, symbol: str, interval: str) -> np.ndarray:
+    """Свечи из файла истории (пустой массив, если файла нет)"""
+    path = history_path(directory, symbol, interval)
+    if not os.path.exists(path):
+        return empty_klines()
+    with np.load(path) as data:
+        klines = np.empty(len(data['open_time']), dtype=empty_klines().dtype)
+        for name in KLINE_FIELDS:
+            klines[name] = data[name]
+    return klines
+
+
+def save_history(directory: str, symbol: str, interval: str, klines: np.ndarray, compressed: bool = True):
+    """Записать свечи по колонкам (атомарно: временный файл и os.replace)"""
+    path = history_path(directory, symbol, interval)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    save = np.savez_compressed if compressed else np.savez
+    save(tmp_path, **{name: np.ascontiguousarray(klines[name]) for name in KLINE_FIELDS})
+    os.replace(tmp_path, path)
+
+
+def merge_klines(*parts: np.ndarray) -> np.ndarray:
+    """Склеить куски свечей по open_time; при совпадении побеждает более поздний кусок"""
+    parts = [part for part in parts if part is not None and len(part)]
+    if not parts:
+        return empty_klines()
+    klines = np.concatenate(parts)
+    # Устойчивая сортировка по убыванию порядка поступления: оставляем последнее вхождение
+    reversed_klines = klines[::-1]
+    _, first = np.unique(reversed_klines['open_time'], return_index=True)
+    return reversed_klines[first]
+
+
+class KlinesBackfill:
+    """Загрузка глубокой истории свечей страницами по MAX_KLINES_LIMIT
+
+    Диапазон делится на окна startTime/endTime по page_limit свечей,
+    окна запрашиваются параллельно (max_workers потоков на одном клиенте,
+    общий лимит запросов клиента соблюдается). Результат пишется
+    колонками в .npz на символ и интервал. Загрузка продолжается с
+    последней сохраненной свечи: она перезапрашивается, так как могла
+    быть незакрытой. Готовый непрерывный префикс сохраняется каждые
+    checkpoint_pages страниц, поэтому прерванная загрузка не начинается
+    заново. При ошибке страницы (после retries попыток) сохраняется все
+    до нее, следующий запуск продолжит с этого места.
+    """
+
+    def __init__(self, client, directory: str = 'data/history', max_workers: int = 4,
+                 page_limit: int = MAX_KLINES_LIMIT, retries: int = 3, retry_delay: float = 1.0,
+                 checkpoint_pages: int = 50, compressed: bool = True):
+        self.client = client
+        self.directory = directory
+        self.max_workers = max_workers
+        self.page_limit = min(page_limit, MAX_KLINES_LIMIT)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.checkpoint_pages = checkpoint_pages
+        self.compressed = compressed
+        self.logger = logging.getLogger(__name__)
+
+    def pages(self, start_time: int, end_time: int, interval_ms: int) -> List[tuple]:
+        """Окна [start, end] по page_limit свечей, выровненные по границам свечей"""
+        start_time -= start_time % interval_ms
+        step = self.page_limit * interval_ms
+        return [(start, min(start + step - 1, end_time)) for start in range(start_time, end_time + 1, step)]
+
+    def fetch_page(self, symbol: str, interval: str, start_time: int, end_time: int) -> Optional[np.ndarray]:
+        """Одна страница с повторами; None - страница так и не загрузилась"""
+        for attempt in range(1, self.retries + 1):
+            data = self.client.get_klines(symbol, interval, self.page_limit,
+                                          start_time=start_time, end_time=end_time)
+            if data is not None:
+                klines = parse_klines(data)
+                return klines[(klines['open_time'] >= start_time) & (klines['open_time'] <= end_time)]
+            if attempt < self.retries:
+                time.sleep(self.retry_delay * attempt)
+        return None
+
+    def download(self, symbol: str, interval: str, start_time: int, end_time: int = None) -> Dict:
+        """Докачать [start_time, end_time] (мс) в файл истории"""
+        started = time.perf_counter()
+        end_time = end_time or int(time.time() * 1000)
+        existing = load_history(self.directory, symbol, interval)
+
+        # Нужны кусок до первой сохраненной свечи и все с последней
+        ranges = []
+        if len(existing):
+            first, last = int(existing['open_time'][0]), int(existing['open_time'][-1])
+            if start_time < first:
+                ranges.append((start_time, first - 1))
+            ranges.append((max(start_time, last), end_time))
+        else:
+            ranges.append((start_time, end_time))
+
+        stats = {'symbol': symbol, 'interval': interval, 'pages': 0, 'candles': 0, 'failed': False,
+                 'path': history_path(self.directory, symbol, interval)}
+        klines = existing
+        for range_start, range_end in ranges:
+            if range_start > range_end:
+                continue
+            if interval in INTERVAL_MS:
+                klines, pages, failed = self._download_pages(symbol, interval, range_start, range_end, klines)
+            else:
+                klines, pages, failed = self._download_sequential(symbol, interval, range_start, range_end, klines)
+            stats['pages'] += pages
+            if failed:
+                if len(existing) and range_end < existing['open_time'][0]:
+                    # Неполный кусок перед сохраненной историей оставил бы в ней дыру
+                    klines = existing
+                stats['failed'] = True
+                break
+
+        self._save(symbol, interval, klines)
+        stats['candles'] = len(klines)
+        stats['new_candles'] = len(klines) - len(existing)
+        stats['seconds'] = round(time.perf_counter() - started, 3)
+        icon = '⚠️' if stats['failed'] else '✅'
+        self.logger.info(f"{icon} {symbol} {interval}: {stats['new_candles']} новых свечей, "
+                         f"{stats['pages']} страниц за {stats['seconds']}с")
+        return stats
+
+    def _download_pages(self, symbol: str, interval: str, start_time: int, end_time: int, klines: np.ndarray):
+        pages = self.pages(start_time, end_time, INTERVAL_MS[interval])
+        done: Dict[int, np.ndarray] = {}
+        contiguous = []  # Загруженный непрерывный префикс страниц
+        merged = 0  # Сколько страниц префикса уже в klines
+        failed = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='backfill') as executor:
+            futures = {executor.submit(self.fetch_page, symbol, interval, *page): index
+                       for index, page in enumerate(pages)}
+            pending = set(futures)
+            while pending and not failed:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    page = future.result()
+                    if page is None:
+                        failed = True
+                        self.logger.error(f"❌ Страница {pages[futures[future]]} {symbol} {interval} не загрузилась")
+                        break
+                    done[futures[future]] = page
+
+                # Продвигаем непрерывный префикс и периодически сохраняем его
+                previous = len(contiguous)
+                while len(contiguous) in done:
+                    contiguous.append(done.pop(len(contiguous)))
+                if len(contiguous) // self.checkpoint_pages > previous // self.checkpoint_pages:
+                    klines = merge_klines(klines, *contiguous[merged:])
+                    merged = len(contiguous)
+                    self._save(symbol, interval, klines)
+                    self.logger.info(f"💾 {symbol} {interval}: {len(contiguous)}/{len(pages)} страниц")
+
+            for future in pending:
+                future.cancel()
+        return merge_klines(klines, *contiguous[merged:]), len(contiguous), failed
+
+    def _download_sequential(self, symbol: str, interval: str, start_time: int, end_time: int,
+                             klines: np.ndarray):
+        """Интервалы без фиксированной длительности (1M): страница за страницей"""
+        cursor, pages = start_time, 0
+        while cursor <= end_time:
+            page = self.fetch_page(symbol, interval, cursor, end_time)
+            if page is None:
+                return klines, pages, True
+            pages += 1
+            klines = merge_klines(klines, page)
+            if len(page) < self.page_limit:
+                break
+            cursor = int(page['open_time'][-1]) + 1
+        return klines, pages, False
+
+    def _save(self, symbol: str, interval: str, klines: np.ndarray):
+        if len(klines):
+            save_history(self.directory, symbol, interval, klines, self.compressed)
+
+    def download_all(self, symbols: List[str], start_time: int, end_time: int = None,
+                     intervals: List[str] = None) -> List[Dict]:
+        """Все символы по всем интервалам (по умолчанию - client.valid_intervals)"""
+        intervals = intervals or list(self.client.valid_intervals)
+        return [self.download(symbol, interval, start_time, end_time)
+                for symbol in symbols for interval in intervals]
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from api.mexc_client import MexcClient
+    from api.rate_limiter import RateLimiter
+    from config.settings import DATA_SETTINGS, TRADING_SETTINGS, RATE_LIMIT_SETTINGS
+
+    parser = argparse.ArgumentParser(description="Загрузка истории свечей MEXC в файлы .npz")
+    parser.add_argument('symbols', nargs='*', default=TRADING_SETTINGS['symbols'])
+    parser.add_argument('--interval', action='append', dest='intervals',
+                        help="Интервал (можно несколько раз); по умолчанию - все valid_intervals")
+    parser.add_argument('--days', type=float, default=365)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--output', default=DATA_SETTINGS.get('history_path', 'data/history'))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - BACKFILL - %(levelname)s - %(message)s')
+    # Логи каждого запроса клиента не нужны при сотнях страниц
+    logging.getLogger('api.mexc_client').setLevel(logging.WARNING)
+
+    # Общий с ботом бюджет запросов: загрузка не отнимет у него лимит сверх разрешенного
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    client = MexcClient(os.getenv('MEXC_API_KEY', ''), os.getenv('MEXC_SECRET_KEY', ''),
+                        rate_limiter=RateLimiter.from_settings(RATE_LIMIT_SETTINGS, project_root))
+    backfill = KlinesBackfill(client, args.output, max_workers=args.workers)
+    start = int((time.time() - args.days * 86400) * 1000)
+    try:
+        results = backfill.download_all(args.symbols, start, intervals=args.intervals)
+    finally:
+        client.close()
+    sys.exit(1 if any(result['failed'] for result in results) else 0)
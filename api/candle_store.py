@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import threading
+import logging
+from typing import List, Optional
+
+
+class CandleStore:
+    """Локальное хранилище свечей в SQLite по символу и интервалу
+
+    Свечи хранятся в формате REST /api/v3/klines, ключ - (symbol, interval,
+    open_time), поэтому повторная запись формирующейся свечи просто
+    заменяет ее. Режим WAL позволяет читать базу из других процессов
+    во время записи.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        # Одно соединение на все потоки бота, доступ сериализуется блокировкой
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS klines (
+                symbol TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                open_time INTEGER NOT NULL,
+                open REAL NOT NULL,
+                high REAL NOT NULL,
+                low REAL NOT NULL,
+                close REAL NOT NULL,
+                volume REAL NOT NULL,
+                close_time INTEGER NOT NULL,
+                quote_volume REAL NOT NULL,
+                PRIMARY KEY (symbol, interval, open_time)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def last_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        """open_time последней сохраненной свечи"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT MAX(open_time) FROM klines WHERE symbol = ? AND interval = ?",
+                (symbol, interval)
+            ).fetchone()
+        return row[0]
+
+    def count(self, symbol: str, interval: str) -> int:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) FROM klines WHERE symbol = ? AND interval = ?",
+                (symbol, interval)
+            ).fetchone()
+        return row[0]
+
+    def upsert(self, symbol: str, interval: str, klines: List) -> int:
+        """Добавить свечи, заменяя уже сохраненные с тем же open_time"""
+        rows = [
+            (symbol, interval, int(k[0]), float(k[1]), float(k[2]), float(k[3]), float(k[4]),
+             float(k[5]), int(k[6]), float(k[7]))
+            for k in klines
+        ]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO klines VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self.conn.commit()
+        return len(rows)
+
+    def get_klines(self, symbol: str, interval: str, limit: int = 100,
+                   start_time: int = None, end_time: int = None) -> List:
+        """Последние limit свечей по возрастанию open_time (в диапазоне, если задан)"""
+        query = ("SELECT open_time, open, high, low, close, volume, close_time, quote_volume "
+                 "FROM klines WHERE symbol = ? AND interval = ?")
+        params = [symbol, interval]
+        if start_time is not None:
+            query += " AND open_time >= ?"
+            params.append(start_time)
+        if end_time is not None:
+            query += " AND open_time <= ?"
+            params.append(end_time)
+        query += " ORDER BY open_time DESC LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+        rows.reverse()
+        return [list(row) for row in rows]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,436 @@
+import json
+import time
+import uuid
+import queue
+import asyncio
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+
+from api.market_stream import MarketDataStream
+from utils.metrics import REGISTRY
+from utils.models import Order, FINAL_ORDER_STATUSES
+
+ORDER_SUBMIT_SECONDS = REGISTRY.histogram(
+    'order_submit_duration_seconds', 'Time from OrderExecutor.submit to exchange response', ('side',)
+)
+ORDERS = REGISTRY.counter(
+    'orders_total', 'Orders by symbol, side and status after submission', ('symbol', 'side', 'status')
+)
+
+# Числовые коды приватного потока MEXC -> значения REST
+STREAM_ORDER_STATUS = {1: 'NEW', 2: 'FILLED', 3: 'PARTIALLY_FILLED', 4: 'CANCELED', 5: 'PARTIALLY_CANCELED'}
+STREAM_ORDER_SIDE = {1: 'BUY', 2: 'SELL'}
+
+# Ответ биржи "clientOrderId уже использован": ордер принят предыдущей попыткой
+DUPLICATE_ORDER_CODES = (30008,)
+
+
+def is_duplicate_order_error(response) -> bool:
+    """Ошибка создания ордера из-за повторного newClientOrderId"""
+    if not isinstance(response, dict):
+        return False
+    return response.get('code') in DUPLICATE_ORDER_CODES or 'duplicate' in str(response.get('msg', '')).lower()
+
+
+def new_client_order_id(prefix: str = 'tb') -> str:
+    """Уникальный newClientOrderId (не длиннее 32 символов)"""
+    return f"{prefix}{uuid.uuid4().hex}"[:32]
+
+
+class OrderBook:
+    """Локальная книга ордеров бота и позиций по символам
+
+    Обновляется ответами REST (create/query_order) и событиями приватного
+    потока в одном формате - словарь с ключами REST: clientOrderId,
+    orderId, status, executedQty, cummulativeQuoteQty. Позиция меняется на
+    прирост исполненного объема, поэтому повтор одного и того же
+    обновления из REST и потока не учитывается дважды.
+    """
+
+    def __init__(self, history: int = 500):
+        self.history = history
+        self._orders: Dict[str, Order] = {}
+        self._positions: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def add(self, order: Order):
+        with self._lock:
+            self._orders[order.client_order_id] = order
+            self._trim()
+
+    def get(self, client_order_id: str) -> Optional[Order]:
+        with self._lock:
+            return self._orders.get(client_order_id)
+
+    def open_orders(self, symbol: str = None) -> List[Order]:
+        with self._lock:
+            return [order for order in self._orders.values()
+                    if order.is_open and (symbol is None or order.symbol == symbol)]
+
+    def orders(self) -> List[Order]:
+        with self._lock:
+            return list(self._orders.values())
+
+    def position(self, symbol: str) -> Dict:
+        with self._lock:
+            return dict(self._positions.get(symbol) or self._empty_position())
+
+    def positions(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {symbol: dict(position) for symbol, position in self._positions.items()}
+
+    @staticmethod
+    def _empty_position() -> Dict:
+        return {'quantity': 0.0, 'avg_price': None, 'realized_pnl': 0.0}
+
+    def apply(self, update: Dict) -> Optional[Order]:
+        """Применить состояние ордера в формате REST; None, если ордер не опознан"""
+        client_order_id = update.get('clientOrderId') or update.get('origClientOrderId')
+        with self._lock:
+            order = self._orders.get(client_order_id) if client_order_id else None
+            if order is None and update.get('orderId'):
+                order_id = str(update['orderId'])
+                order = next((o for o in self._orders.values() if o.order_id == order_id), None)
+            if order is None:
+                if not (client_order_id and update.get('symbol') and update.get('side')):
+                    return None
+                # Ордер, созданный не этим процессом (вручную или до перезапуска)
+                order = Order(client_order_id, update['symbol'], update['side'],
+                              update.get('type', 'MARKET'), float(update.get('origQty') or 0),
+                              update.get('price'), status='NEW')
+                self._orders[client_order_id] = order
+
+            if update.get('orderId'):
+                order.order_id = str(update['orderId'])
+            status = update.get('status')
+            # Запоздавшее обновление не возвращает ордер из конечного статуса
+            if status and not (order.status in FINAL_ORDER_STATUSES and status not in FINAL_ORDER_STATUSES):
+                order.status = status
+            elif not status and order.status == 'PENDING':
+                order.status = 'NEW'  # Ответ на создание ордера не содержит статуса
+
+            executed = update.get('executedQty')
+            if executed is not None and float(executed) > order.executed_qty:
+                executed = float(executed)
+                quote = float(update.get('cummulativeQuoteQty') or 0.0)
+                self._fill(order, executed - order.executed_qty, quote - order.quote_qty)
+                order.executed_qty = executed
+                order.quote_qty = quote
+            order.updated_at = time.time()
+            self._trim()
+            return order
+
+    def _fill(self, order: Order, quantity: float, quote: float):
+        position = self._positions.setdefault(order.symbol, self._empty_position())
+        price = quote / quantity if quantity and quote else (order.price or 0.0)
+        held = position['quantity']
+        if order.side == 'BUY':
+            total = held + quantity
+            avg_price = position['avg_price'] or price
+            position['avg_price'] = (avg_price * held + price * quantity) / total if total else None
+            position['quantity'] = total
+        else:
+            closed = min(quantity, max(held, 0.0))
+            if position['avg_price'] is not None and closed:
+                position['realized_pnl'] += (price - position['avg_price']) * closed
+            position['quantity'] = held - quantity
+            if abs(position['quantity']) < 1e-12:
+                position['quantity'] = 0.0
+                position['avg_price'] = None
+
+    def _trim(self):
+        """Не хранить больше history завершенных ордеров"""
+        excess = len(self._orders) - self.history
+        if excess <= 0:
+            return
+        for client_order_id in [key for key, order in self._orders.items() if not order.is_open][:excess]:
+            del self._orders[client_order_id]
+
+
+class OrderExecutor:
+    """Очередь отправки ордеров с собственным потоком
+
+    submit() создает ордер с newClientOrderId, кладет его в книгу со
+    статусом PENDING и сразу возвращает - цикл анализа не ждет биржу.
+    Поток отправки повторяет запрос при сетевой ошибке, предварительно
+    проверяя по clientOrderId, не дошел ли ордер до биржи, так что повтор
+    не создает второй ордер; ответ "дубликат clientOrderId" на повтор
+    означает, что ордер принят, и он тоже сверяется через query_order.
+    Ошибки биржи (баланс, фильтры) не повторяются.
+    Без приватного потока открытые ордера сверяются через REST раз в
+    reconcile_interval секунд - по таймеру, в том числе когда очередь не
+    пустеет. stop() не блокируется на полной очереди: поток дописывает
+    поставленные ордера и завершается по событию остановки.
+    """
+
+    # Как часто простаивающий поток проверяет событие остановки (секунды)
+    STOP_POLL_INTERVAL = 0.2
+
+    def __init__(self, client, order_book: OrderBook = None, queue_size: int = 100,
+                 retries: int = 3, retry_delay: float = 0.5, reconcile_interval: float = 10.0,
+                 client_id_prefix: str = 'tb'):
+        self.client = client
+        self.order_book = order_book or OrderBook()
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.reconcile_interval = reconcile_interval
+        self.client_id_prefix = client_id_prefix
+        self.logger = logging.getLogger(__name__)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._start_lock = threading.Lock()
+        self.user_stream_connected = False
+
+    def start(self) -> 'OrderExecutor':
+        """Запустить поток отправки (повторный вызов ничего не делает)"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop_event.clear()
+                self._thread = threading.Thread(target=self._run, name='order-executor', daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 10.0):
+        """Отправить уже поставленные ордера и остановить поток (ждет не дольше timeout)"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, symbol: str, side: str, order_type: str = 'MARKET', quantity: float = 0.0,
+               price: float = None) -> Order:
+        """Поставить ордер в очередь отправки"""
+        order = Order(new_client_order_id(self.client_id_prefix), symbol, side, order_type, quantity, price)
+        self.order_book.add(order)
+        try:
+            self._queue.put_nowait((order, time.perf_counter()))
+        except queue.Full:
+            order.status = 'REJECTED'
+            order.error = 'Очередь отправки ордеров переполнена'
+            ORDERS.labels(symbol, order.side, order.status).inc()
+            self.logger.error(f"❌ {order.error}: {order}")
+            return order
+        self.start()
+        return order
+
+    def wait(self, timeout: float = None) -> bool:
+        """Дождаться отправки всех ордеров из очереди"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _run(self):
+        next_reconcile = time.monotonic() + self.reconcile_interval
+        while True:
+            # Короткое ожидание: событие остановки проверяется без служебных элементов в очереди
+            wait = min(max(next_reconcile - time.monotonic(), 0.0), self.STOP_POLL_INTERVAL)
+            try:
+                order, queued_at = self._queue.get(timeout=wait)
+            except queue.Empty:
+                pass
+            else:
+                try:
+                    self._send(order)
+                    ORDER_SUBMIT_SECONDS.labels(order.side).observe(time.perf_counter() - queued_at)
+                    ORDERS.labels(order.symbol, order.side, order.status).inc()
+                except Exception as e:
+                    self.logger.error(f"❌ Ошибка потока отправки ордеров: {e}")
+                finally:
+                    self._queue.task_done()
+
+            if self._stop_event.is_set() and self._queue.empty():
+                return
+            # Сверка по таймеру: и при пустой очереди, и под постоянной нагрузкой
+            if time.monotonic() >= next_reconcile:
+                if not self.user_stream_connected:
+                    try:
+                        self.reconcile()
+                    except Exception as e:
+                        self.logger.error(f"❌ Ошибка сверки ордеров: {e}")
+                next_reconcile = time.monotonic() + self.reconcile_interval
+
+    def _send(self, order: Order):
+        for attempt in range(1, self.retries + 1):
+            order.attempts = attempt
+            try:
+                response = self.client.create_order(
+                    symbol=order.symbol,
+                    side=order.side,
+                    order_type=order.order_type,
+                    quantity=order.quantity,
+                    price=order.price,
+                    client_order_id=order.client_order_id
+                )
+            except Exception as e:
+                # Неизвестно, дошел ли ордер: проверяем по clientOrderId перед повтором
+                order.error = str(e)
+                self.logger.warning(f"⚠️ Ошибка отправки {order.client_order_id} (попытка {attempt}): {e}")
+                existing = self._lookup(order)
+                if existing is not None:
+                    self.order_book.apply(existing)
+                    order.error = None
+                    return
+                if attempt < self.retries:
+                    time.sleep(self.retry_delay * attempt)
+                continue
+
+            if isinstance(response, dict) and response.get('orderId'):
+                response.setdefault('clientOrderId', order.client_order_id)
+                self.order_book.apply(response)
+                order.error = None
+                self.logger.info(f"📨 Ордер принят биржей: {order}")
+                return
+
+            order.error = str(response)
+            if attempt > 1 or is_duplicate_order_error(response):
+                # Повтор после сетевой ошибки: первая попытка могла дойти до биржи
+                existing = self._lookup(order)
+                if existing is not None:
+                    self.order_book.apply(existing)
+                    order.error = None
+                    self.logger.info(f"📨 Ордер принят биржей с предыдущей попытки: {order}")
+                    return
+                if is_duplicate_order_error(response):
+                    # Биржа подтверждает ордер, но еще не отдает его - статус уточнит сверка
+                    order.status = 'NEW'
+                    order.updated_at = time.time()
+                    self.logger.warning(f"⚠️ Ордер уже на бирже, состояние уточнит сверка: {order}")
+                    return
+            break
+
+        order.status = 'REJECTED'
+        order.updated_at = time.time()
+        self.logger.error(f"❌ Ордер отклонен: {order} - {order.error}")
+
+    def _lookup(self, order: Order) -> Optional[Dict]:
+        try:
+            data = self.client.query_order(order.symbol, client_order_id=order.client_order_id)
+        except Exception:
+            return None
+        return data if isinstance(data, dict) and data.get('orderId') else None
+
+    def reconcile(self):
+        """Сверить открытые ордера книги с биржей через REST"""
+        for order in self.order_book.open_orders():
+            if order.status == 'PENDING':
+                continue
+            try:
+                data = self.client.query_order(order.symbol, order_id=order.order_id,
+                                               client_order_id=order.client_order_id)
+            except Exception as e:
+                self.logger.warning(f"⚠️ Ошибка сверки ордера {order.client_order_id}: {e}")
+                continue
+            if isinstance(data, dict) and data.get('orderId'):
+                self.order_book.apply(data)
+
+    def on_stream_update(self, update: Dict):
+        """Обработчик событий UserDataStream"""
+        order = self.order_book.apply(update)
+        if order is not None and not order.is_open:
+            self.logger.info(f"✅ Ордер {order.status}: {order} avg_price={order.avg_price}")
+
+    def stats(self) -> Dict:
+        statuses: Dict[str, int] = {}
+        for order in self.order_book.orders():
+            statuses[order.status] = statuses.get(order.status, 0) + 1
+        return {
+            'queued': self._queue.qsize(),
+            'statuses': statuses,
+            'open_orders': [order.to_dict() for order in self.order_book.open_orders()],
+            'positions': self.order_book.positions(),
+            'user_stream': self.user_stream_connected
+        }
+
+
+class UserDataStream(MarketDataStream):
+    """Приватный поток MEXC: обновления ордеров по listenKey
+
+    Перед каждым подключением получает новый listenKey через REST и
+    продлевает его раз в keepalive_interval секунд. Обновления ордеров
+    передаются в on_order в формате REST (см. OrderBook.apply).
+    """
+
+    CHANNELS = ['spot@private.orders.v3.api']
+
+    def __init__(self, client, on_order: Callable[[Dict], None], url: str = "wss://wbs.mexc.com/ws",
+                 keepalive_interval: float = 1800.0, ping_interval: float = 20.0,
+                 on_connection: Callable[[bool], None] = None):
+        super().__init__([], url=url, ping_interval=ping_interval)
+        self.client = client
+        self.on_order = on_order
+        self.on_connection = on_connection
+        self.keepalive_interval = keepalive_interval
+        self.listen_key = None
+
+    @property
+    def channels(self) -> List[str]:
+        return list(self.CHANNELS)
+
+    async def _connect_url(self) -> str:
+        loop = asyncio.get_running_loop()
+        self.listen_key = await loop.run_in_executor(None, self.client.create_listen_key)
+        return f"{self.url}?listenKey={self.listen_key}"
+
+    async def _consume(self, ws):
+        keepalive_task = asyncio.create_task(self._keepalive_loop())
+        self._set_connected(True)
+        try:
+            await super()._consume(ws)
+        finally:
+            keepalive_task.cancel()
+            self._set_connected(False)
+
+    async def _keepalive_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await loop.run_in_executor(None, self.client.keepalive_listen_key, self.listen_key)
+            except Exception as e:
+                self.logger.warning(f"⚠️ Ошибка продления listenKey: {e}")
+
+    def _set_connected(self, connected: bool):
+        if self.on_connection is not None:
+            self.on_connection(connected)
+
+    def handle_message(self, raw: str):
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            self.logger.warning(f"⚠️ Некорректное сообщение приватного потока: {raw[:200]}")
+            return
+
+        if not message.get('c', '').startswith('spot@private.orders'):
+            return  # PONG и подтверждения подписки
+
+        self.messages_received += 1
+        try:
+            update = self.parse_order(message)
+        except (KeyError, TypeError, ValueError) as e:
+            self.logger.warning(f"⚠️ Ошибка разбора обновления ордера: {e}")
+            return
+        try:
+            self.on_order(update)
+        except Exception as e:
+            self.logger.error(f"❌ Ошибка обработчика ордеров: {e}")
+
+    @staticmethod
+    def parse_order(message: Dict) -> Dict:
+        """Сообщение spot@private.orders.v3.api -> состояние ордера в формате REST"""
+        data = message['d']
+        return {
+            'symbol': message.get('s'),
+            'orderId': data['i'],
+            'clientOrderId': data.get('c') or None,
+            'side': STREAM_ORDER_SIDE.get(int(data['S'])),
+            'price': data.get('p'),
+            'origQty': data.get('v'),
+            'status': STREAM_ORDER_STATUS.get(int(data['s'])),
+            'executedQty': data.get('cv', 0),
+            'cummulativeQuoteQty': data.get('ca', 0)
+        }
@@ -0,0 +1,126 @@
+import io
+import json
+import logging
+from typing import Dict, Union
+
+import numpy as np
+import pandas as pd
+
+# Поля свечи MEXC /api/v3/klines в порядке ответа
+KLINE_DTYPE = np.dtype([
+    ('open_time', np.int64),
+    ('open', np.float64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('close', np.float64),
+    ('volume', np.float64),
+    ('close_time', np.int64),
+    ('quote_asset_volume', np.float64),
+])
+KLINE_FIELDS = KLINE_DTYPE.names
+
+logger = logging.getLogger(__name__)
+
+
+def empty_klines() -> np.ndarray:
+    return np.empty(0, dtype=KLINE_DTYPE)
+
+
+def parse_klines_json(body: Union[bytes, str]) -> np.ndarray:
+    """Тело ответа /api/v3/klines сразу в структурированный массив
+
+    Ответ - массив массивов из 8 чисел (цены в кавычках). Кавычки убираются,
+    строки свечей становятся строками CSV, и C-парсер numpy заполняет одну
+    матрицу float64 за проход без промежуточных Python-объектов. Время в мс
+    (< 2**53) переводится в int64 без потерь. Если в ответе есть что-то
+    кроме чисел (null, другое число полей), используется обычный json.loads.
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    body = body.strip()
+    if not body.startswith(b'['):
+        raise ValueError(f"Ответ не является массивом свечей: {body[:200]!r}")
+
+    rows = body.translate(None, b'" \t\r\n').replace(b'],[', b'\n').strip(b'[]')
+    if not rows:
+        return empty_klines()
+
+    try:
+        values = np.loadtxt(io.BytesIO(rows), delimiter=',', dtype=np.float64, ndmin=2)
+    except ValueError:
+        return parse_klines(json.loads(body))
+    if values.shape[1] != len(KLINE_FIELDS):
+        return parse_klines(json.loads(body))
+
+    klines = np.empty(len(values), dtype=KLINE_DTYPE)
+    for index, name in enumerate(KLINE_FIELDS):
+        klines[name] = values[:, index]
+    return klines
+
+
+def parse_klines(klines) -> np.ndarray:
+    """Свечи в формате REST (списки строк/чисел) в структурированный массив
+
+    Уже разобранный массив возвращается как есть. Пустые значения (null)
+    становятся NaN, строки с нечисловыми значениями отбрасываются.
+    """
+    if isinstance(klines, np.ndarray) and klines.dtype == KLINE_DTYPE:
+        return klines
+    if klines is None or len(klines) == 0:
+        return empty_klines()
+
+    fields = len(KLINE_FIELDS)
+    try:
+        return np.array([tuple(row[:fields]) for row in klines], dtype=KLINE_DTYPE)
+    except (TypeError, ValueError):
+        pass
+
+    # Медленный путь: построчно, с пропуском битых свечей
+    rows = []
+    for row in klines:
+        try:
+            values = [float(value) for value in row[:fields]]
+        except (TypeError, ValueError):
+            continue
+        if len(values) == fields and not np.isnan(values).any():
+            rows.append(tuple(values))
+    skipped = len(klines) - len(rows)
+    if skipped:
+        logger.warning(f"⚠️ Пропущено {skipped} некорректных свечей")
+    return np.array(rows, dtype=KLINE_DTYPE) if rows else empty_klines()
+
+
+def klines_columns(klines: np.ndarray) -> Dict[str, np.ndarray]:
+    """Колонки массива свечей (представления без копирования)"""
+    return {name: klines[name] for name in KLINE_FIELDS}
+
+
+def klines_frame(klines) -> pd.DataFrame:
+    """DataFrame для AIAnalysisEngine с колонками _format_klines_data"""
+    klines = parse_klines(klines)
+    valid = ~(np.isnan(klines['open']) | np.isnan(klines['high']) | np.isnan(klines['low'])
+              | np.isnan(klines['close']) | np.isnan(klines['volume']))
+    if not valid.all():
+        klines = klines[valid]
+    # Поля структурированного массива идут с шагом записи - pandas получает смежные колонки
+    return pd.DataFrame({name: np.ascontiguousarray(klines[name]) for name in KLINE_FIELDS})
+
+
+def aggregate_klines(klines: np.ndarray, interval_ms: int) -> np.ndarray:
+    """Свечи базового интервала -> свечи кратного интервала (выравнивание по UTC)"""
+    if len(klines) == 0:
+        return empty_klines()
+    buckets = klines['open_time'] - klines['open_time'] % interval_ms
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(klines)])) - 1
+
+    result = np.empty(len(starts), dtype=KLINE_DTYPE)
+    result['open_time'] = buckets[starts]
+    result['open'] = klines['open'][starts]
+    result['high'] = np.maximum.reduceat(klines['high'], starts)
+    result['low'] = np.minimum.reduceat(klines['low'], starts)
+    result['close'] = klines['close'][ends]
+    result['volume'] = np.add.reduceat(klines['volume'], starts)
+    result['close_time'] = result['open_time'] + interval_ms - 1
+    result['quote_asset_volume'] = np.add.reduceat(klines['quote_asset_volume'], starts)
+    return result
@@ -0,0 +1,316 @@
+import asyncio
+import json
+import time
+import queue
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import aiohttp
+import numpy as np
+
+from api.mexc_client import INTERVAL_MS
+from api.kline_parser import empty_klines
+from utils.models import CandleBuffer
+
+# Интервалы REST -> имена интервалов в потоках MEXC
+STREAM_INTERVALS = {
+    '1m': 'Min1', '5m': 'Min5', '15m': 'Min15', '30m': 'Min30',
+    '60m': 'Min60', '4h': 'Hour4', '8h': 'Hour8', '1d': 'Day1', '1M': 'Month1'
+}
+
+
+
+class MarketDataStream:
+    """Потоковые свечи MEXC по WebSocket с буфером свечей на символ
+
+    Подписывается на kline- и deals-потоки, держит в памяти последние
+    buffer_size свечей каждого символа в формате REST /api/v3/klines и
+    вызывает on_candle(symbol, closed) при обновлении или закрытии свечи.
+    Промежуточные обновления прореживаются до одного в min_update_interval
+    секунд на символ, закрытие свечи сообщается всегда.
+
+    Объем свечи берется из kline-потока (накопленный за окно); сделки
+    досчитываются поверх только после последнего kline-сообщения, чтобы
+    между ними цена и объем обновлялись без двойного учета. После каждого
+    подключения буферы докачиваются через backfill(symbol, start_time) с
+    open_time последней свечи - пропущенное за время разрыва не теряется.
+
+    В event loop только обновляются буферы: on_candle вызывается в
+    отдельном потоке market-stream-handler из очереди, поэтому долгий
+    анализ не мешает приему сообщений и PING. Пока промежуточное
+    обновление символа ждет в очереди, новые для него не добавляются -
+    обработчик все равно прочитает актуальный буфер.
+    """
+
+    def __init__(self, symbols: List[str], interval: str = '30m',
+                 url: str = "wss://wbs.mexc.com/ws", buffer_size: int = 500,
+                 on_candle: Callable[[str, bool], None] = None,
+                 min_update_interval: float = 1.0, ping_interval: float = 20.0,
+                 backfill: Callable[[str, int], Any] = None):
+        self.symbols = list(symbols)
+        self.interval = interval
+        self.url = url
+        self.on_candle = on_candle
+        self.backfill = backfill
+        self.min_update_interval = min_update_interval
+        self.ping_interval = ping_interval
+        self.logger = logging.getLogger(__name__)
+
+        self.stream_interval = STREAM_INTERVALS.get(interval, 'Min30')
+        # У 1M нет фиксированной длительности - сделки в него не агрегируем
+        self.interval_ms = INTERVAL_MS.get(interval)
+
+        self.buffer_size = buffer_size
+        self.buffers: Dict[str, CandleBuffer] = {symbol: CandleBuffer(buffer_size) for symbol in self.symbols}
+        self._lock = threading.Lock()
+        # Время (мс), до которого сделки уже учтены в объеме свечи (kline-сообщение или backfill)
+        self._volume_as_of: Dict[str, int] = {}
+        self._last_notify: Dict[str, float] = {}
+        self._events = queue.Queue()
+        self._pending_updates = set()
+        self._dispatcher: Optional[threading.Thread] = None
+
+        self.running = False
+        self.messages_received = 0
+        self._loop = None
+        self._ws = None
+        self._stop_event = None
+        self._thread = None
+
+    @property
+    def channels(self) -> List[str]:
+        channels = []
+        for symbol in self.symbols:
+            channels.append(f"spot@public.kline.v3.api@{symbol}@{self.stream_interval}")
+            channels.append(f"spot@public.deals.v3.api@{symbol}")
+        return channels
+
+    def seed(self, symbol: str, klines: List):
+        """Заполнить буфер снимком свечей из REST (списки или массив get_klines_array)"""
+        with self._lock:
+            buffer = self.buffers.setdefault(symbol, CandleBuffer(self.buffer_size))
+            buffer.clear()
+            buffer.extend(klines)
+
+    def get_klines(self, symbol: str) -> List:
+        """Копия буфера свечей символа в формате REST"""
+        with self._lock:
+            buffer = self.buffers.get(symbol)
+            return buffer.tolist() if buffer is not None else []
+
+    def get_klines_array(self, symbol: str) -> np.ndarray:
+        """Копия буфера свечей символа массивом KLINE_DTYPE"""
+        with self._lock:
+            buffer = self.buffers.get(symbol)
+            return buffer.to_array() if buffer is not None else empty_klines()
+
+    def start(self) -> threading.Thread:
+        """Запустить поток с собственным event loop"""
+        self._thread = threading.Thread(target=lambda: asyncio.run(self.run()),
+                                        name='market-stream', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self):
+        """Остановить поток (можно вызывать из любого потока)"""
+        self.running = False
+        if self._loop is not None and self._stop_event is not None:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+
+    async def run(self):
+        """Цикл подключения с переподключением и экспоненциальной паузой"""
+        self.running = True
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        backoff = 1
+
+        async with aiohttp.ClientSession() as session:
+            while self.running:
+                try:
+                    url = await self._connect_url()
+                    async with session.ws_connect(url) as ws:
+                        self._ws = ws
+                        await ws.send_json({'method': 'SUBSCRIPTION', 'params': self.channels})
+                        self.logger.info(f"📡 Подписка на {len(self.channels)} потоков {self.url}")
+                        backoff = 1
+                        await self._backfill()
+                        await self._consume(ws)
+                except Exception as e:
+                    self.logger.error(f"🔌 Ошибка WebSocket потока: {e}")
+                finally:
+                    self._ws = None
+
+                if self.running:
+                    self.logger.info(f"🔄 Переподключение через {backoff} секунд...")
+                    try:
+                        await asyncio.wait_for(self._stop_event.wait(), backoff)
+                    except asyncio.TimeoutError:
+                        pass
+                    backoff = min(backoff * 2, 30)
+
+        self.logger.info("🛑 Поток рыночных данных остановлен")
+
+    async def _connect_url(self) -> str:
+        """Адрес очередного подключения (переопределяется для приватных потоков)"""
+        return self.url
+
+    async def _backfill(self):
+        """Докачать свечи с open_time последней свечи буфера (после подписки, до чтения потока)"""
+        if self.backfill is None:
+            return
+        loop = asyncio.get_running_loop()
+        for symbol in self.symbols:
+            with self._lock:
+                last_open_time = self.buffers[symbol].last_open_time
+            if last_open_time is None:
+                continue
+            try:
+                klines = await loop.run_in_executor(None, self.backfill, symbol, last_open_time)
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка докачки свечей {symbol}: {e}")
+                continue
+            if klines is None or len(klines) == 0:
+                continue
+
+            as_of = int(time.time() * 1000)
+            with self._lock:
+                closed = self.buffers[symbol].extend(klines)
+                self._volume_as_of[symbol] = max(self._volume_as_of.get(symbol, 0), as_of)
+            self.logger.info(f"📥 {symbol}: докачано {len(klines)} свечей после подключения")
+            if closed is not None:
+                self._notify(symbol, closed)
+
+    async def _consume(self, ws):
+        ping_task = asyncio.create_task(self._ping_loop(ws))
+        stop_task = asyncio.create_task(self._stop_event.wait())
+        try:
+            while self.running:
+                receive_task = asyncio.create_task(ws.receive())
+                done, _ = await asyncio.wait({receive_task, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+                if stop_task in done:
+                    receive_task.cancel()
+                    await ws.close()
+                    return
+
+                msg = receive_task.result()
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self.handle_message(msg.data)
+                elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                    self.logger.warning(f"⚠️ WebSocket закрыт: {msg.type}")
+                    return
+        finally:
+            ping_task.cancel()
+            stop_task.cancel()
+
+    async def _ping_loop(self, ws):
+        while not ws.closed:
+            await asyncio.sleep(self.ping_interval)
+            await ws.send_json({'method': 'PING'})
+
+    def handle_message(self, raw: str):
+        """Разобрать сообщение потока и обновить буфер"""
+        try:
+            message = json.loads(raw)
+        except ValueError:
+            self.logger.warning(f"⚠️ Некорректное сообщение потока: {raw[:200]}")
+            return
+
+        channel = message.get('c', '')
+        symbol = message.get('s')
+        data = message.get('d') or {}
+        if not channel or symbol not in self.buffers:
+            return  # PONG и подтверждения подписки
+
+        self.messages_received += 1
+        try:
+            if channel.startswith('spot@public.kline'):
+                closed = self._apply_kline(symbol, data['k'], message.get('t'))
+            elif channel.startswith('spot@public.deals'):
+                closed = self._apply_deals(symbol, data.get('deals', []))
+            else:
+                return
+        except (KeyError, TypeError, ValueError) as e:
+            self.logger.warning(f"⚠️ Ошибка разбора {channel}: {e}")
+            return
+
+        if closed is not None:
+            self._notify(symbol, closed)
+
+    def _apply_kline(self, symbol: str, k: Dict, event_time: int = None) -> Optional[bool]:
+        # В потоке время окна в секундах, в REST - в миллисекундах
+        open_time = int(k['t']) * 1000
+        close_time = int(k['T']) * 1000
+        candle = [open_time, float(k['o']), float(k['h']), float(k['l']), float(k['c']),
+                  float(k['v']), close_time, float(k['a'])]
+
+        with self._lock:
+            # Свеча заменяется целиком: объем сделок, досчитанный до этого сообщения, в ней уже есть
+            if event_time is not None:
+                self._volume_as_of[symbol] = max(self._volume_as_of.get(symbol, 0), int(event_time))
+            return self.buffers[symbol].append(candle)
+
+    def _apply_deals(self, symbol: str, deals: List[Dict]) -> Optional[bool]:
+        if not self.interval_ms:
+            return None
+
+        closed = None
+        with self._lock:
+            buffer = self.buffers[symbol]
+            as_of = self._volume_as_of.get(symbol, 0)
+            for deal in deals:
+                trade_time = int(deal['t'])
+                if trade_time <= as_of:
+                    continue  # Уже учтена в объеме kline-сообщения или докачанной свечи
+                result = buffer.add_trade(trade_time, float(deal['p']), float(deal['v']), self.interval_ms)
+                if result is not None:
+                    closed = result or bool(closed)
+        return closed
+
+    def _notify(self, symbol: str, closed: bool):
+        if self.on_candle is None:
+            return
+
+        now = time.monotonic()
+        if not closed and now - self._last_notify.get(symbol, 0.0) < self.min_update_interval:
+            return
+        self._last_notify[symbol] = now
+
+        with self._lock:
+            if not closed:
+                if symbol in self._pending_updates:
+                    return
+                self._pending_updates.add(symbol)
+            self._events.put((symbol, closed))
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name='market-stream-handler',
+                                                    daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        while True:
+            try:
+                event = self._events.get(timeout=1.0)
+            except queue.Empty:
+                # Поток остановлен и событий нет - завершаемся (под блокировкой, чтобы
+                # _notify не поставил событие, которое никто не заберет)
+                with self._lock:
+                    if not self.running and self._events.empty():
+                        self._dispatcher = None
+                        return
+                continue
+            try:
+                symbol, closed = event
+                if not closed:
+                    with self._lock:
+                        self._pending_updates.discard(symbol)
+                try:
+                    self.on_candle(symbol, closed)
+                except Exception as e:
+                    self.logger.error(f"❌ Ошибка обработчика свечей {symbol}: {e}")
+            finally:
+                self._events.task_done()
+
+    def wait_dispatched(self):
+        """Дождаться обработки всех событий, поставленных в очередь"""
+        self._events.join()
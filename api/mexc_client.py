@@ -2,33 +2,140 @@ import hmac
 import hashlib
 import requests
 import time
-from typing import Dict, List
+from typing import Dict, List, Optional
 import logging
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils.metrics import LatencyRecorder, CallCounter, REGISTRY
+from api.kline_parser import KLINE_DTYPE, empty_klines, parse_klines, parse_klines_json
+from api.rate_limiter import RateLimiter, default_rate_limiter
+from utils.models import CandleBuffer
+
+# Правильные интервалы для MEXC
+VALID_INTERVALS = {
+    '1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m',
+    '60m': '60m', '4h': '4h', '8h': '8h', '1d': '1d', '1M': '1M'
+}
+
+# Длительность свечи в мс (у 1M нет фиксированной длительности)
+INTERVAL_MS = {
+    '1m': 60000, '5m': 300000, '15m': 900000, '30m': 1800000,
+    '60m': 3600000, '4h': 14400000, '8h': 28800000, '1d': 86400000
+}
+
+# Максимальный limit одного запроса /api/v3/klines
+MAX_KLINES_LIMIT = 1000
+
+# Цена BTCUSDT, если биржа недоступна и цена символа еще не получена
+FALLBACK_PRICE = 121812.54
+
+
+def resolve_interval(interval: str, valid_intervals: Dict[str, str] = VALID_INTERVALS) -> str:
+    """Интервал MEXC; сначала точное совпадение ('1M' - месяц, а не '1m'), затем без учета регистра"""
+    if interval in valid_intervals:
+        return valid_intervals[interval]
+    return valid_intervals.get(interval.lower(), '30m')
+
+# Метрики Prometheus (отдаются дашбордом на /metrics)
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'mexc_http_request_duration_seconds', 'MEXC REST request latency', ('endpoint',)
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    'mexc_http_requests_total', 'MEXC REST requests by endpoint and HTTP status', ('endpoint', 'status')
+)
+RATE_LIMIT_WAIT_SECONDS = REGISTRY.counter(
+    'mexc_rate_limit_wait_seconds_total', 'Time spent waiting in MexcClient._rate_limit', ('bucket',)
+)
+RATE_LIMIT_THROTTLED = REGISTRY.counter(
+    'mexc_rate_limit_throttled_total', 'Requests delayed by MexcClient._rate_limit', ('bucket',)
+)
 
 class MexcClient:
-    def __init__(self, api_key: str, secret_key: str):
+    def __init__(self, api_key: str, secret_key: str, candle_store=None, rate_limiter: RateLimiter = None):
         self.base_url = "https://api.mexc.com"
         self.api_key = api_key
         self.secret_key = secret_key
         self.logger = logging.getLogger(__name__)
         
-        # Правильные интервалы для MEXC
-        self.valid_intervals = {
-            '1m': '1m', '5m': '5m', '15m': '15m', '30m': '30m',
-            '60m': '60m', '4h': '4h', '8h': '8h', '1d': '1d', '1M': '1M'
-        }
+        # Локальный кэш свечей (api.candle_store.CandleStore): с ним get_klines
+        # докачивает только свечи новее последней сохраненной
+        self.candle_store = candle_store
+        
+        self.valid_intervals = dict(VALID_INTERVALS)
+        
+        # Последние цены с биржи по символам (резерв при ошибке запроса)
+        self.last_prices: Dict[str, float] = {}
         
-        # Rate limiting
-        self.last_request_time = 0
-        self.min_request_interval = 0.2  # 200ms between requests
+        # Rate limiting: взвешенные bucket по классам endpoint, общие для всех
+        # клиентов процесса (или процессов - RateLimiter с state_path)
+        self.rate_limiter = rate_limiter or default_rate_limiter()
+        
+        # Одна keep-alive сессия на клиент вместо нового TCP+TLS на каждый запрос
+        self.session = self._create_session()
+        
+        # Гистограммы задержек, счетчики вызовов и ошибок по endpoint
+        self.latency = LatencyRecorder()
+        self.calls = CallCounter()
+    
+    def _create_session(self, pool_size: int = 10) -> requests.Session:
+        """Сессия с пулом соединений и повторами при ошибках подключения и 5xx"""
+        retry = Retry(
+            total=3,
+            connect=3,
+            read=0,
+            status=3,
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),  # POST /order не повторяем по 5xx
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
     
-    def _rate_limit(self):
+    def _request(self, method: str, endpoint: str, **kwargs) -> requests.Response:
+        """HTTP-запрос через общую сессию с замером задержки; ответы 429/418 замедляют лимит"""
+        started = time.perf_counter()
+        status = 'error'
+        error = True
+        try:
+            response = self.session.request(method, f"{self.base_url}{endpoint}", **kwargs)
+            status = response.status_code
+            error = status >= 400
+            self.rate_limiter.update(method, endpoint, status, response.headers.get('Retry-After'))
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            self.latency.observe(endpoint, elapsed)
+            self.calls.record(endpoint, error)
+            HTTP_REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+            HTTP_REQUESTS.labels(endpoint, status).inc()
+    
+    def get_latency_stats(self) -> Dict[str, Dict]:
+        """p50/p95/p99 задержек по каждому endpoint"""
+        return self.latency.snapshot()
+    
+    def get_call_stats(self) -> Dict:
+        """Число вызовов API, ошибок (исключения и HTTP 4xx/5xx) и доля ошибок"""
+        return self.calls.snapshot()
+    
+    def close(self):
+        """Закрыть соединения пула"""
+        self.session.close()
+    
+    def _rate_limit(self, method: str = 'GET', endpoint: str = None):
         """Rate limiting to avoid API restrictions"""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.min_request_interval:
-            time.sleep(self.min_request_interval - time_since_last)
-        self.last_request_time = time.time()
+        bucket, weight = self.rate_limiter.classify(method, endpoint)
+        waited = self.rate_limiter.reserve(bucket, weight)
+        if waited > 0:
+            time.sleep(waited)
+            RATE_LIMIT_WAIT_SECONDS.labels(bucket).inc(waited)
+            RATE_LIMIT_THROTTLED.labels(bucket).inc()
     
     def _generate_signature(self, params: Dict) -> str:
         query_string = '&'.join([f"{k}={v}" for k, v in sorted(params.items())])
@@ -47,11 +154,12 @@ class MexcClient:
         Returns:
             float: Текущая цена
         """
-        self._rate_limit()
+        self._rate_limit('GET', "/api/v3/ticker/price")
         
         try:
-            response = requests.get(
-                f"{self.base_url}/api/v3/ticker/price",
+            response = self._request(
+                'GET',
+                "/api/v3/ticker/price",
                 params={'symbol': symbol},
                 timeout=10
             )
@@ -59,97 +167,234 @@ class MexcClient:
             if response.status_code == 200:
                 data = response.json()
                 price = float(data['price'])
+                self.last_prices[symbol] = price
                 self.logger.info(f"✅ Текущая цена {symbol}: ${price:.2f}")
                 return price
             else:
                 self.logger.error(f"❌ Ошибка получения цены: {response.status_code}")
-                return 121812.54  # Fallback price
+                return self.fallback_price(symbol)
                 
         except Exception as e:
             self.logger.error(f"❌ Ошибка получения текущей цены: {e}")
-            return 121812.54  # Fallback price
+            return self.fallback_price(symbol)
+    
+    def fallback_price(self, symbol: str) -> float:
+        """Последняя полученная цена символа; без нее - FALLBACK_PRICE (цена BTCUSDT)"""
+        return self.last_prices.get(symbol, FALLBACK_PRICE)
+    
+    def get_klines(self, symbol: str, interval: str = '30m', limit: int = 100,
+                   start_time: int = None, end_time: int = None) -> List:
+        """Get candle data with improved error handling
+        
+        С start_time/end_time (мс) - свечи из диапазона напрямую с биржи,
+        без кэша и тестовых данных (пустой список, если свечей нет, None при ошибке).
+        """
+        if start_time is not None or end_time is not None:
+            return self._fetch_klines(symbol, interval, min(limit, MAX_KLINES_LIMIT),
+                                      start_time=start_time, end_time=end_time)
+        if self.candle_store is not None:
+            data = self._sync_candle_store(symbol, interval, limit)
+        else:
+            data = self._fetch_klines(symbol, interval, limit)
+        
+        return data if data else self._generate_fallback_data()
+    
+    def get_klines_array(self, symbol: str, interval: str = '30m', limit: int = 100,
+                         buffer: CandleBuffer = None, fallback: bool = True) -> np.ndarray:
+        """Свечи структурированным массивом (api.kline_parser.KLINE_DTYPE)
+        
+        Без кэша тело ответа разбирается сразу в колонки float64/int64,
+        минуя списки строк из response.json(). С buffer (utils.models.CandleBuffer
+        символа) докачиваются только свечи новее последней в буфере, а
+        возвращаются последние limit свечей из него; с candle_store буфер
+        читается из SQLite только при первом заполнении или после разрыва.
+        Без данных биржи - тестовые свечи, с fallback=False - пустой массив:
+        так вызывающий отличает реальные свечи от синтетических.
+        """
+        start_time = None
+        if self.candle_store is not None and buffer is not None:
+            # Новые свечи дописываются прямо в буфер, SQLite читается только при заполнении
+            self._sync_candle_buffer(symbol, interval, limit, buffer)
+            klines = None
+        elif self.candle_store is not None:
+            data = self._sync_candle_store(symbol, interval, limit)
+            klines = parse_klines(data) if data else None
+        elif buffer is not None:
+            start_time, count = self._buffer_request(buffer, interval, limit)
+            klines = self._fetch_klines(symbol, interval, count, start_time=start_time, raw=True)
+            if klines is None and len(buffer):
+                self.logger.warning(f"⚠️ Использую свечи {symbol} из буфера без обновления")
+        else:
+            klines = self._fetch_klines(symbol, interval, limit, raw=True)
+        
+        if buffer is not None and klines is not None and len(klines):
+            if start_time is None or klines['open_time'][0] > start_time:
+                # Полное окно или разрыв истории - буфер заполняется заново
+                buffer.clear()
+            buffer.extend(klines)
+        if buffer is not None and len(buffer):
+            klines = buffer.to_array(limit)
+        
+        if klines is not None and len(klines):
+            return klines
+        return self._generate_fallback_array() if fallback else empty_klines()
+    
+    def _buffer_request(self, buffer: CandleBuffer, interval: str, limit: int):
+        """(startTime, limit) запроса, дополняющего буфер, как в _sync_candle_store"""
+        interval_ms = INTERVAL_MS.get(resolve_interval(interval, self.valid_intervals))
+        if len(buffer) < limit or interval_ms is None:
+            return None, min(limit, MAX_KLINES_LIMIT)
+        
+        missing = (int(time.time() * 1000) - buffer.last_open_time) // interval_ms + 1
+        if missing >= MAX_KLINES_LIMIT:
+            # Разрыв больше одной страницы - свежее окно
+            return None, min(limit, MAX_KLINES_LIMIT)
+        # Последняя свеча буфера могла быть незакрытой - запрашиваем с нее
+        return buffer.last_open_time, int(max(missing, 1))
+    
+    def _sync_candle_store(self, symbol: str, interval: str, limit: int) -> Optional[List]:
+        """Докачать в локальный кэш новые свечи и отдать последние limit из него"""
+        self._update_candle_store(symbol, interval, limit)
+        return self.candle_store.get_klines(symbol, resolve_interval(interval, self.valid_intervals), limit)
+    
+    def _sync_candle_buffer(self, symbol: str, interval: str, limit: int, buffer: CandleBuffer):
+        """Докачать в локальный кэш новые свечи и дописать их в буфер символа
+        
+        Если буфер заканчивается той же свечой, с которой шел запрос, в него
+        добавляются только свечи ответа. Иначе (первый вызов, разрыв истории,
+        кэш пополнил другой процесс) буфер заполняется из кэша заново.
+        """
+        data, start_time = self._update_candle_store(symbol, interval, limit)
+        if data and start_time is not None and len(buffer) and buffer.last_open_time == start_time:
+            buffer.extend(data)
+        elif data or not len(buffer):
+            mexc_interval = resolve_interval(interval, self.valid_intervals)
+            buffer.clear()
+            buffer.extend(self.candle_store.get_klines(symbol, mexc_interval, limit))
+    
+    def _update_candle_store(self, symbol: str, interval: str, limit: int):
+        """Запросить свечи новее сохраненных и записать их в кэш
+        
+        Возвращает (свечи ответа или None, startTime запроса или None для полного окна).
+        """
+        mexc_interval = resolve_interval(interval, self.valid_intervals)
+        last_open_time = self.candle_store.last_open_time(symbol, mexc_interval)
+        interval_ms = INTERVAL_MS.get(mexc_interval)
+        start_time = None
+        
+        if (last_open_time is None or interval_ms is None
+                or self.candle_store.count(symbol, mexc_interval) < limit):
+            # Кэш пуст или короче запроса - берем полное окно
+            data = self._fetch_klines(symbol, interval, min(limit, MAX_KLINES_LIMIT))
+        else:
+            missing = (int(time.time() * 1000) - last_open_time) // interval_ms + 1
+            if missing >= MAX_KLINES_LIMIT:
+                # Разрыв больше одной страницы - свежее окно без дозаполнения дыры
+                data = self._fetch_klines(symbol, interval, min(limit, MAX_KLINES_LIMIT))
+            else:
+                # Последняя сохраненная свеча могла быть незакрытой - запрашиваем с нее
+                start_time = last_open_time
+                data = self._fetch_klines(symbol, interval, MAX_KLINES_LIMIT, start_time=last_open_time)
+        
+        if data:
+            self.candle_store.upsert(symbol, mexc_interval, data)
+        elif last_open_time is not None:
+            self.logger.warning(f"⚠️ Использую сохраненные свечи {symbol} без обновления")
+        
+        return data, start_time
     
-    def get_klines(self, symbol: str, interval: str = '30m', limit: int = 100) -> List:
-        """Get candle data with improved error handling"""
-        self._rate_limit()
+    def _fetch_klines(self, symbol: str, interval: str = '30m', limit: int = 100,
+                      start_time: int = None, end_time: int = None, raw: bool = False):
+        """Запрос /api/v3/klines; None при любой ошибке, пустой результат - если свечей нет
         
+        raw=True - массив KLINE_DTYPE, разобранный прямо из тела ответа.
+        """
         endpoint = "/api/v3/klines"
-        mexc_interval = self.valid_intervals.get(interval.lower(), '30m')
+        self._rate_limit('GET', endpoint)
+        mexc_interval = resolve_interval(interval, self.valid_intervals)
         
         params = {
             'symbol': symbol,
             'interval': mexc_interval,
             'limit': limit
         }
+        if start_time is not None:
+            params['startTime'] = int(start_time)
+        if end_time is not None:
+            params['endTime'] = int(end_time)
         
         try:
             self.logger.info(f"📡 Запрос данных {symbol} с интервалом {mexc_interval}")
-            response = requests.get(f"{self.base_url}{endpoint}", params=params, timeout=15)
+            response = self._request('GET', endpoint, params=params, timeout=15)
             
             if response.status_code != 200:
                 self.logger.error(f"❌ MEXC API error {response.status_code}: {response.text}")
-                return self._generate_fallback_data()
+                return None
             
-            data = response.json()
+            if raw and not response.content.lstrip().startswith(b'{'):
+                data = parse_klines_json(response.content)
+            else:
+                data = response.json()
             
             # Проверяем корректность данных
             if isinstance(data, dict) and 'code' in data:
                 self.logger.error(f"❌ MEXC API returned error: {data}")
-                return self._generate_fallback_data()
+                return None
                 
-            if not data or len(data) == 0:
+            if data is None:
                 self.logger.warning("⚠️ MEXC API returned empty data")
-                return self._generate_fallback_data()
+                return None
+            if len(data) == 0:
+                # Свечей в окне нет (например, до листинга) - это не ошибка
+                self.logger.warning("⚠️ MEXC API returned empty data")
+                return data
                 
             self.logger.info(f"✅ Успешно получено {len(data)} свечей для {symbol}")
             return data
             
         except requests.exceptions.Timeout:
             self.logger.error("⏰ Таймаут запроса к MEXC API")
-            return self._generate_fallback_data()
+            return None
         except requests.exceptions.ConnectionError:
             self.logger.error("🔌 Ошибка подключения к MEXC API")
-            return self._generate_fallback_data()
+            return None
         except Exception as e:
             self.logger.error(f"❌ Неожиданная ошибка при запросе к MEXC: {e}")
-            return self._generate_fallback_data()
+            return None
     
     def _generate_fallback_data(self):
         """Генерирует реалистичные тестовые данные при недоступности API"""
-        import random
-        import time
-        
+        return [list(kline) for kline in self._generate_fallback_array().tolist()]
+    
+    def _generate_fallback_array(self, rows: int = 100) -> np.ndarray:
+        """Тестовые свечи сразу числами (без строк, которые пришлось бы разбирать обратно)"""
+        rng = np.random.default_rng()
         base_price = 121695.25  # Текущая цена из ваших данных
-        data = []
         current_time = int(time.time() * 1000)
         
-        for i in range(100):
-            # Более реалистичное движение цены
-            price_variation = random.uniform(-0.015, 0.015)  # ±1.5%
-            current_price = base_price * (1 + price_variation)
-            
-            kline = [
-                current_time - (100 - i) * 1800000,  # open_time (30min intervals)
-                str(current_price * 0.998),          # open
-                str(current_price * 1.004),          # high
-                str(current_price * 0.996),          # low
-                str(current_price),                  # close
-                str(random.uniform(1000, 5000)),     # volume
-                current_time - (99 - i) * 1800000,   # close_time
-                str(random.uniform(50000, 200000)),  # quote_volume
-            ]
-            data.append(kline)
-            
-        return data
+        # Более реалистичное движение цены: ±1.5% вокруг базовой
+        prices = base_price * (1 + rng.uniform(-0.015, 0.015, rows))
+        offsets = np.arange(rows, dtype=np.int64)
+        
+        klines = np.empty(rows, dtype=KLINE_DTYPE)
+        klines['open_time'] = current_time - (rows - offsets) * 1800000  # 30min intervals
+        klines['open'] = prices * 0.998
+        klines['high'] = prices * 1.004
+        klines['low'] = prices * 0.996
+        klines['close'] = prices
+        klines['volume'] = rng.uniform(1000, 5000, rows)
+        klines['close_time'] = current_time - (rows - 1 - offsets) * 1800000
+        klines['quote_asset_volume'] = rng.uniform(50000, 200000, rows)
+        return klines
     
     def get_ticker_price(self, symbol: str) -> Dict:
         """Получить текущую цену тикера"""
-        self._rate_limit()
         endpoint = "/api/v3/ticker/price"
+        self._rate_limit('GET', endpoint)
         params = {'symbol': symbol}
         
         try:
-            response = requests.get(f"{self.base_url}{endpoint}", params=params, timeout=10)
+            response = self._request('GET', endpoint, params=params, timeout=10)
             if response.status_code == 200:
                 data = response.json()
                 self.logger.info(f"Current {symbol} price: {data.get('price')}")
@@ -161,53 +406,85 @@ class MexcClient:
             self.logger.error(f"Error fetching ticker price: {e}")
             return {'symbol': symbol, 'price': '121695.25'}  # Fallback price from your data
     
-    def get_account_info(self) -> Dict:
-        """Get account information"""
-        self._rate_limit()
-        endpoint = "/api/v3/account"
-        params = {
-            'timestamp': int(time.time() * 1000),
-            'recvWindow': 5000
-        }
-        
+    def _signed_request(self, method: str, endpoint: str, params: Dict = None, timeout: int = 10) -> requests.Response:
+        """Подписанный запрос: timestamp, recvWindow, signature и X-MEXC-APIKEY"""
+        # Ждем лимит до подписи: timestamp должен уложиться в recvWindow
+        self._rate_limit(method, endpoint)
+        params = dict(params or {})
+        params['timestamp'] = int(time.time() * 1000)
+        params['recvWindow'] = 5000
+        # Параметры уходят в том же порядке, в котором подписаны
+        params = dict(sorted(params.items()))
         params['signature'] = self._generate_signature(params)
         
         headers = {
             'X-MEXC-APIKEY': self.api_key
         }
-        
-        response = requests.get(
-            f"{self.base_url}{endpoint}",
-            params=params,
-            headers=headers
-        )
+        return self._request(method, endpoint, params=params, headers=headers, timeout=timeout)
+    
+    def get_account_info(self) -> Dict:
+        """Get account information"""
+        response = self._signed_request('GET', "/api/v3/account")
         return response.json()
     
-    def create_order(self, symbol: str, side: str, order_type: str, quantity: float, price: float = None) -> Dict:
-        """Create order"""
-        self._rate_limit()
-        endpoint = "/api/v3/order"
+    def create_order(self, symbol: str, side: str, order_type: str, quantity: float, price: float = None,
+                     client_order_id: str = None) -> Dict:
+        """Create order
+        
+        client_order_id (newClientOrderId) делает повтор безопасным: биржа
+        не примет второй ордер с тем же id, а его состояние можно узнать
+        через query_order.
+        """
         params = {
             'symbol': symbol,
             'side': side.upper(),  # BUY or SELL
             'type': order_type.upper(),  # LIMIT, MARKET
-            'quantity': quantity,
-            'timestamp': int(time.time() * 1000),
-            'recvWindow': 5000
+            'quantity': quantity
         }
         
         if price:
             params['price'] = price
+        if client_order_id:
+            params['newClientOrderId'] = client_order_id
         
-        params['signature'] = self._generate_signature(params)
-        
-        headers = {
-            'X-MEXC-APIKEY': self.api_key
-        }
-        
-        response = requests.post(
-            f"{self.base_url}{endpoint}",
-            params=params,
-            headers=headers
-        )
-        return response.json()
\ No newline at end of file
+        response = self._signed_request('POST', "/api/v3/order", params)
+        return response.json()
+    
+    def query_order(self, symbol: str, order_id: str = None, client_order_id: str = None) -> Dict:
+        """Состояние ордера по orderId или origClientOrderId"""
+        params = {'symbol': symbol}
+        if order_id:
+            params['orderId'] = order_id
+        if client_order_id:
+            params['origClientOrderId'] = client_order_id
+        response = self._signed_request('GET', "/api/v3/order", params)
+        return response.json()
+    
+    def cancel_order(self, symbol: str, order_id: str = None, client_order_id: str = None) -> Dict:
+        """Отменить ордер по orderId или origClientOrderId"""
+        params = {'symbol': symbol}
+        if order_id:
+            params['orderId'] = order_id
+        if client_order_id:
+            params['origClientOrderId'] = client_order_id
+        response = self._signed_request('DELETE', "/api/v3/order", params)
+        return response.json()
+    
+    def get_open_orders(self, symbol: str) -> List[Dict]:
+        """Открытые ордера символа"""
+        response = self._signed_request('GET', "/api/v3/openOrders", {'symbol': symbol})
+        return response.json()
+    
+    def create_listen_key(self) -> str:
+        """listenKey для приватного потока ордеров и сделок (действует 60 минут)"""
+        response = self._signed_request('POST', "/api/v3/userDataStream")
+        return response.json()['listenKey']
+    
+    def keepalive_listen_key(self, listen_key: str) -> Dict:
+        """Продлить listenKey еще на 60 минут"""
+        response = self._signed_request('PUT', "/api/v3/userDataStream", {'listenKey': listen_key})
+        return response.json()
+    
+    def close_listen_key(self, listen_key: str) -> Dict:
+        response = self._signed_request('DELETE', "/api/v3/userDataStream", {'listenKey': listen_key})
+        return response.json()
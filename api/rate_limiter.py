@@ -0,0 +1,306 @@
+"""Лимит запросов к MEXC: взвешенные token bucket по классам endpoint
+
+Каждый endpoint относится к классу (market, account, order) и стоит
+weight токенов его bucket. Состояние bucket лежит в небольшом буфере:
+в памяти процесса или в файле, отображенном в память (mmap) под
+файловой блокировкой - тогда бюджет общий для всех процессов (бот,
+дашборд, python -m api.backfill), использующих один state_path.
+
+Ожидание не держит блокировок: под блокировкой токены только
+резервируются (баланс может уйти в минус), а вызывающий спит
+вычисленное время. Поэтому один лимитер безопасно делят потоки
+(acquire) и корутины asyncio (acquire_async).
+
+Ответ 429/418 останавливает bucket на Retry-After (или на
+экспоненциальную паузу) и вдвое снижает скорость пополнения; скорость
+линейно восстанавливается до номинала за 1/recovery секунд.
+"""
+import os
+import time
+import mmap
+import struct
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from utils.metrics import REGISTRY
+
+# (метод, endpoint) -> (класс, вес); веса по документации MEXC Spot v3
+ENDPOINT_WEIGHTS = {
+    ('GET', '/api/v3/klines'): ('market', 1),
+    ('GET', '/api/v3/ticker/price'): ('market', 1),
+    ('GET', '/api/v3/account'): ('account', 10),
+    ('GET', '/api/v3/order'): ('account', 2),
+    ('GET', '/api/v3/openOrders'): ('account', 3),
+    ('POST', '/api/v3/order'): ('order', 1),
+    ('DELETE', '/api/v3/order'): ('order', 1),
+    ('POST', '/api/v3/userDataStream'): ('account', 1),
+    ('PUT', '/api/v3/userDataStream'): ('account', 1),
+    ('DELETE', '/api/v3/userDataStream'): ('account', 1),
+}
+
+# Токенов в секунду и запас; MEXC допускает 500 веса за 10 секунд на endpoint,
+# оставляем запас 20%
+DEFAULT_BUCKETS = {
+    'market': {'rate': 40.0, 'capacity': 100.0},
+    'account': {'rate': 10.0, 'capacity': 20.0},
+    'order': {'rate': 5.0, 'capacity': 10.0},
+}
+
+BACKOFF_STATUSES = (418, 429)
+
+RATE_LIMIT_BACKOFFS = REGISTRY.counter(
+    'mexc_rate_limit_backoff_total', 'HTTP 429/418 responses that paused a rate limit bucket', ('bucket',)
+)
+
+# Состояние bucket: токены, время пополнения, доля скорости, время пересчета доли, 429 подряд
+_SLOT = struct.Struct('<5d')
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """Секунды из заголовка Retry-After (дата HTTP не поддерживается)"""
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Взвешенные token bucket для потоков, корутин и процессов
+
+    state_path=None - бюджет только этого процесса; путь к файлу -
+    бюджет всех процессов с тем же файлом (fcntl.flock, на Windows
+    msvcrt.locking; без них - только процесс, с предупреждением).
+    """
+
+    def __init__(self, buckets: Dict[str, Dict] = None, weights: Dict[Tuple[str, str], Tuple[str, int]] = None,
+                 state_path: str = None, default_bucket: str = 'market', backoff: float = 1.0,
+                 max_backoff: float = 60.0, decrease: float = 0.5, min_factor: float = 0.1,
+                 recovery: float = 0.05):
+        self.buckets = {name: dict(spec) for name, spec in (buckets or DEFAULT_BUCKETS).items()}
+        self.weights = dict(ENDPOINT_WEIGHTS if weights is None else weights)
+        self.default_bucket = default_bucket if default_bucket in self.buckets else next(iter(self.buckets))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.decrease = decrease
+        self.min_factor = min_factor
+        self.recovery = recovery
+        self.state_path = state_path
+        self.logger = logging.getLogger(__name__)
+
+        # Слоты в файле упорядочены по имени: процессы с одинаковыми buckets видят одну раскладку
+        self._slots = {name: index for index, name in enumerate(sorted(self.buckets))}
+        self._lock = threading.Lock()
+        self._lock_file = None
+        self._stats = {'acquired': 0, 'throttled': 0, 'waited': 0.0, 'backoffs': 0}
+
+        size = _SLOT.size * len(self._slots)
+        if state_path:
+            self._buffer = self._open_shared(state_path, size)
+        else:
+            self._buffer = bytearray(size)
+
+    @classmethod
+    def from_settings(cls, settings: Dict, project_root: str = None) -> 'RateLimiter':
+        """Лимитер по RATE_LIMIT_SETTINGS; state_path относительно project_root"""
+        settings = dict(settings or {})
+        state_path = settings.pop('state_path', None)
+        if state_path and project_root and not os.path.isabs(state_path):
+            state_path = os.path.join(project_root, state_path)
+        weights = settings.pop('weights', None)
+        if weights is not None:
+            weights = {tuple(key.split(' ', 1)): tuple(value) for key, value in weights.items()}
+        return cls(state_path=state_path, weights=weights, **settings)
+
+    def _open_shared(self, path: str, size: int):
+        if fcntl is None and msvcrt is None:
+            self.logger.warning("⚠️ Нет файловых блокировок: лимит запросов только в пределах процесса")
+            self.state_path = None
+            return bytearray(size)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = open(f"{path}.lock", 'a+b')
+        with self._file_lock():
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size != size:
+                    # Новый файл или другой набор buckets - начинаем с полных bucket
+                    os.ftruncate(fd, 0)
+                    os.ftruncate(fd, size)
+                return mmap.mmap(fd, size)
+            finally:
+                os.close(fd)
+
+    @contextmanager
+    def _file_lock(self):
+        if self._lock_file is None:
+            yield
+            return
+        fd = self._lock_file.fileno()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            with self._file_lock():
+                yield
+
+    def classify(self, method: str, endpoint: str) -> Tuple[str, int]:
+        """Класс и вес запроса; неизвестный endpoint - default_bucket с весом 1"""
+        return self.weights.get((method.upper(), endpoint), (self.default_bucket, 1))
+
+    def _load(self, bucket: str, now: float) -> list:
+        tokens, updated, factor, factor_at, strikes = _SLOT.unpack_from(self._buffer, self._slots[bucket] * _SLOT.size)
+        spec = self.buckets[bucket]
+        # Пустой слот или время ушло назад (часы переведены) - полный bucket
+        horizon = now + self.max_backoff + spec['capacity'] / spec['rate']
+        if updated <= 0 or updated > horizon or factor_at > horizon:
+            return [spec['capacity'], now, 1.0, now, 0.0]
+        return [tokens, updated, factor, factor_at, strikes]
+
+    def _store(self, bucket: str, state: list):
+        _SLOT.pack_into(self._buffer, self._slots[bucket] * _SLOT.size, *state)
+
+    def _refill(self, bucket: str, state: list, now: float):
+        spec = self.buckets[bucket]
+        tokens, updated, factor, factor_at, strikes = state
+        if now > updated:
+            tokens = min(spec['capacity'], tokens + (now - updated) * spec['rate'] * factor)
+            updated = now
+        if factor < 1.0 and now > factor_at:
+            factor = min(1.0, factor + (now - factor_at) * self.recovery)
+            factor_at = now
+        state[:] = [tokens, updated, factor, factor_at, strikes]
+
+    def reserve(self, bucket: str, weight: float = 1) -> float:
+        """Зарезервировать weight токенов; вернуть, сколько секунд ждать до запроса"""
+        now = time.time()
+        with self._locked():
+            state = self._load(bucket, now)
+            self._refill(bucket, state, now)
+            state[0] -= weight
+            tokens, updated, factor = state[0], state[1], state[2]
+            self._store(bucket, state)
+
+        # До updated bucket на паузе (429), дефицит пополняется после нее
+        wait = max(updated - now, 0.0)
+        if tokens < 0:
+            wait += -tokens / (self.buckets[bucket]['rate'] * factor)
+        with self._lock:
+            self._stats['acquired'] += 1
+            if wait > 0:
+                self._stats['throttled'] += 1
+                self._stats['waited'] += wait
+        return wait
+
+    def acquire(self, method: str = 'GET', endpoint: str = None) -> float:
+        """Дождаться права на запрос (потоки); вернуть время ожидания"""
+        wait = self.reserve(*self.classify(method, endpoint))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, method: str = 'GET', endpoint: str = None) -> float:
+        """То же для asyncio: ожидание не блокирует цикл событий"""
+        wait = self.reserve(*self.classify(method, endpoint))
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def update(self, method: str, endpoint: str, status: int, retry_after=None) -> Optional[float]:
+        """Учесть ответ биржи: на 429/418 - пауза bucket и снижение скорости
+
+        Возвращает длительность паузы или None, если ответ не ограничение.
+        """
+        bucket, _ = self.classify(method, endpoint)
+        now = time.time()
+        with self._locked():
+            state = self._load(bucket, now)
+            self._refill(bucket, state, now)
+            if status not in BACKOFF_STATUSES:
+                if state[4]:
+                    state[4] = 0.0
+                    self._store(bucket, state)
+                return None
+
+            strikes = state[4] + 1
+            pause = parse_retry_after(retry_after)
+            if pause is None:
+                pause = min(self.backoff * 2 ** (strikes - 1), self.max_backoff)
+            pause = min(pause, self.max_backoff)
+            resume = now + pause
+            factor = max(self.min_factor, state[2] * self.decrease)
+            # Токены, зарезервированные до паузы, остаются долгом и ждут после нее
+            state[:] = [min(state[0], 0.0), max(state[1], resume), factor, max(state[3], resume), strikes]
+            self._store(bucket, state)
+
+        with self._lock:
+            self._stats['backoffs'] += 1
+        RATE_LIMIT_BACKOFFS.labels(bucket).inc()
+        self.logger.warning(f"⛔ HTTP {status} на {method} {endpoint}: bucket {bucket} на паузе {pause:.1f}с, "
+                            f"скорость {factor:.0%} от номинала")
+        return pause
+
+    def snapshot(self) -> Dict:
+        """Токены, доля скорости и пауза каждого bucket плюс счетчики этого процесса"""
+        now = time.time()
+        buckets = {}
+        with self._locked():
+            for bucket in self.buckets:
+                state = self._load(bucket, now)
+                self._refill(bucket, state, now)
+                buckets[bucket] = {
+                    'tokens': round(state[0], 3),
+                    'capacity': self.buckets[bucket]['capacity'],
+                    'rate': round(self.buckets[bucket]['rate'] * state[2], 3),
+                    'paused_for': round(max(state[1] - now, 0.0), 3),
+                    'strikes': int(state[4])
+                }
+        with self._lock:
+            stats = dict(self._stats, waited=round(self._stats['waited'], 3))
+        return {'shared': self.state_path is not None, 'buckets': buckets, **stats}
+
+    def close(self):
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+_default_limiter: Optional[RateLimiter] = None
+_default_lock = threading.Lock()
+
+
+def default_rate_limiter() -> RateLimiter:
+    """Лимитер процесса по умолчанию: общий для всех MexcClient без явного rate_limiter"""
+    global _default_limiter
+    with _default_lock:
+        if _default_limiter is None:
+            _default_limiter = RateLimiter()
+        return _default_limiter
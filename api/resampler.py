@@ -0,0 +1,99 @@
+import logging
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from api.mexc_client import INTERVAL_MS
+from api.kline_parser import aggregate_klines, parse_klines
+from utils.models import CandleBuffer
+
+DEFAULT_TIMEFRAMES = ('5m', '15m', '30m', '60m', '4h')
+
+
+class CandleResampler:
+    """Старшие таймфреймы одного символа из потока свечей базового интервала
+
+    update() принимает новые и обновленные свечи base_interval (например,
+    1m из REST или WebSocket) и пересобирает в каждом таймфрейме только
+    затронутые свечи - обычно одну последнюю, незакрытую. Базовый буфер
+    хранит не меньше базовых свечей, чем в двух самых длинных из них,
+    поэтому свеча собирается целиком, даже если пачка update() переходит
+    через ее границу. Свеча таймфрейма, начало которой старше
+    базового буфера, не пересобирается: ее частичная версия исказила бы
+    open и объем. Глубокую историю таймфреймов дает seed() - один запрос
+    на таймфрейм при старте, дальше запросы нужны только базовому.
+    """
+
+    def __init__(self, intervals: Iterable[str] = DEFAULT_TIMEFRAMES, base_interval: str = '1m',
+                 capacity: int = 500, base_capacity: int = None):
+        if base_interval not in INTERVAL_MS:
+            raise ValueError(f"Базовый интервал {base_interval} без фиксированной длительности")
+        self.base_interval = base_interval
+        self.base_ms = INTERVAL_MS[base_interval]
+
+        self.intervals_ms: Dict[str, int] = {}
+        for interval in intervals:
+            interval_ms = INTERVAL_MS.get(interval)
+            if interval_ms is None or interval_ms % self.base_ms:
+                raise ValueError(f"Интервал {interval} не кратен базовому {base_interval}")
+            self.intervals_ms[interval] = interval_ms
+
+        longest = max(self.intervals_ms.values(), default=self.base_ms) // self.base_ms
+        self.base = CandleBuffer(max(base_capacity or capacity, 2 * longest))
+        self.buffers: Dict[str, CandleBuffer] = {
+            interval: self.base if interval == base_interval else CandleBuffer(capacity)
+            for interval in self.intervals_ms
+        }
+        self.logger = logging.getLogger(__name__)
+
+    def seed(self, interval: str, klines):
+        """Начальная история таймфрейма (например, из get_klines_array)"""
+        buffer = self.buffers[interval]
+        buffer.clear()
+        buffer.extend(klines)
+
+    def update(self, klines) -> Dict[str, Optional[bool]]:
+        """Учесть свечи базового интервала (по возрастанию open_time)
+
+        Свечи старше последней в базовом буфере пропускаются, поэтому можно
+        передавать весь буфер клиента целиком. Возвращает для каждого
+        таймфрейма результат CandleBuffer.extend: True - появилась новая
+        свеча, False - обновлена последняя, None - без изменений.
+        """
+        klines = parse_klines(klines)
+        last_open_time = self.base.last_open_time
+        if last_open_time is not None:
+            klines = klines[klines['open_time'] >= last_open_time]
+        if len(klines) == 0:
+            return {}
+        base_changed = self.base.extend(klines)
+
+        first = int(klines['open_time'][0])
+        starts = {interval: first - first % interval_ms for interval, interval_ms in self.intervals_ms.items()
+                  if interval != self.base_interval}
+        if not starts:
+            return {self.base_interval: base_changed}
+
+        # Одна копия хвоста базового буфера от самой ранней затронутой свечи (плюс одна
+        # свеча перед ней - признак того, что начало свечи таймфрейма есть в буфере)
+        earliest = min(starts.values())
+        count = (self.base.last_open_time - earliest) // self.base_ms + 2
+        window = self.base.to_array(int(count))
+        open_times = window['open_time']
+        oldest = int(open_times[0])
+        covered_all = len(window) < len(self.base) or oldest < earliest
+
+        changed = {self.base_interval: base_changed} if self.base_interval in self.intervals_ms else {}
+        for interval, start in starts.items():
+            if not covered_all and oldest > start:
+                # Начало свечи вне буфера - первую (неполную) свечу пропускаем
+                interval_ms = self.intervals_ms[interval]
+                start = oldest - oldest % interval_ms + interval_ms
+            tail = window[int(np.searchsorted(open_times, start)):]
+            if len(tail):
+                changed[interval] = self.buffers[interval].extend(aggregate_klines(tail, self.intervals_ms[interval]))
+        return changed
+
+    def frames(self) -> Dict[str, CandleBuffer]:
+        """Буферы таймфреймов (для AIAnalysisEngine.get_multi_timeframe_recommendation)"""
+        return dict(self.buffers)
@@ -0,0 +1,482 @@
+import time
+import random
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from api.mexc_client import VALID_INTERVALS, INTERVAL_MS
+from api.kline_parser import KLINE_DTYPE, parse_klines, empty_klines, aggregate_klines
+from utils.metrics import LatencyRecorder, CallCounter
+from utils.models import CandleBuffer
+
+# Котируемые активы для разбора символа BTCUSDT -> (BTC, USDT)
+QUOTE_ASSETS = ('USDT', 'USDC', 'BTC', 'ETH')
+
+# Точки пути цены внутри свечи: O -> L -> H -> C для растущей, O -> H -> L -> C для падающей
+_PATH_FRACTIONS = np.array([0.0, 1 / 3, 2 / 3, 1.0])
+
+
+def split_symbol(symbol: str):
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return symbol, 'USDT'
+
+
+def synthetic_klines(rows: int, interval: str = '1m', start_price: float = 100.0, start_time: int = None,
+                     volatility: float = 0.6, seed: int = None) -> np.ndarray:
+    """Случайное блуждание (геометрическое броуновское движение) в формате KLINE_DTYPE
+
+    volatility - годовая волатильность, шум растет с длительностью свечи.
+    """
+    interval_ms = INTERVAL_MS[interval]
+    rng = np.random.default_rng(seed)
+    if start_time is None:
+        now = int(time.time() * 1000)
+        start_time = now - now % interval_ms - rows * interval_ms
+
+    sigma = volatility * np.sqrt(interval_ms / (365 * 86400000))
+    close = start_price * np.exp(np.cumsum(rng.normal(0.0, sigma, rows)))
+    open_ = np.concatenate(([start_price], close[:-1]))
+    wick = np.abs(rng.normal(0.0, sigma, (2, rows)))
+
+    klines = np.empty(rows, dtype=KLINE_DTYPE)
+    klines['open_time'] = start_time + np.arange(rows, dtype=np.int64) * interval_ms
+    klines['open'] = open_
+    klines['high'] = np.maximum(open_, close) * (1 + wick[0])
+    klines['low'] = np.minimum(open_, close) * (1 - wick[1])
+    klines['close'] = close
+    klines['volume'] = rng.uniform(10, 100, rows)
+    klines['close_time'] = klines['open_time'] + interval_ms - 1
+    klines['quote_asset_volume'] = klines['volume'] * close
+    return klines
+
+
+class SimulatedClock:
+    """Время симуляции в мс: speed x реальное время от start_time; speed=0 - только advance()"""
+
+    def __init__(self, start_time: int, speed: float = 100.0):
+        self.start_time = int(start_time)
+        self.speed = speed
+        self._offset = 0
+        self._started = time.monotonic()
+
+    def now(self) -> int:
+        elapsed = (time.monotonic() - self._started) * 1000 * self.speed if self.speed else 0
+        return self.start_time + int(elapsed) + self._offset
+
+    def advance(self, seconds: float):
+        self._offset += int(seconds * 1000)
+
+
+class SimulatedMexcClient:
+    """Биржа для бумажной торговли с интерфейсом MexcClient
+
+    Воспроизводит записанные или синтетические свечи базового интервала
+    со скоростью speed (100 - в 100 раз быстрее реального времени, 0 -
+    время двигается только через advance()). Более крупные интервалы
+    собираются из базового. Текущая свеча отдается недостроенной: цена
+    внутри свечи идет O -> L -> H -> C (или O -> H -> L -> C), поэтому
+    будущее бот не видит.
+
+    Рыночные ордера исполняются по цене через latency_ms после приема с
+    проскальзыванием slippage и комиссией taker_fee, лимитные - когда
+    путь цены касается лимита, по цене лимита с комиссией maker_fee.
+    Комиссия списывается в котируемом активе. Балансы, ордера и ответы -
+    в формате REST MEXC. Сеть не используется.
+    """
+
+    def __init__(self, candles: Dict[str, np.ndarray], interval: str = '1m', speed: float = 100.0,
+                 start_time: int = None, balances: Dict[str, float] = None,
+                 maker_fee: float = 0.0, taker_fee: float = 0.0005, slippage: float = 0.0002,
+                 latency_ms: float = 50.0, latency_jitter_ms: float = 0.0, seed: int = None):
+        if interval not in INTERVAL_MS:
+            raise ValueError(f"Неподдерживаемый базовый интервал: {interval}")
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+        self.candles = {symbol: parse_klines(klines) for symbol, klines in candles.items()}
+        if not self.candles or any(len(klines) == 0 for klines in self.candles.values()):
+            raise ValueError("Нужны свечи хотя бы для одного символа")
+        self.logger = logging.getLogger(__name__)
+
+        self.valid_intervals = dict(VALID_INTERVALS)
+        self.candle_store = None
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.slippage = slippage
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self._random = random.Random(seed)
+
+        first_open = max(int(klines['open_time'][0]) for klines in self.candles.values())
+        self.end_time = min(int(klines['open_time'][-1]) for klines in self.candles.values()) + self.interval_ms
+        if start_time is None:
+            # Две недели истории до начала воспроизведения (но не дальше конца данных)
+            start_time = min(first_open + 14 * 86400000, self.end_time - self.interval_ms)
+        self.clock = SimulatedClock(start_time, speed)
+        self.speed = speed
+
+        self.balances = {asset: {'free': float(amount), 'locked': 0.0}
+                         for asset, amount in (balances or {'USDT': 10000.0}).items()}
+        self.orders: Dict[str, Dict] = {}
+        self._order_ids = 0
+        self._matched_until = self.clock.now()
+        self._finished_logged = False
+        self._listeners: List[Callable[[Dict], None]] = []
+        self._lock = threading.RLock()
+
+        self.latency = LatencyRecorder()
+        self.calls = CallCounter()
+
+    @classmethod
+    def synthetic(cls, symbols: List[str], interval: str = '1m', days: float = 30,
+                  start_prices: Dict[str, float] = None, seed: int = None, **kwargs) -> 'SimulatedMexcClient':
+        """Синтетические свечи для каждого символа"""
+        interval_ms = INTERVAL_MS[interval]
+        rows = int(days * 86400000 // interval_ms)
+        now = int(time.time() * 1000)
+        start_time = now - now % interval_ms - rows * interval_ms
+        rng = np.random.default_rng(seed)
+        candles = {
+            symbol: synthetic_klines(rows, interval, (start_prices or {}).get(symbol, 100.0),
+                                     start_time=start_time, seed=int(rng.integers(2 ** 32)))
+            for symbol in symbols
+        }
+        return cls(candles, interval=interval, seed=seed, **kwargs)
+
+    @classmethod
+    def from_store(cls, store, symbols: List[str], interval: str = '1m', **kwargs) -> 'SimulatedMexcClient':
+        """Записанные свечи из api.candle_store.CandleStore"""
+        candles = {symbol: parse_klines(store.get_klines(symbol, interval, 10_000_000)) for symbol in symbols}
+        return cls({s: k for s, k in candles.items() if len(k)}, interval=interval, **kwargs)
+
+    @classmethod
+    def from_history(cls, directory: str, symbols: List[str], interval: str = '1m',
+                     **kwargs) -> 'SimulatedMexcClient':
+        """Свечи из файлов api.backfill (python -m api.backfill)"""
+        from api.backfill import load_history
+        candles = {symbol: load_history(directory, symbol, interval) for symbol in symbols}
+        return cls({s: k for s, k in candles.items() if len(k)}, interval=interval, **kwargs)
+
+    @classmethod
+    def from_settings(cls, settings: Dict, symbols: List[str], store=None) -> 'SimulatedMexcClient':
+        """Создать по SIMULATOR_SETTINGS"""
+        options = {key: settings[key] for key in (
+            'speed', 'balances', 'maker_fee', 'taker_fee', 'slippage', 'latency_ms', 'latency_jitter_ms'
+        ) if key in settings}
+        interval = settings.get('interval', '1m')
+        if settings.get('source') == 'candle_store' and store is not None:
+            return cls.from_store(store, symbols, interval, **options)
+        if settings.get('source') == 'history':
+            return cls.from_history(settings['history_path'], symbols, interval, **options)
+        return cls.synthetic(symbols, interval, days=settings.get('days', 30),
+                             start_prices=settings.get('start_prices'), seed=settings.get('seed'), **options)
+
+    # Время и цены
+
+    def now(self) -> int:
+        return min(self.clock.now(), self.end_time)
+
+    def advance(self, seconds: float):
+        """Сдвинуть время симуляции (для speed=0 - единственный способ)"""
+        with self._lock:
+            self.clock.advance(seconds)
+            self._match()
+
+    @property
+    def finished(self) -> bool:
+        return self.clock.now() >= self.end_time
+
+    def _index(self, symbol: str, now: int) -> int:
+        """Индекс свечи, внутри которой находится now"""
+        klines = self._klines(symbol)
+        return max(int(np.searchsorted(klines['open_time'], now, side='right')) - 1, 0)
+
+    def _klines(self, symbol: str) -> np.ndarray:
+        klines = self.candles.get(symbol)
+        if klines is None:
+            raise KeyError(f"Нет свечей для {symbol}")
+        return klines
+
+    @staticmethod
+    def _path(candle) -> np.ndarray:
+        if candle['close'] >= candle['open']:
+            return np.array([candle['open'], candle['low'], candle['high'], candle['close']])
+        return np.array([candle['open'], candle['high'], candle['low'], candle['close']])
+
+    def _fraction(self, candle, now: int) -> float:
+        return min(max((now - int(candle['open_time'])) / self.interval_ms, 0.0), 1.0)
+
+    def _price_at(self, symbol: str, now: int) -> float:
+        candle = self._klines(symbol)[self._index(symbol, now)]
+        return float(np.interp(self._fraction(candle, now), _PATH_FRACTIONS, self._path(candle)))
+
+    def _range(self, symbol: str, start: int, end: int):
+        """Минимум и максимум пути цены на отрезке времени [start, end]"""
+        klines = self._klines(symbol)
+        first, last = self._index(symbol, start), self._index(symbol, end)
+        low, high = np.inf, -np.inf
+        for index in (first, last) if last > first else (first,):
+            candle = klines[index]
+            a = self._fraction(candle, start) if index == first else 0.0
+            b = self._fraction(candle, end) if index == last else 1.0
+            path = self._path(candle)
+            inside = (_PATH_FRACTIONS > a) & (_PATH_FRACTIONS < b)
+            points = np.concatenate((np.interp([a, b], _PATH_FRACTIONS, path), path[inside]))
+            low, high = min(low, points.min()), max(high, points.max())
+        if last - first > 1:
+            low = min(low, klines['low'][first + 1:last].min())
+            high = max(high, klines['high'][first + 1:last].max())
+        return float(low), float(high)
+
+    def _visible(self, symbol: str, now: int) -> np.ndarray:
+        """Свечи до текущей включительно; текущая - недостроенная на момент now"""
+        klines = self._klines(symbol)
+        index = self._index(symbol, now)
+        visible = klines[:index + 1].copy()
+        candle = visible[-1]
+        fraction = self._fraction(candle, now)
+        path = self._path(candle)
+        inside = path[_PATH_FRACTIONS <= fraction]
+        price = float(np.interp(fraction, _PATH_FRACTIONS, path))
+        candle['high'] = max(inside.max(), price)
+        candle['low'] = min(inside.min(), price)
+        candle['close'] = price
+        candle['volume'] *= fraction
+        candle['quote_asset_volume'] *= fraction
+        return visible
+
+    # Учет вызовов (как в MexcClient)
+
+    def _call(self, endpoint: str):
+        latency = self.latency_ms + self._random.uniform(0, self.latency_jitter_ms)
+        self.latency.observe(endpoint, latency / 1000)
+        self.calls.record(endpoint)
+        if self.finished and not self._finished_logged:
+            self._finished_logged = True
+            self.logger.warning("⚠️ Свечи симулятора закончились, время остановлено на последней свече")
+        return latency
+
+    def get_latency_stats(self) -> Dict[str, Dict]:
+        return self.latency.snapshot()
+
+    def get_call_stats(self) -> Dict:
+        return self.calls.snapshot()
+
+    def close(self):
+        pass
+
+    # Рыночные данные
+
+    def get_current_price(self, symbol: str = 'BTCUSDT') -> float:
+        self._call("/api/v3/ticker/price")
+        with self._lock:
+            self._match()
+            return self._price_at(symbol, self.now())
+
+    def get_ticker_price(self, symbol: str) -> Dict:
+        return {'symbol': symbol, 'price': str(self.get_current_price(symbol))}
+
+    def get_klines(self, symbol: str, interval: str = '30m', limit: int = 100) -> List:
+        return [list(kline) for kline in self.get_klines_array(symbol, interval, limit).tolist()]
+
+    def get_klines_array(self, symbol: str, interval: str = '30m', limit: int = 100,
+                         buffer: CandleBuffer = None, fallback: bool = True) -> np.ndarray:
+        """Свечи, видимые к текущему времени симуляции (тестовых свечей симулятор не отдает)"""
+        self._call("/api/v3/klines")
+        interval_ms = INTERVAL_MS.get(interval, self.interval_ms)
+        if interval_ms % self.interval_ms:
+            raise ValueError(f"Интервал {interval} не кратен базовому {self.interval}")
+
+        with self._lock:
+            self._match()
+            now = self.now()
+            # Базовых свечей с запасом на выравнивание первой агрегированной свечи
+            per_candle = interval_ms // self.interval_ms
+            visible = self._visible(symbol, now)[-(limit + 1) * per_candle:]
+        klines = aggregate_klines(visible, interval_ms)[-limit:] if per_candle > 1 else visible[-limit:]
+
+        if buffer is not None:
+            buffer.clear()
+            buffer.extend(klines)
+        return klines
+
+    # Счет и ордера
+
+    def get_account_info(self) -> Dict:
+        self._call("/api/v3/account")
+        with self._lock:
+            self._match()
+            return {
+                'canTrade': True,
+                'updateTime': self.now(),
+                'balances': [{'asset': asset, 'free': str(b['free']), 'locked': str(b['locked'])}
+                             for asset, b in self.balances.items()]
+            }
+
+    def add_order_listener(self, listener: Callable[[Dict], None]):
+        """listener(order) при каждом изменении ордера - аналог приватного потока"""
+        self._listeners.append(listener)
+
+    def create_order(self, symbol: str, side: str, order_type: str, quantity: float, price: float = None,
+                     client_order_id: str = None) -> Dict:
+        latency = self._call("/api/v3/order")
+        side, order_type, quantity = side.upper(), order_type.upper(), float(quantity)
+        updates = []
+        with self._lock:
+            self._match(updates)
+            now = self.now()
+            if symbol not in self.candles:
+                return {'code': -1121, 'msg': 'Invalid symbol.'}
+            if client_order_id and client_order_id in self.orders:
+                return {'code': 30008, 'msg': 'Duplicate clientOrderId'}
+            if quantity <= 0 or (order_type == 'LIMIT' and not price):
+                return {'code': 700002, 'msg': 'Invalid quantity or price'}
+
+            accepted = now + int(latency)
+            base, quote = split_symbol(symbol)
+            market_price = self._price_at(symbol, accepted)
+            reserve_price = float(price) if order_type == 'LIMIT' else market_price * (1 + self.slippage)
+            if side == 'BUY':
+                asset, amount = quote, quantity * reserve_price * (1 + max(self.maker_fee, self.taker_fee))
+            else:
+                asset, amount = base, quantity
+            balance = self.balances.setdefault(asset, {'free': 0.0, 'locked': 0.0})
+            if balance['free'] + 1e-12 < amount:
+                return {'code': 30004, 'msg': 'Insufficient position'}
+            balance['free'] -= amount
+            balance['locked'] += amount
+
+            self._order_ids += 1
+            client_order_id = client_order_id or f"sim{self._order_ids}"
+            order = {
+                'symbol': symbol, 'orderId': str(self._order_ids), 'clientOrderId': client_order_id,
+                'price': str(price or 0), 'origQty': str(quantity), 'executedQty': '0',
+                'cummulativeQuoteQty': '0', 'status': 'NEW', 'type': order_type, 'side': side,
+                'time': accepted, 'updateTime': accepted,
+                '_reserved': amount, '_asset': asset, '_accepted': accepted
+            }
+            self.orders[client_order_id] = order
+
+            marketable = order_type == 'MARKET' or (
+                market_price <= float(price) if side == 'BUY' else market_price >= float(price))
+            if marketable:
+                fill_price = market_price * (1 + self.slippage if side == 'BUY' else 1 - self.slippage)
+                if order_type == 'LIMIT':
+                    fill_price = min(fill_price, float(price)) if side == 'BUY' else max(fill_price, float(price))
+                self._fill(order, fill_price, self.taker_fee, accepted)
+            updates.append(self._public(order))
+            response = {key: order[key] for key in ('symbol', 'orderId', 'price', 'origQty', 'type', 'side')}
+            response.update(orderListId=-1, transactTime=accepted)
+        self._notify(updates)
+        return response
+
+    def query_order(self, symbol: str, order_id: str = None, client_order_id: str = None) -> Dict:
+        self._call("/api/v3/order")
+        updates = []
+        with self._lock:
+            self._match(updates)
+            order = self._find(order_id, client_order_id)
+            result = self._public(order) if order else {'code': -2013, 'msg': 'Order does not exist.'}
+        self._notify(updates)
+        return result
+
+    def cancel_order(self, symbol: str, order_id: str = None, client_order_id: str = None) -> Dict:
+        self._call("/api/v3/order")
+        updates = []
+        with self._lock:
+            self._match(updates)
+            order = self._find(order_id, client_order_id)
+            if order is None or order['status'] not in ('NEW', 'PARTIALLY_FILLED'):
+                result = {'code': -2011, 'msg': 'Unknown order sent.'}
+            else:
+                self._release(order)
+                order['status'] = 'CANCELED'
+                order['updateTime'] = self.now()
+                result = self._public(order)
+                updates.append(result)
+        self._notify(updates)
+        return result
+
+    def get_open_orders(self, symbol: str) -> List[Dict]:
+        self._call("/api/v3/openOrders")
+        updates = []
+        with self._lock:
+            self._match(updates)
+            result = [self._public(order) for order in self.orders.values()
+                      if order['symbol'] == symbol and order['status'] in ('NEW', 'PARTIALLY_FILLED')]
+        self._notify(updates)
+        return result
+
+    # Приватный поток не нужен: обновления приходят через add_order_listener
+    def create_listen_key(self) -> str:
+        return 'simulated'
+
+    def keepalive_listen_key(self, listen_key: str) -> Dict:
+        return {}
+
+    def close_listen_key(self, listen_key: str) -> Dict:
+        return {}
+
+    def _find(self, order_id: str = None, client_order_id: str = None) -> Optional[Dict]:
+        if client_order_id:
+            return self.orders.get(client_order_id)
+        return next((o for o in self.orders.values() if o['orderId'] == str(order_id)), None)
+
+    @staticmethod
+    def _public(order: Dict) -> Dict:
+        return {key: value for key, value in order.items() if not key.startswith('_')}
+
+    def _match(self, updates: List = None):
+        """Исполнить лимитные ордера, которых коснулась цена с прошлой проверки"""
+        now = self.now()
+        start, self._matched_until = self._matched_until, now
+        if now <= start:
+            return
+        changed = []
+        for order in self.orders.values():
+            if order['type'] != 'LIMIT' or order['status'] != 'NEW' or order['_accepted'] >= now:
+                continue
+            low, high = self._range(order['symbol'], max(start, order['_accepted']), now)
+            limit = float(order['price'])
+            if (order['side'] == 'BUY' and low <= limit) or (order['side'] == 'SELL' and high >= limit):
+                self._fill(order, limit, self.maker_fee, now)
+                changed.append(self._public(order))
+        if updates is not None:
+            updates.extend(changed)
+        else:
+            self._notify(changed)
+
+    def _fill(self, order: Dict, price: float, fee_rate: float, timestamp: int):
+        quantity = float(order['origQty'])
+        base, quote = split_symbol(order['symbol'])
+        notional = quantity * price
+        fee = notional * fee_rate
+        self._release(order)
+        for asset in (base, quote):
+            self.balances.setdefault(asset, {'free': 0.0, 'locked': 0.0})
+        if order['side'] == 'BUY':
+            self.balances[quote]['free'] -= notional + fee
+            self.balances[base]['free'] += quantity
+        else:
+            self.balances[base]['free'] -= quantity
+            self.balances[quote]['free'] += notional - fee
+        order.update(status='FILLED', executedQty=str(quantity), cummulativeQuoteQty=str(notional),
+                     updateTime=timestamp, _fee=fee)
+
+    def _release(self, order: Dict):
+        """Вернуть зарезервированную сумму в free"""
+        balance = self.balances[order['_asset']]
+        balance['locked'] -= order['_reserved']
+        balance['free'] += order['_reserved']
+        order['_reserved'] = 0.0
+
+    def _notify(self, updates: List[Dict]):
+        for update in updates:
+            for listener in self._listeners:
+                try:
+                    listener(dict(update))
+                except Exception as e:
+                    self.logger.error(f"❌ Ошибка обработчика ордеров симулятора: {e}")
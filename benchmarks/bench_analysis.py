@@ -0,0 +1,214 @@
+"""Бенчмарк горячего пути анализа
+
+Замеряет на детерминированных синтетических свечах (100, 10k и 1M строк):
+  - AIAnalysisEngine.calculate_technical_indicators
+  - AIAnalysisEngine._advanced_analysis (одна строка)
+  - api.kline_parser.klines_frame (сырые свечи MEXC -> DataFrame, как в боте)
+  - api.kline_parser.parse_klines_json (тело ответа -> колонки numpy)
+  - AIAnalysisEngine.get_ai_recommendation целиком
+
+Время снимается без трассировки, пик памяти - отдельным прогоном под
+tracemalloc. Результаты пишутся в JSON, сеть не нужна:
+
+    python benchmarks/bench_analysis.py
+    python benchmarks/bench_analysis.py --sizes 100 10000 --output before.json
+    python benchmarks/bench_analysis.py --compare before.json
+"""
+import os
+import gc
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from ai.analysis_engine import AIAnalysisEngine
+from api.kline_parser import parse_klines_json, klines_frame
+
+DEFAULT_SIZES = (100, 10_000, 1_000_000)
+RESULTS_DIR = os.path.join(PROJECT_ROOT, 'benchmarks', 'results')
+
+
+def make_klines(rows: int, seed: int = 42) -> List[list]:
+    """Сырые свечи в формате ответа MEXC /api/v3/klines (цены строками)"""
+    rng = np.random.default_rng(seed)
+    close = 67500 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.004, rows))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.004, rows))
+    volume = rng.uniform(1000, 5000, rows)
+    open_time = 1_700_000_000_000 + np.arange(rows, dtype=np.int64) * 1_800_000
+
+    columns = [
+        open_time.tolist(),
+        np.char.mod('%.2f', open_).tolist(),
+        np.char.mod('%.2f', high).tolist(),
+        np.char.mod('%.2f', low).tolist(),
+        np.char.mod('%.2f', close).tolist(),
+        np.char.mod('%.4f', volume).tolist(),
+        (open_time + 1_799_999).tolist(),
+        np.char.mod('%.2f', close * volume).tolist(),
+    ]
+    return [list(row) for row in zip(*columns)]
+
+
+def make_candles(klines: List[list]) -> pd.DataFrame:
+    """DataFrame свечей тем же путем, что и в боте (TradingBot._format_klines_data)"""
+    return klines_frame(klines).reset_index(drop=True)
+
+
+def measure(fn: Callable, setup: Callable = None, repeat: int = 5, number: int = 1) -> Dict:
+    """Время repeat прогонов по number вызовов и пик памяти одного вызова
+
+    setup() готовит аргумент заново перед каждым прогоном и в замер не входит.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        gc.collect()
+        started = time.perf_counter()
+        for _ in range(number):
+            fn(arg)
+        times.append((time.perf_counter() - started) / number)
+
+    arg = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'repeat': repeat,
+        'number': number,
+        'min_s': min(times),
+        'median_s': statistics.median(times),
+        'mean_s': statistics.fmean(times),
+        'peak_mb': round(peak / 1024 / 1024, 3),
+    }
+
+
+def run_suite(sizes=DEFAULT_SIZES, repeat: int = 5, seed: int = 42) -> Dict:
+    """Прогнать все бенчмарки; результат - JSON-совместимый словарь"""
+    engine = AIAnalysisEngine()
+    results = []
+
+    for rows in sizes:
+        klines = make_klines(rows, seed)
+        body = json.dumps(klines, separators=(',', ':')).encode()
+        candles = make_candles(klines)
+        indicators = engine.calculate_technical_indicators(candles.copy())
+        latest = indicators.iloc[-1]
+        # Большие размеры гоняем реже, чтобы весь набор укладывался в минуты
+        runs = repeat if rows <= 100_000 else max(2, repeat // 2)
+
+        cases = [
+            ('parse_klines_json', rows,
+             lambda _: parse_klines_json(body), None, runs, 1),
+            ('klines_frame', rows,
+             lambda _: klines_frame(klines), None, runs, 1),
+            ('calculate_technical_indicators', rows,
+             engine.calculate_technical_indicators, candles.copy, runs, 1),
+            ('advanced_analysis', 1,
+             lambda _: engine._advanced_analysis(latest, 'BTCUSDT'), None, repeat, 200),
+            ('get_ai_recommendation', rows,
+             lambda df: engine.get_ai_recommendation('BTCUSDT', df), candles.copy, runs, 1),
+        ]
+        for name, items, fn, setup, runs_, number in cases:
+            stats = measure(fn, setup, runs_, number)
+            stats.update(benchmark=name, rows=rows, items_per_s=round(items / stats['median_s'], 1))
+            results.append(stats)
+            logging.info(f"⏱️ {name:32s} rows={rows:>9,d} median={stats['median_s'] * 1000:10.3f}мс "
+                         f"{stats['items_per_s']:>14,.0f}/с peak={stats['peak_mb']:.1f}MB")
+        del klines, body, candles, indicators
+
+    return {'meta': environment(seed, repeat), 'results': results}
+
+
+def environment(seed: int, repeat: int) -> Dict:
+    """Где и на чем сняты результаты"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        commit = ''
+    return {
+        'commit': commit or 'unknown',
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': seed,
+        'repeat': repeat,
+    }
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.2) -> List[Dict]:
+    """Сравнение медиан с базовым прогоном; регрессия - замедление больше tolerance"""
+    base = {(r['benchmark'], r['rows']): r for r in baseline['results']}
+    rows = []
+    for result in current['results']:
+        old = base.get((result['benchmark'], result['rows']))
+        if not old:
+            continue
+        ratio = result['median_s'] / old['median_s'] if old['median_s'] else float('inf')
+        rows.append({
+            'benchmark': result['benchmark'],
+            'rows': result['rows'],
+            'ratio': round(ratio, 3),
+            'peak_mb_delta': round(result['peak_mb'] - old['peak_mb'], 3),
+            'regression': ratio > 1 + tolerance,
+        })
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк горячего пути анализа")
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="JSON с результатами (по умолчанию benchmarks/results/<commit>.json)")
+    parser.add_argument('--compare', help="JSON предыдущего прогона для сравнения")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="допустимое замедление, доля")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s', force=True)
+    report = run_suite(args.sizes, args.repeat, args.seed)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{report['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logging.info(f"💾 Результаты сохранены: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        diff = compare(report, baseline, args.tolerance)
+        for row in diff:
+            mark = '🔴' if row['regression'] else '🟢'
+            logging.info(f"{mark} {row['benchmark']:32s} rows={row['rows']:>9,d} "
+                         f"x{row['ratio']:.2f} память {row['peak_mb_delta']:+.1f}MB")
+        if any(row['regression'] for row in diff):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
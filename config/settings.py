@@ -4,6 +4,73 @@ TRADING_SETTINGS = {
     'risk_per_trade': 0.02,  # 2% риска на сделку
     'symbols': ['BTCUSDT', 'ETHUSDT', 'ADAUSDT'],
     'update_interval': 300,  # 5 минут
+    'incremental_indicators': True,  # Пересчитывать индикаторы только по новым свечам окна klines_limit
+    'multi_symbol': True,  # Анализировать все symbols параллельно в одном процессе
+    'max_workers': 4,  # Размер пула потоков анализа
+    'market_data': 'rest',  # 'rest' - опрос klines, 'websocket' - push-поток свечей
+    'stream_url': 'wss://wbs.mexc.com/ws',
+    'klines_limit': 300,  # Свечей на анализ (с локальным кэшем докачиваются только новые)
+    'order_quantity': 0.001,  # Объем рыночного ордера по сигналу
+    'user_stream': True,  # Исполнение ордеров из приватного WebSocket потока (иначе сверка через REST)
+    'exchange': 'mexc',  # 'mexc' - реальная биржа, 'simulated' - бумажная торговля (SIMULATOR_SETTINGS)
+    'timeframes': [],  # Например ['5m', '15m', '30m', '60m', '4h'] - анализ по нескольким таймфреймам,
+                       # собранным из свечей base_interval (пусто - один таймфрейм 30m)
+    'base_interval': '1m',  # Единственный запрашиваемый интервал в мультитаймфреймовом режиме
+    'primary_timeframe': '30m',  # Таймфрейм цены, индикаторов и пояснений рекомендации
+    'timeframe_weights': None,  # Веса таймфреймов в общем счете (None - AIAnalysisEngine.TIMEFRAME_WEIGHTS)
+}
+
+# Локальные данные (пути относительно корня проекта)
+DATA_SETTINGS = {
+    'candle_store_path': 'data/candles.sqlite3',  # None - без локального кэша свечей
+    'state_store_path': 'data/state.sqlite3',  # Последние рекомендации и индикаторы для дашборда
+    'metrics_interval': 5,  # Секунд между публикациями метрик в state_store (не каждый цикл)
+    'journal_path': 'data/recommendations.jsonl',  # Журнал всех рекомендаций (+ индекс .idx)
+    'history_path': 'data/history',  # Глубокая история свечей для бэктестов (python -m api.backfill)
+}
+
+# Биржа-симулятор для бумажной торговли и нагрузочных прогонов без сети
+SIMULATOR_SETTINGS = {
+    'source': 'synthetic',  # 'synthetic' - случайное блуждание, 'candle_store' - свечи из DATA_SETTINGS['candle_store_path'],
+                            # 'history' - файлы api.backfill из history_path
+    'history_path': 'data/history',
+    'interval': '1m',  # Базовый интервал воспроизведения, крупные интервалы собираются из него
+    'days': 30,  # Длина синтетической истории
+    'seed': None,
+    'speed': 100,  # Во сколько раз быстрее реального времени (паузы бота между циклами сокращаются так же)
+    'start_prices': {'BTCUSDT': 121695.25, 'ETHUSDT': 4400.0, 'ADAUSDT': 0.85},
+    'balances': {'USDT': 10000.0},
+    'maker_fee': 0.0,
+    'taker_fee': 0.0005,
+    'slippage': 0.0002,  # Доля цены для рыночных ордеров
+    'latency_ms': 50,  # Задержка приема ордера биржей (время симуляции)
+    'latency_jitter_ms': 20,
+}
+
+# Логирование бота и дашборда
+LOG_SETTINGS = {
+    'mode': 'async',  # 'async' - запись пачками в фоновом потоке, 'sync' - FileHandler/StreamHandler
+    'format': 'text',  # 'json' - файл лога строками JSON (консоль остается текстовой)
+    'console': True,  # Дублировать лог в stdout
+    'queue_size': 10000,  # Записей в очереди, дальше действует overflow
+    'overflow': 'drop_oldest',  # 'drop_oldest', 'drop_new' или 'block' (ожидание до 0.1с)
+    'batch_size': 500,  # Записей в одной пачке
+    'flush_interval': 0.5,  # Секунд ожидания неполной пачки
+}
+
+# Лимит запросов к MEXC (api.rate_limiter): token bucket по классам endpoint
+RATE_LIMIT_SETTINGS = {
+    'state_path': 'data/rate_limit.bin',  # Общий бюджет процессов с этим файлом; None - только процесс
+    'buckets': {  # Токенов (веса запросов) в секунду и запас
+        'market': {'rate': 40.0, 'capacity': 100.0},
+        'account': {'rate': 10.0, 'capacity': 20.0},
+        'order': {'rate': 5.0, 'capacity': 10.0},
+    },
+    'backoff': 1.0,  # Пауза после 429 без Retry-After, удваивается на каждый 429 подряд (до max_backoff)
+    'max_backoff': 60.0,
+    'decrease': 0.5,  # Скорость после 429 умножается на decrease (не ниже min_factor)
+    'min_factor': 0.1,
+    'recovery': 0.05,  # Восстановление доли скорости в секунду
 }
 
 # Настройки API
@@ -8,50 +8,171 @@ from dotenv import load_dotenv
 import sys
 import io
 import signal
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Исправление кодировки для Windows
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-
-# Настройка логирования с правильной кодировкой
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - BOT - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('trading_bot.log', encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from config.settings import LOG_SETTINGS
+from utils.log_pipeline import setup_logging
 
 # Импорты наших модулей
 try:
-    from api.mexc_client import MexcClient
+    from api.mexc_client import MexcClient, FALLBACK_PRICE
+    from api.rate_limiter import RateLimiter
+    from api.resampler import CandleResampler
     from ai.analysis_engine import AIAnalysisEngine
+    from api.market_stream import MarketDataStream
+    from api.execution import OrderExecutor, UserDataStream
+    from api.simulated_client import SimulatedMexcClient
+    from api.candle_store import CandleStore
+    from api.kline_parser import klines_frame
+    from utils.models import CandleBuffer, Recommendation
+    from utils.shared_state import SharedStateStore
+    from utils.journal import RecommendationJournal
+    from utils.metrics import RingBuffer, REGISTRY, PHASE_BUCKETS
+    from config.settings import TRADING_SETTINGS, DATA_SETTINGS, SIMULATOR_SETTINGS, RATE_LIMIT_SETTINGS
 except ImportError as e:
     logging.error(f"Import error: {e}")
     logging.info("Trying alternative import method...")
     import sys
     import os
     sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-    from api.mexc_client import MexcClient
+    from api.mexc_client import MexcClient, FALLBACK_PRICE
+    from api.rate_limiter import RateLimiter
+    from api.resampler import CandleResampler
     from ai.analysis_engine import AIAnalysisEngine
+    from api.market_stream import MarketDataStream
+    from api.execution import OrderExecutor, UserDataStream
+    from api.simulated_client import SimulatedMexcClient
+    from api.candle_store import CandleStore
+    from api.kline_parser import klines_frame
+    from utils.models import CandleBuffer, Recommendation
+    from utils.shared_state import SharedStateStore
+    from utils.journal import RecommendationJournal
+    from utils.metrics import RingBuffer, REGISTRY, PHASE_BUCKETS
+    from config.settings import TRADING_SETTINGS, DATA_SETTINGS, SIMULATOR_SETTINGS, RATE_LIMIT_SETTINGS
+
+# Метрики Prometheus: бот публикует снимок, дашборд отдает его на /metrics
+CYCLE_PHASE_SECONDS = REGISTRY.histogram(
+    'trading_bot_cycle_phase_seconds', 'Duration of analysis cycle phases', ('phase',), buckets=PHASE_BUCKETS
+)
+CYCLE_SECONDS = REGISTRY.histogram(
+    'trading_bot_cycle_duration_seconds', 'Duration of a full analysis cycle', buckets=PHASE_BUCKETS
+)
+RECOMMENDATIONS = REGISTRY.counter(
+    'trading_bot_recommendations_total', 'Recommendations produced', ('symbol', 'action')
+)
+_PHASE_FETCH = CYCLE_PHASE_SECONDS.labels('fetch')
+_PHASE_FORMAT = CYCLE_PHASE_SECONDS.labels('format')
+_PHASE_ORDER = CYCLE_PHASE_SECONDS.labels('order')
 
 class TradingBot:
-    def __init__(self):
+    def __init__(self, on_cycle=None):
         load_dotenv()
         
+        # on_cycle(bot, seconds) вызывается после каждого цикла анализа
+        # (web.bot_runner сообщает по нему о готовности и ходе работы)
+        self.on_cycle = on_cycle
+        
+        # Локальный кэш свечей: каждый цикл докачивает только новые свечи
+        self.candle_store = None
+        if DATA_SETTINGS.get('candle_store_path'):
+            self.candle_store = CandleStore(
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_SETTINGS['candle_store_path'])
+            )
+        
+        # Последние рекомендации и индикаторы для дашборда
+        self.state_store = None
+        if DATA_SETTINGS.get('state_store_path'):
+            self.state_store = SharedStateStore(
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_SETTINGS['state_store_path'])
+            )
+        
+        # Журнал всех рекомендаций с реальным временем
+        self.journal = None
+        if DATA_SETTINGS.get('journal_path'):
+            self.journal = RecommendationJournal(
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_SETTINGS['journal_path'])
+            )
+        
+        # Все пары из настроек анализируются общим пулом потоков
+        # с одним MexcClient (общий лимит запросов) и отдельным
+        # состоянием индикаторов на символ внутри AIAnalysisEngine
+        self.symbols = list(TRADING_SETTINGS.get('symbols') or ['BTCUSDT'])
+        # Последняя цена каждого символа - резерв при ошибке запроса цены
+        self.last_prices = {}
+        
         # Инициализация клиентов
-        self.mexc_client = MexcClient(
-            api_key=os.getenv('MEXC_API_KEY', 'test_key'),
-            secret_key=os.getenv('MEXC_SECRET_KEY', 'test_secret')
+        self.simulated = TRADING_SETTINGS.get('exchange', 'mexc') == 'simulated'
+        if self.simulated:
+            # Бумажная торговля: свечи и исполнение ордеров без сети, время ускорено
+            self.mexc_client = SimulatedMexcClient.from_settings(
+                SIMULATOR_SETTINGS, self.symbols, store=self.candle_store
+            )
+            logging.info(f"🧪 Биржа-симулятор: скорость x{self.mexc_client.speed}")
+        else:
+            self.mexc_client = MexcClient(
+                api_key=os.getenv('MEXC_API_KEY', 'test_key'),
+                secret_key=os.getenv('MEXC_SECRET_KEY', 'test_secret'),
+                candle_store=self.candle_store,
+                # Бюджет запросов общий с другими процессами проекта (например, python -m api.backfill)
+                rate_limiter=RateLimiter.from_settings(
+                    RATE_LIMIT_SETTINGS, os.path.dirname(os.path.abspath(__file__))
+                )
+            )
+        # Паузы между циклами в симуляции сокращаются во столько же раз, во сколько ускорено время
+        self.time_scale = max(getattr(self.mexc_client, 'speed', 1) or 1, 1)
+        
+        self.ai_engine = AIAnalysisEngine(
+            incremental=TRADING_SETTINGS.get('incremental_indicators', False),
+            timeframe_weights=TRADING_SETTINGS.get('timeframe_weights')
         )
         
-        self.ai_engine = AIAnalysisEngine()
+        self.klines_limit = TRADING_SETTINGS.get('klines_limit', 100)
+        
+        # Мультитаймфреймовый режим: запрашиваются только свечи base_interval,
+        # старшие таймфреймы собираются из них (после однократной начальной истории)
+        self.timeframes = list(TRADING_SETTINGS.get('timeframes') or [])
+        self.interval = TRADING_SETTINGS.get('base_interval', '1m') if self.timeframes else '30m'
+        self.primary_timeframe = TRADING_SETTINGS.get('primary_timeframe', '30m')
+        self.resamplers = {
+            symbol: CandleResampler(self.timeframes, self.interval, self.klines_limit) for symbol in self.symbols
+        } if self.timeframes else {}
+        self._seeded_timeframes = set()
+        # Базовый буфер вмещает две самые длинные свечи таймфреймов (4h = 240 свечей 1m)
+        self.candles_limit = max([self.klines_limit] + [resampler.base.capacity
+                                                         for resampler in self.resamplers.values()])
         
-        self.symbol = 'BTCUSDT'
-        self.trade_enabled = False  # Set to True for real trading
+        # Последние свечи каждого символа в кольцевых буферах фиксированного размера:
+        # память не растет со временем работы, каждый цикл докачивает только новые свечи
+        self.candles = {symbol: CandleBuffer(self.candles_limit) for symbol in self.symbols}
+        self.symbol = self.symbols[0]
+        self.multi_symbol = TRADING_SETTINGS.get('multi_symbol', False) and len(self.symbols) > 1
+        self.executor = None
+        if self.multi_symbol:
+            self.executor = ThreadPoolExecutor(
+                max_workers=min(TRADING_SETTINGS.get('max_workers', 4), len(self.symbols)),
+                thread_name_prefix='analysis'
+            )
+        
+        # Источник свечей: 'rest' (опрос каждые 30с) или 'websocket' (push)
+        self.market_data = 'rest' if self.simulated else TRADING_SETTINGS.get('market_data', 'rest')
+        self.market_stream = None
+        
+        self.trade_enabled = self.simulated  # Set to True for real trading (в симуляторе - бумажная торговля)
+        
+        # Ордера отправляются отдельным потоком: цикл анализа только ставит их в очередь
+        self.order_quantity = TRADING_SETTINGS.get('order_quantity', 0.001)
+        self.order_executor = OrderExecutor(self.mexc_client)
+        self.user_stream = None
         self.running = True
         self.cycle_count = 0
         
+        # Длительности последних циклов анализа (секунды)
+        self.cycle_durations = RingBuffer(500)
+        
+        # Метрики публикуются не чаще раза в metrics_interval секунд
+        self.metrics_interval = DATA_SETTINGS.get('metrics_interval', 5)
+        self._metrics_published_at = None
+        
         # Обработка сигналов для graceful shutdown
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
@@ -63,81 +184,261 @@ class TradingBot:
         logging.info(f"📨 Получен сигнал {signum}, останавливаю бота...")
         self.running = False
     
-    def get_live_price(self):
+    def get_live_price(self, symbol: str = None):
         """Получить текущую цену с биржи"""
+        symbol = symbol or self.symbol
         try:
-            price = self.mexc_client.get_current_price(self.symbol)
-            logging.info(f"💰 Текущая цена {self.symbol}: ${price:.2f}")
+            price = self.mexc_client.get_current_price(symbol)
+            self.last_prices[symbol] = price
+            logging.info(f"💰 Текущая цена {symbol}: ${price:.2f}")
             return price
         except Exception as e:
-            logging.error(f"❌ Ошибка получения цены: {e}")
-            return 121812.54  # Fallback price
+            logging.error(f"❌ Ошибка получения цены {symbol}: {e}")
+            return self.last_prices.get(symbol, FALLBACK_PRICE)
     
     def run_analysis_cycle(self):
         """Run analysis cycle"""
+        self.cycle_count += 1
+        logging.info(f"--- Analysis Cycle {self.cycle_count} ---")
+        started = time.perf_counter()
+        
+        if self.multi_symbol:
+            self._run_multi_symbol_cycle()
+        else:
+            self.analyze_symbol(self.symbol)
+        
+        self._finish_cycle(time.perf_counter() - started)
+        
+        if self.cycle_count % 10 == 0:
+            self._log_latency_stats()
+    
+    def run_streaming(self):
+        """Режим push: анализ сразу при обновлении или закрытии свечи в WebSocket потоке"""
+        symbols = self.symbols if self.multi_symbol else [self.symbol]
+        self.market_stream = MarketDataStream(
+            symbols,
+            interval=self.interval,
+            url=TRADING_SETTINGS.get('stream_url', 'wss://wbs.mexc.com/ws'),
+            on_candle=self._on_candle_update,
+            backfill=self._backfill_stream
+        )
+        
+        # Начальная история из REST, дальше буфер обновляется потоком (тестовые свечи в буфер не попадают)
+        for symbol in symbols:
+            self.market_stream.seed(
+                symbol, self.mexc_client.get_klines_array(symbol=symbol, interval=self.interval,
+                                                          limit=self.candles_limit, fallback=False)
+            )
+            self._seed_timeframes(symbol)
+        
+        stream_thread = self.market_stream.start()
+        logging.info(f"📡 Потоковый режим для {', '.join(symbols)}")
+        
+        # Переподключения делает сам поток; если он все же завершился (исключение вне
+        # цикла подключения) - перезапускаем, после max_restarts подряд останавливаем бота
+        restarts, max_restarts = 0, 5
+        started = time.monotonic()
+        while self.running:
+            if stream_thread.is_alive():
+                time.sleep(1)
+                continue
+            if time.monotonic() - started > 300:
+                restarts = 0
+            restarts += 1
+            if restarts > max_restarts:
+                logging.error(f"🚨 Поток рыночных данных падал {max_restarts} раз подряд, останавливаю бота")
+                self.running = False
+                break
+            logging.error(f"🚨 Поток рыночных данных завершился, перезапуск {restarts}/{max_restarts} через 5 секунд")
+            deadline = time.monotonic() + 5
+            while self.running and time.monotonic() < deadline:
+                time.sleep(0.5)
+            if self.running:
+                stream_thread = self.market_stream.start()
+                started = time.monotonic()
+        
+        self.market_stream.stop()
+        stream_thread.join(timeout=10)
+    
+    def _backfill_stream(self, symbol: str, start_time: int):
+        """Свечи с start_time из REST для буфера потока после переподключения"""
+        return self.mexc_client.get_klines(symbol, interval=self.interval,
+                                           limit=self.candles_limit, start_time=start_time)
+    
+    def _on_candle_update(self, symbol: str, closed: bool):
+        """Обработчик обновления свечи из потока"""
+        self.cycle_count += 1
+        started = time.perf_counter()
         try:
-            self.cycle_count += 1
-            logging.info(f"--- Analysis Cycle {self.cycle_count} ---")
-            logging.info(f"🔄 Запуск анализа для {self.symbol}")
-            
-            # Получаем текущую цену
-            current_price = self.get_live_price()
-            
-            # Get data from exchange
-            klines_data = self.mexc_client.get_klines(
-                symbol=self.symbol,
-                interval='30m',
-                limit=100
+            klines_data = self.market_stream.get_klines_array(symbol)
+            if closed:
+                logging.info(f"🕯️ Свеча {symbol} закрыта")
+            self._analyze_klines(symbol, klines_data, float(klines_data['close'][-1]))
+        except Exception as e:
+            logging.error(f"❌ Ошибка в потоковом анализе {symbol}: {e}")
+            self._run_fallback_analysis(symbol)
+        self._finish_cycle(time.perf_counter() - started)
+    
+    def _finish_cycle(self, elapsed: float):
+        """Учесть длительность цикла, опубликовать метрики и сообщить наблюдателю"""
+        self.cycle_durations.append(elapsed)
+        CYCLE_SECONDS.observe(elapsed)
+        self._publish_metrics()
+        
+        if self.on_cycle is not None:
+            try:
+                self.on_cycle(self, elapsed)
+            except Exception as e:
+                logging.error(f"❌ Ошибка обработчика цикла: {e}")
+    
+    def _log_latency_stats(self):
+        """Сводка задержек API по endpoint"""
+        for endpoint, stats in self.mexc_client.get_latency_stats().items():
+            logging.info(
+                f"⏱️ {endpoint}: n={stats['count']} p50={stats['p50_ms']}ms "
+                f"p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms"
             )
+    
+    def _publish_metrics(self, force: bool = False):
+        """Счетчики API, длительности циклов и ордера для дашборда (раз в metrics_interval секунд)"""
+        if self.state_store is None:
+            return
+        now = time.monotonic()
+        if (not force and self._metrics_published_at is not None
+                and now - self._metrics_published_at < self.metrics_interval):
+            return
+        self._metrics_published_at = now
+        try:
+            self.state_store.publish_metrics('bot', {
+                'pid': os.getpid(),
+                'cycle_count': self.cycle_count,
+                'cycle_seconds': self.cycle_durations.summary(),
+                'cycle_history': self.cycle_durations.values()[-60:],
+                'api': self.mexc_client.get_call_stats(),
+                'api_latency': self.mexc_client.get_latency_stats(),
+                'orders': self.order_executor.stats()
+            })
+            self.state_store.publish_metrics('prometheus', REGISTRY.snapshot())
+        except Exception as e:
+            logging.error(f"❌ Ошибка публикации метрик: {e}")
+    
+    def _run_multi_symbol_cycle(self):
+        """Параллельный анализ всех символов из TRADING_SETTINGS['symbols']"""
+        futures = {
+            self.executor.submit(self.analyze_symbol, symbol): symbol
+            for symbol in self.symbols
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"❌ Ошибка анализа {futures[future]}: {e}")
+    
+    def analyze_symbol(self, symbol: str):
+        """Анализ одного символа"""
+        try:
+            logging.info(f"🔄 Запуск анализа для {symbol}")
             
-            # Check if we received valid data
-            if not klines_data or len(klines_data) == 0:
-                logging.warning("⚠️ Нет данных от биржи, использую тестовые данные")
-                df = self._generate_test_data(current_price)
-            elif isinstance(klines_data, dict) and 'code' in klines_data:
-                logging.warning(f"⚠️ Ошибка от биржи: {klines_data}, использую тестовые данные")
-                df = self._generate_test_data(current_price)
-            else:
-                # Convert to DataFrame
-                df = self._format_klines_data(klines_data)
+            with _PHASE_FETCH.time():
+                # Получаем текущую цену
+                current_price = self.get_live_price(symbol)
                 
-                # Check if DataFrame has enough data
-                if df.empty or len(df) < 2:
-                    logging.warning("⚠️ Недостаточно данных от биржи, использую тестовые данные")
-                    df = self._generate_test_data(current_price)
-                else:
-                    logging.info(f"✅ Получено {len(df)} реальных точек данных с биржи!")
-            
-            # Get AI recommendation
-            recommendation = self.ai_engine.get_ai_recommendation(self.symbol, df)
-            
-            # Log the result
-            self._log_recommendation(recommendation)
+                # Get data from exchange
+                klines_data = self.mexc_client.get_klines_array(
+                    symbol=symbol,
+                    interval=self.interval,
+                    limit=self.candles_limit,
+                    buffer=self.candles.setdefault(symbol, CandleBuffer(self.candles_limit)),
+                    fallback=False  # Без данных биржи _analyze_klines подставит тестовые сам
+                )
+                self._seed_timeframes(symbol)
             
-            # If trading is enabled - execute order
-            if self.trade_enabled and recommendation['confidence'] > 0.7:
-                self._execute_trade(recommendation)
+            self._analyze_klines(symbol, klines_data, current_price)
                 
         except Exception as e:
-            logging.error(f"❌ Ошибка в цикле анализа: {e}")
+            logging.error(f"❌ Ошибка в цикле анализа {symbol}: {e}")
             logging.info("🔄 Использую резервный анализ...")
-            self._run_fallback_analysis()
+            self._run_fallback_analysis(symbol)
     
-    def _format_klines_data(self, klines_data: list):
-        """Format klines data for MEXC API - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
-        try:
-            # MEXC возвращает список списков с 8 элементами
-            df = pd.DataFrame(klines_data, columns=[
-                'open_time', 'open', 'high', 'low', 'close', 'volume',
-                'close_time', 'quote_asset_volume'
-            ])
-            
-            # Convert prices to float
-            for col in ['open', 'high', 'low', 'close', 'volume']:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
+    def _analyze_klines(self, symbol: str, klines_data, current_price: float):
+        """Рекомендация по готовым свечам (REST или поток)
+        
+        Свечи должны быть реальными: get_klines_array вызывается с fallback=False,
+        тестовые данные подставляются здесь и не попадают в resampler. Рекомендация
+        по тестовым данным только пишется в лог: ее нет в журнале, дашборде и ордерах.
+        """
+        # Check if we received valid data
+        synthetic = True
+        if klines_data is None or len(klines_data) == 0:
+            logging.warning("⚠️ Нет данных от биржи, использую тестовые данные")
+            df = self._generate_test_data(current_price)
+        elif isinstance(klines_data, dict) and 'code' in klines_data:
+            logging.warning(f"⚠️ Ошибка от биржи: {klines_data}, использую тестовые данные")
+            df = self._generate_test_data(current_price)
+        else:
+            # Convert to DataFrame
+            with _PHASE_FORMAT.time():
+                df = self._format_klines_data(klines_data, symbol)
             
-            # Remove any rows with NaN values
-            df = df.dropna()
+            # Check if DataFrame has enough data
+            if df.empty or len(df) < 2:
+                logging.warning("⚠️ Недостаточно данных от биржи, использую тестовые данные")
+                df = self._generate_test_data(current_price)
+            else:
+                synthetic = False
+                logging.info(f"✅ Получено {len(df)} реальных точек данных с биржи!")
+        
+        # Get AI recommendation
+        resampler = self.resamplers.get(symbol)
+        if resampler is not None and not synthetic:
+            # Старшие таймфреймы - из тех же свечей, без отдельных запросов
+            resampler.update(klines_data)
+            recommendation = self.ai_engine.get_multi_timeframe_recommendation(
+                symbol, resampler.frames(), primary=self.primary_timeframe
+            )
+        else:
+            recommendation = self.ai_engine.get_ai_recommendation(symbol, df)
+        
+        if synthetic:
+            self._log_synthetic(recommendation, symbol)
+            return
+        
+        # Log the result
+        self._log_recommendation(recommendation, symbol)
+        self._publish_state(recommendation, symbol)
+        RECOMMENDATIONS.labels(symbol, recommendation.action).inc()
+        
+        # If trading is enabled - execute order
+        if self.trade_enabled and recommendation.confidence > 0.7:
+            with _PHASE_ORDER.time():
+                self._execute_trade(recommendation, symbol)
+    
+    def _seed_timeframes(self, symbol: str):
+        """Однократно загрузить историю старших таймфреймов символа (дальше они собираются из base_interval)"""
+        resampler = self.resamplers.get(symbol)
+        if resampler is None or symbol in self._seeded_timeframes:
+            return
+        for interval in self.timeframes:
+            if interval != self.interval:
+                klines = self.mexc_client.get_klines_array(
+                    symbol=symbol, interval=interval, limit=self.klines_limit, fallback=False
+                )
+                if len(klines) == 0:
+                    # Тестовые свечи исказили бы таймфрейм - повторим в следующем цикле
+                    logging.warning(f"⚠️ {symbol}: нет истории {interval}, таймфреймы загрузятся позже")
+                    return
+                resampler.seed(interval, klines)
+        self._seeded_timeframes.add(symbol)
+        logging.info(f"🕰️ {symbol}: таймфреймы {', '.join(self.timeframes)} из свечей {self.interval}")
+    
+    def _format_klines_data(self, klines_data, symbol: str = None):
+        """Format klines data for MEXC API - ИСПРАВЛЕННАЯ ВЕРСИЯ
+        
+        Принимает массив из MexcClient.get_klines_array или списки в формате
+        REST (поток, кэш); строки с NaN отбрасываются, при ошибке - пустая таблица.
+        """
+        try:
+            df = klines_frame(klines_data)
             
             # Ensure we have the required columns
             if 'close' not in df.columns:
@@ -147,8 +448,8 @@ class TradingBot:
             
         except Exception as e:
             logging.error(f"Error formatting klines data: {e}")
-            current_price = self.get_live_price()
-            return self._generate_test_data(current_price)
+            # Пустая таблица: _analyze_klines сам подставит тестовые данные и не опубликует их
+            return pd.DataFrame()
     
     def _generate_test_data(self, base_price=None):
         """Generate test data when exchange data is not available"""
@@ -174,11 +475,12 @@ class TradingBot:
         logging.info("📊 Сгенерированы тестовые данные")
         return df
     
-    def _run_fallback_analysis(self):
+    def _run_fallback_analysis(self, symbol: str = None):
         """Fallback analysis when main analysis fails - ИСПРАВЛЕННАЯ ВЕРСИЯ"""
+        symbol = symbol or self.symbol
         try:
             # Simple fallback analysis based on random market conditions
-            current_price = self.get_live_price()
+            current_price = self.get_live_price(symbol)
             rsi = np.random.uniform(20, 80)
             
             # More sophisticated fallback logic
@@ -195,25 +497,20 @@ class TradingBot:
                 confidence = 0.5 + np.random.uniform(-0.1, 0.1)
                 reasoning = "Рынок в нейтральной зоне"
             
-            recommendation = {
-                'action': action,
-                'confidence': confidence,
-                'analysis': {
-                    'current_price': current_price,
-                    'rsi': rsi
-                },
-                'reasoning': reasoning
-            }
+            recommendation = Recommendation(
+                action, confidence, price=current_price, rsi=rsi, reasoning=reasoning, symbol=symbol
+            )
             
-            self._log_recommendation(recommendation)
+            self._log_synthetic(recommendation, symbol)
             
         except Exception as e:
             logging.error(f"Fallback analysis also failed: {e}")
             # Ultimate fallback
             logging.info("🆘 Критический резервный режим: HOLD")
     
-    def _log_recommendation(self, recommendation: dict):
+    def _log_recommendation(self, recommendation: Recommendation, symbol: str = None):
         """Log recommendations with better formatting"""
+        symbol = symbol or self.symbol
         try:
             action_emoji = {
                 'BUY': '🟢',
@@ -221,51 +518,85 @@ class TradingBot:
                 'HOLD': '🟡'
             }
             
-            emoji = action_emoji.get(recommendation['action'], '⚪')
+            emoji = action_emoji.get(recommendation.action, '⚪')
+            rsi = f"{recommendation.rsi:.2f}" if recommendation.rsi is not None else 'N/A'
+            price = f"{recommendation.price:.2f}" if recommendation.price is not None else 'N/A'
             
-            log_message = f"""
-{emoji} ANALYSIS {self.symbol}:
-Action: {recommendation['action']}
-Confidence: {recommendation['confidence']:.2f}
-Price: {recommendation['analysis']['current_price']:.2f}
-RSI: {recommendation['analysis'].get('rsi', 'N/A'):.2f}
-Reasoning: {recommendation['reasoning']}
-"""
-            logging.info(log_message)
+            # Одна строка на рекомендацию; поля extra попадают в JSON-лог отдельными ключами
+            logging.info(
+                "%s ANALYSIS %s: Action: %s | Confidence: %.2f | Price: %s | RSI: %s | Reasoning: %s",
+                emoji, symbol, recommendation.action, recommendation.confidence, price, rsi, recommendation.reasoning,
+                extra={'symbol': symbol, 'action': recommendation.action,
+                       'confidence': recommendation.confidence, 'price': recommendation.price,
+                       'rsi': recommendation.rsi}
+            )
             
         except Exception as e:
             logging.error(f"Error logging recommendation: {e}")
     
-    def _execute_trade(self, recommendation: dict):
+    def _log_synthetic(self, recommendation: Recommendation, symbol: str):
+        """Рекомендация без данных биржи: только в лог и без строки ANALYSIS (ее разбирает дашборд)"""
+        logging.warning(
+            f"🧪 {symbol}: нет данных биржи, тестовая рекомендация {recommendation.action} "
+            f"({recommendation.confidence:.2f}) не публикуется"
+        )
+    
+    def _publish_state(self, recommendation: Recommendation, symbol: str = None):
+        """Опубликовать рекомендацию в журнал и общее хранилище для дашборда"""
+        symbol = symbol or self.symbol
+        try:
+            if self.journal is not None:
+                self.journal.append(symbol, recommendation)
+            if self.state_store:
+                indicators = recommendation.indicators or {}
+                self.state_store.publish(symbol, recommendation, indicators, indicators.get('open_time'))
+        except Exception as e:
+            logging.error(f"❌ Ошибка публикации состояния {symbol}: {e}")
+    
+    def _execute_trade(self, recommendation: Recommendation, symbol: str = None):
         """Execute trading operation"""
+        symbol = symbol or self.symbol
         try:
             if not self.trade_enabled:
                 logging.info("🔒 Торговля отключена (режим тестирования)")
                 return
                 
-            if recommendation['action'] == 'BUY':
+            if recommendation.action == 'BUY':
                 # Buy logic
-                result = self.mexc_client.create_order(
-                    symbol=self.symbol,
-                    side='BUY',
-                    order_type='MARKET',
-                    quantity=0.001  # Minimum quantity
-                )
-                logging.info(f"🟢 BUY ORDER: {result}")
+                order = self.order_executor.submit(symbol, 'BUY', 'MARKET', self.order_quantity)
+                logging.info(f"🟢 BUY ORDER в очереди: {order}")
                 
-            elif recommendation['action'] == 'SELL':
+            elif recommendation.action == 'SELL':
                 # Sell logic
-                result = self.mexc_client.create_order(
-                    symbol=self.symbol,
-                    side='SELL', 
-                    order_type='MARKET',
-                    quantity=0.001
-                )
-                logging.info(f"🔴 SELL ORDER: {result}")
+                order = self.order_executor.submit(symbol, 'SELL', 'MARKET', self.order_quantity)
+                logging.info(f"🔴 SELL ORDER в очереди: {order}")
                 
         except Exception as e:
             logging.error(f"❌ Order execution error: {e}")
 
+    def _start_execution(self):
+        """Поток отправки ордеров и приватный поток их исполнения"""
+        self.order_executor.start()
+        if self.simulated:
+            # Симулятор сообщает об исполнении сам, без WebSocket
+            self.mexc_client.add_order_listener(self.order_executor.on_stream_update)
+            self.order_executor.user_stream_connected = True
+            return
+        if not TRADING_SETTINGS.get('user_stream', True):
+            return
+        
+        def on_connection(connected):
+            self.order_executor.user_stream_connected = connected
+        
+        self.user_stream = UserDataStream(
+            self.mexc_client,
+            on_order=self.order_executor.on_stream_update,
+            url=TRADING_SETTINGS.get('stream_url', 'wss://wbs.mexc.com/ws'),
+            on_connection=on_connection
+        )
+        self.user_stream.start()
+        logging.info("📡 Приватный поток ордеров запущен")
+    
     def run_continuous(self):
         """Бесконечный цикл работы бота с улучшенным управлением"""
         consecutive_errors = 0
@@ -273,6 +604,15 @@ Reasoning: {recommendation['reasoning']}
         
         logging.info("🚀 Запуск непрерывного режима работы бота")
         
+        if self.trade_enabled:
+            self._start_execution()
+        
+        # Потоковый режим работает до остановки бота (run_streaming сам перезапускает
+        # поток или останавливает бота), цикл опроса ниже в этом случае не выполняется
+        if self.market_data == 'websocket':
+            self.run_streaming()
+            self.running = False
+        
         while self.running:
             try:
                 self.run_analysis_cycle()
@@ -283,11 +623,15 @@ Reasoning: {recommendation['reasoning']}
                 if consecutive_errors > 0:
                     sleep_time = min(60, 30 * (consecutive_errors + 1))  # Increase sleep on errors
                 
-                # Ждем с проверкой флага running
-                for i in range(sleep_time):
-                    if not self.running:
-                        break
-                    time.sleep(1)
+                if self.simulated and self.mexc_client.finished:
+                    logging.info("🏁 Данные симулятора закончились, останавливаю бота")
+                    self.running = False
+                    break
+                
+                # Ждем с проверкой флага running (в симуляции - в time_scale раз короче)
+                deadline = time.monotonic() + sleep_time / self.time_scale
+                while self.running and time.monotonic() < deadline:
+                    time.sleep(min(1, max(deadline - time.monotonic(), 0)))
                     
             except Exception as e:
                 consecutive_errors += 1
@@ -303,7 +647,27 @@ Reasoning: {recommendation['reasoning']}
                     logging.info(f"🔄 Повторная попытка через {error_sleep} секунд...")
                     time.sleep(error_sleep)
         
+        self.close()
         logging.info("🛑 Бот остановлен")
+    
+    def close(self):
+        """Остановить потоки и закрыть клиент и хранилища бота"""
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        if self.user_stream:
+            self.user_stream.stop()
+        self.order_executor.stop()
+        self.mexc_client.close()
+        rate_limiter = getattr(self.mexc_client, 'rate_limiter', None)
+        if rate_limiter is not None and rate_limiter.state_path:
+            rate_limiter.close()
+        if self.candle_store:
+            self.candle_store.close()
+        if self.state_store:
+            self._publish_metrics(force=True)
+            self.state_store.close()
+        if self.journal is not None:
+            self.journal.close()
 
     def get_bot_status(self):
         """Получить статус бота для дашборда"""
@@ -311,10 +675,26 @@ Reasoning: {recommendation['reasoning']}
             'status': '🟢 RUNNING' if self.running else '🔴 STOPPED',
             'cycle_count': self.cycle_count,
             'symbol': self.symbol,
-            'trade_enabled': self.trade_enabled
+            'symbols': self.symbols,
+            'trade_enabled': self.trade_enabled,
+            'orders': self.order_executor.stats(),
+            'api_latency': self.mexc_client.get_latency_stats(),
+            'api_calls': self.mexc_client.get_call_stats(),
+            'rate_limit': self.mexc_client.rate_limiter.snapshot() if hasattr(self.mexc_client, 'rate_limiter') else None,
+            'cycle_seconds': self.cycle_durations.summary()
         }
 
+def configure_logging():
+    """Логирование с правильной кодировкой: запись в файл и stdout идет в фоновом
+    потоке, цикл анализа не ждет диск. Вызывается точкой входа, а не при импорте:
+    импорт main (тесты, дашборд) не должен заменять sys.stdout и обработчики
+    корневого логгера."""
+    # Исправление кодировки для Windows
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    setup_logging('BOT', 'trading_bot.log', LOG_SETTINGS)
+
 def main():
+    configure_logging()
     try:
         bot = TradingBot()
         logging.info("✅ Торговый бот успешно запущен!")
@@ -0,0 +1,53 @@
+"""Общие помощники тестов: хранилища бота и дашборда вне data/ проекта"""
+import os
+import sys
+from contextlib import contextmanager
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_ROOT)
+
+from config.settings import DATA_SETTINGS, RATE_LIMIT_SETTINGS
+
+PROJECT_DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+
+
+@contextmanager
+def isolated_data(directory: str):
+    """DATA_SETTINGS и файл лимита запросов во временном каталоге на время блока"""
+    original = dict(DATA_SETTINGS), dict(RATE_LIMIT_SETTINGS)
+    DATA_SETTINGS.update(
+        candle_store_path=os.path.join(directory, 'candles.sqlite3'),
+        state_store_path=os.path.join(directory, 'state.sqlite3'),
+        journal_path=os.path.join(directory, 'recommendations.jsonl'),
+        history_path=os.path.join(directory, 'history')
+    )
+    RATE_LIMIT_SETTINGS['state_path'] = os.path.join(directory, 'rate_limit.bin')
+    try:
+        yield directory
+    finally:
+        for settings, values in zip((DATA_SETTINGS, RATE_LIMIT_SETTINGS), original):
+            settings.clear()
+            settings.update(values)
+
+
+def data_snapshot() -> dict:
+    """Размер и время изменения файлов data/ проекта (для проверки, что тест их не тронул)"""
+    if not os.path.isdir(PROJECT_DATA_DIR):
+        return {}
+    snapshot = {}
+    for name in os.listdir(PROJECT_DATA_DIR):
+        stat = os.stat(os.path.join(PROJECT_DATA_DIR, name))
+        snapshot[name] = (stat.st_size, stat.st_mtime_ns)
+    return snapshot
+
+
+def import_dashboard():
+    """web.dashboard без хранилищ DATA_SETTINGS: импорт не открывает data/ проекта"""
+    original = dict(DATA_SETTINGS)
+    DATA_SETTINGS.update(state_store_path=None, journal_path=None)
+    try:
+        import web.dashboard as module
+    finally:
+        DATA_SETTINGS.clear()
+        DATA_SETTINGS.update(original)
+    return module.app, module.dashboard
@@ -0,0 +1,148 @@
+import os
+import sys
+import time
+import hmac
+import asyncio
+import hashlib
+import logging
+from urllib.parse import unquote
+
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.async_mexc_client import AsyncMexcClient, AsyncTokenBucket
+from api.rate_limiter import RateLimiter
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def start_fake_mexc():
+    """Локальный заменитель MEXC API, запоминающий TCP-соединения клиентов"""
+    peers = set()
+
+    async def ticker_price(request):
+        peers.add(request.transport.get_extra_info('peername'))
+        return web.json_response({'symbol': request.query['symbol'], 'price': '121695.25'})
+
+    async def klines(request):
+        peers.add(request.transport.get_extra_info('peername'))
+        limit = int(request.query['limit'])
+        return web.json_response([
+            [1700000000000 + i * 1800000, "1.0", "2.0", "0.5", "1.5", "10.0", 1700001800000 + i * 1800000, "15.0"]
+            for i in range(limit)
+        ])
+
+    app = web.Application()
+    app.router.add_get('/api/v3/ticker/price', ticker_price)
+    app.router.add_get('/api/v3/klines', klines)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", peers
+
+
+def test_async_client_reuses_connection():
+    """Последовательные запросы идут через одно keep-alive соединение"""
+    async def scenario():
+        runner, base_url, peers = await start_fake_mexc()
+        try:
+            async with AsyncMexcClient('test_key', 'test_secret', base_url=base_url, rate=100, burst=100) as client:
+                price = await client.get_current_price('BTCUSDT')
+                klines = await client.get_klines('BTCUSDT', '30m', 5)
+                ticker = await client.get_ticker_price('ETHUSDT')
+        finally:
+            await runner.cleanup()
+        return price, klines, ticker, peers
+
+    price, klines, ticker, peers = asyncio.run(scenario())
+    assert price == 121695.25
+    assert len(klines) == 5
+    assert ticker['symbol'] == 'ETHUSDT'
+    assert len(peers) == 1
+    logging.info("✅ Все запросы прошли через одно соединение")
+
+
+def test_async_client_many_symbols():
+    """Свечи для нескольких символов запрашиваются параллельно"""
+    async def scenario():
+        runner, base_url, _ = await start_fake_mexc()
+        try:
+            async with AsyncMexcClient('test_key', 'test_secret', base_url=base_url, rate=100, burst=100) as client:
+                return await client.get_klines_many(['BTCUSDT', 'ETHUSDT', 'ADAUSDT'], '30m', 10)
+        finally:
+            await runner.cleanup()
+
+    result = asyncio.run(scenario())
+    assert sorted(result) == ['ADAUSDT', 'BTCUSDT', 'ETHUSDT']
+    assert all(len(klines) == 10 for klines in result.values())
+
+
+def test_signed_requests_after_limiter_wait():
+    """timestamp берется после ожидания лимита, строка запроса совпадает с подписанной"""
+    received = []
+
+    async def signed(request):
+        received.append((time.time() * 1000, request.query_string))
+        return web.json_response({'orderId': '1'})
+
+    async def scenario():
+        app = web.Application()
+        app.router.add_get('/api/v3/account', signed)
+        app.router.add_post('/api/v3/order', signed)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+        limiter = RateLimiter({'market': {'rate': 100.0, 'capacity': 10.0},
+                               'account': {'rate': 100.0, 'capacity': 10.0},
+                               'order': {'rate': 100.0, 'capacity': 10.0}})
+        try:
+            async with AsyncMexcClient('test_key', 'test_secret', base_url=base_url,
+                                       rate_limiter=limiter) as client:
+                # 429 ставит bucket на паузу: подпись должна делаться уже после нее
+                limiter.update('POST', '/api/v3/order', 429, retry_after='0.3')
+                limiter.update('GET', '/api/v3/account', 429, retry_after='0.3')
+                started = time.time() * 1000
+                await client.create_order('BTCUSDT', 'buy', 'limit', 0.5, price=67000.5, client_order_id='tb1')
+                await client.get_account_info()
+        finally:
+            await runner.cleanup()
+        return started
+
+    started = asyncio.run(scenario())
+    assert len(received) == 2
+    for _, query in received:
+        unsigned, signature = unquote(query).rsplit('&signature=', 1)
+        params = dict(pair.split('=', 1) for pair in unsigned.split('&'))
+        assert list(params) == sorted(params)
+        expected = hmac.new(b'test_secret', unsigned.encode('utf-8'), hashlib.sha256).hexdigest()
+        assert signature == expected
+        assert int(params['timestamp']) >= started + 290
+        assert params['recvWindow'] == '5000'
+    order = dict(pair.split('=', 1) for pair in unquote(received[0][1]).split('&'))
+    assert order['side'] == 'BUY' and order['type'] == 'LIMIT' and order['newClientOrderId'] == 'tb1'
+
+
+def test_token_bucket_limits_rate():
+    """После исчерпания запаса токены выдаются со скоростью rate"""
+    async def scenario():
+        bucket = AsyncTokenBucket(rate=50, capacity=5)
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for _ in range(15)))
+        return time.monotonic() - started
+
+    elapsed = asyncio.run(scenario())
+    # 5 токенов сразу, еще 10 - по 20 мс
+    assert elapsed >= 0.18
+
+
+if __name__ == "__main__":
+    test_async_client_reuses_connection()
+    test_async_client_many_symbols()
+    test_signed_requests_after_limiter_wait()
+    test_token_bucket_limits_rate()
@@ -0,0 +1,133 @@
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from api.backfill import KlinesBackfill, load_history, history_path
+from api.mexc_client import MexcClient
+from api.simulated_client import synthetic_klines
+
+logging.basicConfig(level=logging.INFO)
+
+MINUTE = 60000
+
+
+class HistoryClient(MexcClient):
+    """MexcClient, отдающий страницы из массива свечей; pages из failing не загружаются"""
+
+    def __init__(self, klines):
+        super().__init__('test_key', 'test_secret')
+        self.klines = klines
+        self.requests = []
+        self.failing = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._counter_lock = threading.Lock()
+
+    def _fetch_klines(self, symbol, interval='30m', limit=100, start_time=None, end_time=None, raw=False):
+        with self._counter_lock:
+            self.requests.append(start_time)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(0.002)
+            if start_time in self.failing:
+                return None
+            times = self.klines['open_time']
+            return self.klines[(times >= start_time) & (times <= end_time)][:limit].tolist()
+        finally:
+            with self._counter_lock:
+                self.in_flight -= 1
+
+
+def test_parallel_download_and_resume():
+    klines = synthetic_klines(20000, '1m', start_time=0, seed=5)
+    client = HistoryClient(klines)
+    directory = tempfile.mkdtemp()
+    backfill = KlinesBackfill(client, directory, max_workers=4, page_limit=1000, checkpoint_pages=5)
+
+    stats = backfill.download('BTCUSDT', '1m', 5000 * MINUTE, 14999 * MINUTE)
+    assert stats['pages'] == 10 and not stats['failed']
+    assert client.max_in_flight > 1
+    saved = load_history(directory, 'BTCUSDT', '1m')
+    assert (saved == klines[5000:15000]).all()
+    assert os.path.exists(history_path(directory, 'BTCUSDT', '1m'))
+
+    # Продолжение: с последней сохраненной свечи и кусок перед первой
+    client.requests.clear()
+    stats = backfill.download('BTCUSDT', '1m', 3000 * MINUTE, 17999 * MINUTE)
+    assert not stats['failed'] and stats['new_candles'] == 5000
+    assert min(client.requests) == 3000 * MINUTE
+    assert sorted(r for r in client.requests if r >= 5000 * MINUTE) == [m * MINUTE for m in (14999, 15999, 16999, 17999)]
+    assert (load_history(directory, 'BTCUSDT', '1m') == klines[3000:18000]).all()
+
+
+def test_failed_page_keeps_prefix():
+    klines = synthetic_klines(10000, '1m', start_time=0, seed=6)
+    client = HistoryClient(klines)
+    client.failing.add(6000 * MINUTE)
+    directory = tempfile.mkdtemp()
+    backfill = KlinesBackfill(client, directory, max_workers=3, retries=2, retry_delay=0)
+
+    stats = backfill.download('ETHUSDT', '1m', 0, 9999 * MINUTE)
+    assert stats['failed']
+    saved = load_history(directory, 'ETHUSDT', '1m')
+    assert saved['open_time'][-1] == 5999 * MINUTE
+    assert (saved == klines[:6000]).all()
+
+    client.failing.clear()
+    stats = backfill.download('ETHUSDT', '1m', 0, 9999 * MINUTE)
+    assert not stats['failed']
+    assert (load_history(directory, 'ETHUSDT', '1m') == klines).all()
+
+
+class RecordingSession:
+    """Сессия requests, отвечающая месячными свечами и запоминающая параметры запросов"""
+
+    def __init__(self, klines):
+        self.klines = klines
+        self.params = []
+
+    def request(self, method, url, params=None, **kwargs):
+        self.params.append(dict(params))
+        start = params.get('startTime', 0)
+        end = params.get('endTime', float('inf'))
+        rows = [k for k in self.klines if start <= k[0] <= end][:params['limit']]
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(rows).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def test_month_interval_is_sent_as_1M():
+    """'1M' уходит на биржу как месяц, а не как '1m' после приведения к нижнему регистру"""
+    month = 30 * 24 * 60 * MINUTE
+    klines = [[i * month, "1.0", "2.0", "0.5", "1.5", "10.0", (i + 1) * month - 1, "15.0"] for i in range(5)]
+    client = MexcClient('test_key', 'test_secret')
+    client.session = RecordingSession(klines)
+
+    with tempfile.TemporaryDirectory() as directory:
+        stats = KlinesBackfill(client, directory, page_limit=2, retry_delay=0).download('BTCUSDT', '1M', 0, 5 * month)
+        assert not stats['failed'] and stats['candles'] == 5
+        assert stats['path'].endswith('1mon.npz')
+
+    assert client.session.params
+    assert {params['interval'] for params in client.session.params} == {'1M'}
+    client.get_klines('BTCUSDT', '1m', 2, start_time=0)
+    assert client.session.params[-1]['interval'] == '1m'
+
+
+if __name__ == "__main__":
+    test_parallel_download_and_resume()
+    test_failed_page_keeps_prefix()
+    test_month_interval_is_sent_as_1M()
@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import logging
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.analysis_engine import AIAnalysisEngine, ACTION_BUY as BUY, ACTION_SELL as SELL, ACTION_HOLD as HOLD
+from ai.backtest import Backtester
+
+logging.basicConfig(level=logging.INFO)
+
+
+def make_candles(rows, seed=7):
+    """Детерминированные свечи со случайным блужданием"""
+    rng = np.random.default_rng(seed)
+    close = 67500 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    return pd.DataFrame({
+        'open_time': np.arange(rows, dtype=np.int64) * 1800000,
+        'open': open_,
+        'high': np.maximum(open_, close) * 1.002,
+        'low': np.minimum(open_, close) * 0.998,
+        'close': close,
+        'volume': rng.uniform(1000, 5000, rows),
+    })
+
+
+def old_advanced_analysis(data):
+    """Копия исходного построчного анализа (if/elif) - эталон для векторного расчета"""
+    factors = []
+    reasoning = []
+
+    rsi_score = 0
+    if data['rsi'] < 30:
+        rsi_score = 1.0
+        reasoning.append("RSI в зоне перепроданности")
+    elif data['rsi'] > 70:
+        rsi_score = -1.0
+        reasoning.append("RSI в зоне перекупленности")
+    factors.append(('rsi', rsi_score, 0.2))
+
+    if data['ma_5'] > data['ma_20'] > data['ma_50']:
+        ma_score = 1.0
+        reasoning.append("Все скользящие средние выстроены в бычьем порядке")
+    elif data['ma_5'] < data['ma_20'] < data['ma_50']:
+        ma_score = -1.0
+        reasoning.append("Все скользящие средние выстроены в медвежьем порядке")
+    elif data['ma_5'] > data['ma_20']:
+        ma_score = 0.5
+        reasoning.append("Краткосрочный тренд восходящий")
+    else:
+        ma_score = -0.5
+        reasoning.append("Краткосрочный тренд нисходящий")
+    factors.append(('ma', ma_score, 0.25))
+
+    macd_score = 0
+    if data['macd'] > data['macd_signal'] and data['macd_histogram'] > 0:
+        macd_score = 1.0
+        reasoning.append("MACD показывает бычью дивергенцию")
+    elif data['macd'] < data['macd_signal'] and data['macd_histogram'] < 0:
+        macd_score = -1.0
+        reasoning.append("MACD показывает медвежью дивергенцию")
+    factors.append(('macd', macd_score, 0.15))
+
+    bb_score = 0
+    if data['bb_position'] < 0.1:
+        bb_score = 1.0
+        reasoning.append("Цена у нижней границы Боллинджера")
+    elif data['bb_position'] > 0.9:
+        bb_score = -1.0
+        reasoning.append("Цена у верхней границы Боллинджера")
+    factors.append(('bb', bb_score, 0.15))
+
+    volume_score = 0
+    if data['volume_ratio'] > 1.5:
+        volume_score = 0.5 * (1 if data['price_change_1h'] > 0 else -1)
+        reasoning.append("Высокий объем подтверждает движение")
+    factors.append(('volume', volume_score, 0.1))
+
+    momentum_score = 0
+    if data['price_change_1h'] > 0.02:
+        momentum_score = 0.5
+        reasoning.append("Сильный восходящий импульс")
+    elif data['price_change_1h'] < -0.02:
+        momentum_score = -0.5
+        reasoning.append("Сильный нисходящий импульс")
+    factors.append(('momentum', momentum_score, 0.15))
+
+    total_score = sum(score * weight for _, score, weight in factors)
+    total_weight = sum(weight for _, _, weight in factors)
+    normalized_score = total_score / total_weight if total_weight > 0 else 0
+
+    if normalized_score > 0.3:
+        action = "BUY"
+        confidence = min(0.5 + (normalized_score * 0.5), 0.95)
+    elif normalized_score < -0.3:
+        action = "SELL"
+        confidence = min(0.5 + (abs(normalized_score) * 0.5), 0.9)
+    else:
+        action = "HOLD"
+        confidence = 0.5
+
+    reasoning.append(f"Общий счет: {normalized_score:.2f}")
+    return {'action': action, 'confidence': confidence, 'reasoning': " | ".join(reasoning)}
+
+
+def make_score_rows(rows, seed=11):
+    """Случайные строки индикаторов с NaN и значениями ровно на порогах"""
+    rng = np.random.default_rng(seed)
+    edges = {
+        'rsi': [30.0, 70.0, np.nan],
+        'bb_position': [0.1, 0.9, np.nan],
+        'volume_ratio': [1.5, np.nan],
+        'price_change_1h': [0.02, -0.02, 0.0, np.nan],
+        'macd_histogram': [0.0, np.nan],
+    }
+    df = pd.DataFrame({
+        'close': rng.uniform(60000, 70000, rows),
+        'rsi': rng.uniform(0, 100, rows),
+        'ma_5': rng.choice([100.0, 101.0, 102.0, np.nan], rows),
+        'ma_20': rng.choice([100.0, 101.0, 102.0, np.nan], rows),
+        'ma_50': rng.choice([100.0, 101.0, 102.0, np.nan], rows),
+        'macd': rng.choice([-1.0, 0.0, 1.0, np.nan], rows),
+        'macd_signal': rng.choice([-1.0, 0.0, 1.0, np.nan], rows),
+        'macd_histogram': rng.normal(0, 1, rows),
+        'bb_position': rng.uniform(-0.2, 1.2, rows),
+        'volume_ratio': rng.uniform(0.5, 3.0, rows),
+        'price_change_1h': rng.normal(0, 0.03, rows),
+    })
+    for column, values in edges.items():
+        mask = rng.random(rows) < 0.3
+        df.loc[mask, column] = rng.choice(values, int(mask.sum()))
+    return df
+
+
+def test_batch_scores_match_single_row_analysis():
+    """analyze_batch и _advanced_analysis совпадают с исходным построчным анализом"""
+    engine = AIAnalysisEngine()
+    names = {BUY: 'BUY', SELL: 'SELL', HOLD: 'HOLD'}
+    indicators = engine.calculate_technical_indicators(make_candles(400))
+    df = pd.concat([indicators, make_score_rows(2000)], ignore_index=True)
+    signals = engine.analyze_batch(df)
+
+    for i in range(len(df)):
+        row = df.iloc[i]
+        expected = old_advanced_analysis(row)
+        single = engine._advanced_analysis(row, 'BTCUSDT')
+        assert names[int(signals['action'][i])] == expected['action'], i
+        assert signals['confidence'][i] == expected['confidence'], i
+        assert single['action'] == expected['action'], i
+        assert single['confidence'] == expected['confidence'], i
+        assert single['reasoning'] == expected['reasoning'], i
+
+
+def test_simulate_fills_and_costs():
+    """Вход и выход по open следующего бара с комиссией и проскальзыванием"""
+    backtester = Backtester(fee_rate=0.001, slippage=0.0, confidence_threshold=0.7)
+    open_ = np.array([100.0, 100.0, 110.0, 120.0, 120.0])
+    close = np.array([100.0, 110.0, 120.0, 120.0, 130.0])
+    action = np.array([BUY, HOLD, SELL, HOLD, HOLD])
+    confidence = np.array([0.8, 0.5, 0.8, 0.5, 0.5])
+
+    result = backtester.simulate(open_, close, action, confidence)
+
+    assert list(result['position']) == [0, 1, 1, 0, 0]
+    expected = 10000.0 * (110 / 100 * 0.999) * (120 / 110) * (120 / 120 * 0.999)
+    np.testing.assert_allclose(result['final_equity'], expected)
+    assert result['total_trades'] == 1
+    assert result['win_rate'] == 1.0
+    # Единственная просадка - комиссия за выход
+    np.testing.assert_allclose(result['max_drawdown'], 0.001)
+
+
+def test_backtest_year_of_minute_bars_is_fast():
+    """Год минутных свечей обрабатывается за секунды"""
+    candles = make_candles(525_600)
+    started = time.perf_counter()
+    result = Backtester(interval='1m').run(candles)
+    elapsed = time.perf_counter() - started
+
+    logging.info(f"⏱️ {result['bars']} свечей за {elapsed:.2f}с, сделок: {result['total_trades']}")
+    assert result['bars'] == 525_600
+    assert len(result['equity_curve']) == 525_600
+    assert elapsed < 10
+
+
+if __name__ == "__main__":
+    test_batch_scores_match_single_row_analysis()
+    test_simulate_fills_and_costs()
+    test_backtest_year_of_minute_bars_is_fast()
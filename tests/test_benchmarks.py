@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import logging
+import tempfile
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_analysis import make_klines, make_candles, run_suite, compare, main
+
+logging.basicConfig(level=logging.INFO)
+
+
+def test_synthetic_klines_are_deterministic():
+    """Одинаковый seed дает одинаковые свечи в формате MEXC"""
+    klines = make_klines(50, seed=1)
+    assert klines == make_klines(50, seed=1)
+    assert klines != make_klines(50, seed=2)
+    assert len(klines[0]) == 8
+    assert isinstance(klines[0][4], str)
+
+    candles = make_candles(klines)
+    assert len(candles) == 50
+    assert candles['close'].dtype == float
+
+
+def test_benchmarks_do_not_import_bot():
+    """Бенчмарк не тянет main: импорт бота настраивает логирование и сигналы"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import sys; sys.path.insert(0, sys.argv[1]); import benchmarks.bench_analysis; "
+            "assert 'main' not in sys.modules, 'main imported'")
+    subprocess.run([sys.executable, '-c', code, root], check=True, timeout=60)
+
+
+def test_suite_report_and_compare():
+    """Отчет содержит все замеры, сравнение находит замедление"""
+    report = run_suite(sizes=[100], repeat=1)
+    names = {result['benchmark'] for result in report['results']}
+    assert names == {'parse_klines_json', 'klines_frame', 'calculate_technical_indicators',
+                     'advanced_analysis', 'get_ai_recommendation'}
+    for result in report['results']:
+        assert result['median_s'] > 0
+        assert result['items_per_s'] > 0
+        assert result['peak_mb'] >= 0
+    assert report['meta']['seed'] == 42
+
+    slower = json.loads(json.dumps(report))
+    for result in slower['results']:
+        result['median_s'] *= 2
+    diff = compare(slower, report, tolerance=0.2)
+    assert len(diff) == 5
+    assert all(row['regression'] for row in diff)
+    assert not any(row['regression'] for row in compare(report, report))
+
+
+def test_cli_writes_json():
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, 'bench.json')
+        assert main(['--sizes', '100', '--repeat', '1', '--output', output]) == 0
+        with open(output, 'r', encoding='utf-8') as f:
+            assert len(json.load(f)['results']) == 5
+
+
+if __name__ == "__main__":
+    test_synthetic_klines_are_deterministic()
+    test_benchmarks_do_not_import_bot()
+    test_suite_report_and_compare()
+    test_cli_writes_json()
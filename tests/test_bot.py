@@ -1,14 +1,24 @@
 # test_bot.py
+import tempfile
+
 from main import TradingBot
+from tests.helpers import isolated_data, data_snapshot
 
 def test_bot():
-    bot = TradingBot()
-    bot.trade_enabled = False  # Только анализ без торговли
-    
-    # Тестовый запуск
-    for i in range(3):
-        print(f"Тестовый цикл {i+1}")
-        bot.run_analysis_cycle()
+    before = data_snapshot()
+    # Хранилища и лимит запросов - во временном каталоге, а не в data/ проекта
+    with tempfile.TemporaryDirectory() as tmp, isolated_data(tmp):
+        bot = TradingBot()
+        bot.trade_enabled = False  # Только анализ без торговли
+        
+        try:
+            # Тестовый запуск
+            for i in range(3):
+                print(f"Тестовый цикл {i+1}")
+                bot.run_analysis_cycle()
+        finally:
+            bot.close()
+    assert data_snapshot() == before
 
 if __name__ == "__main__":
     test_bot()
\ No newline at end of file
@@ -1,7 +1,10 @@
 import logging
+import tempfile
 import pandas as pd
 from datetime import datetime
 
+from tests.helpers import isolated_data, data_snapshot
+
 # Настройка логирования
 logging.basicConfig(
     level=logging.DEBUG,
@@ -17,46 +20,54 @@ def test_bot_data_flow():
     print("🤖 ТЕСТИРУЕМ ПОТОК ДАННЫХ В БОТЕ")
     print("=" * 50)
     
-    try:
-        from main import TradingBot
+    before = data_snapshot()
+    # Хранилища бота - во временном каталоге, а не в data/ проекта
+    with tempfile.TemporaryDirectory() as tmp, isolated_data(tmp):
+        bot = None
+        try:
+            from main import TradingBot
         
-        # Создаем бота
-        bot = TradingBot()
-        logging.info("✅ Бот создан")
+            # Создаем бота
+            bot = TradingBot()
+            logging.info("✅ Бот создан")
         
-        # Тест 1: Получение живой цены
-        logging.info("🔍 ТЕСТ 1: Получение живой цены")
-        price = bot.get_live_price()
-        logging.info(f"💰 Живая цена: ${price}")
+            # Тест 1: Получение живой цены
+            logging.info("🔍 ТЕСТ 1: Получение живой цены")
+            price = bot.get_live_price()
+            logging.info(f"💰 Живая цена: ${price}")
         
-        # Тест 2: Получение данных с биржи
-        logging.info("🔍 ТЕСТ 2: Получение данных с биржи")
-        klines_data = bot.mexc_client.get_klines('BTCUSDT', '30m', 10)
-        logging.info(f"📊 Данные от биржи: {len(klines_data) if klines_data else 0} записей")
+            # Тест 2: Получение данных с биржи
+            logging.info("🔍 ТЕСТ 2: Получение данных с биржи")
+            klines_data = bot.mexc_client.get_klines('BTCUSDT', '30m', 10)
+            logging.info(f"📊 Данные от биржи: {len(klines_data) if klines_data else 0} записей")
         
-        if klines_data:
-            logging.info(f"📈 Пример данных: {klines_data[0]}")
+            if klines_data:
+                logging.info(f"📈 Пример данных: {klines_data[0]}")
         
-        # Тест 3: Форматирование данных
-        logging.info("🔍 ТЕСТ 3: Форматирование данных")
-        if klines_data:
-            formatted_data = bot._format_klines_data(klines_data)
-            logging.info(f"✅ Данные отформатированы: {len(formatted_data)} строк")
-            logging.info(f"📋 Колонки: {list(formatted_data.columns)}")
-            logging.info(f"📊 Первые 3 строки:\n{formatted_data.head(3)}")
-        else:
-            logging.warning("⚠️ Нет данных для форматирования")
+            # Тест 3: Форматирование данных
+            logging.info("🔍 ТЕСТ 3: Форматирование данных")
+            if klines_data:
+                formatted_data = bot._format_klines_data(klines_data)
+                logging.info(f"✅ Данные отформатированы: {len(formatted_data)} строк")
+                logging.info(f"📋 Колонки: {list(formatted_data.columns)}")
+                logging.info(f"📊 Первые 3 строки:\n{formatted_data.head(3)}")
+            else:
+                logging.warning("⚠️ Нет данных для форматирования")
             
-        # Тест 4: Генерация тестовых данных
-        logging.info("🔍 ТЕСТ 4: Генерация тестовых данных")
-        test_data = bot._generate_test_data(price)
-        logging.info(f"✅ Тестовые данные созданы: {len(test_data)} строк")
-        logging.info(f"📊 Первые 3 строки:\n{test_data.head(3)}")
+            # Тест 4: Генерация тестовых данных
+            logging.info("🔍 ТЕСТ 4: Генерация тестовых данных")
+            test_data = bot._generate_test_data(price)
+            logging.info(f"✅ Тестовые данные созданы: {len(test_data)} строк")
+            logging.info(f"📊 Первые 3 строки:\n{test_data.head(3)}")
         
-    except Exception as e:
-        logging.error(f"❌ ОШИБКА В БОТЕ: {e}")
-        import traceback
-        logging.error(f"🔍 СТЕК ВЫЗОВОВ: {traceback.format_exc()}")
+        except Exception as e:
+            logging.error(f"❌ ОШИБКА В БОТЕ: {e}")
+            import traceback
+            logging.error(f"🔍 СТЕК ВЫЗОВОВ: {traceback.format_exc()}")
+        finally:
+            if bot is not None:
+                bot.close()
+    assert data_snapshot() == before
 
 def test_analysis_engine():
     """Тестирование AI анализа"""
@@ -0,0 +1,65 @@
+import os
+import sys
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from web.bot_runner import BotRunner
+
+logging.basicConfig(level=logging.INFO)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Дочерний процесс, имитирующий бота: посторонний вывод, события и ожидание stop
+FAKE_BOT = '''
+import json, sys
+print("не событие", flush=True)
+for event in ({"event": "started", "pid": 1}, {"event": "cycle", "cycle_count": 1, "seconds": 0.5, "at": 100.0}):
+    print(json.dumps(event), flush=True)
+for line in sys.stdin:
+    if line.strip() == "stop":
+        break
+print(json.dumps({"event": "stopped", "cycle_count": 1}), flush=True)
+'''
+
+
+def test_runner_ready_on_first_cycle_and_stops():
+    """Готовность по событию cycle, остановка командой stop через stdin"""
+    events = []
+    runner = BotRunner(PROJECT_ROOT, on_event=lambda event, data: events.append(event))
+    runner.command = [sys.executable, '-c', FAKE_BOT]
+
+    assert runner.start()
+    assert not runner.start()
+    assert runner.wait_ready(10)
+    assert runner.is_running() and runner.pid
+
+    status = runner.status()
+    assert status['state'] == 'running'
+    assert status['cycle_count'] == 1
+    assert status['last_cycle_seconds'] == 0.5
+
+    assert runner.stop(timeout=10)
+    assert not runner.is_running()
+    assert runner.status()['return_code'] == 0
+    assert events == ['started', 'cycle', 'stopped', 'exited']
+    assert not runner.stop()
+
+
+def test_runner_reports_early_exit():
+    """Процесс завершился до первого цикла - wait_ready не ждет весь таймаут"""
+    runner = BotRunner(PROJECT_ROOT)
+    runner.command = [sys.executable, '-c',
+                      'import json, sys; print(json.dumps({"event": "error", "message": "boom"})); sys.exit(3)']
+    runner.start()
+
+    assert not runner.wait_ready(30)
+    status = runner.status()
+    assert status['state'] == 'stopped'
+    assert status['return_code'] == 3
+    assert status['error'] == 'boom'
+
+
+if __name__ == "__main__":
+    test_runner_ready_on_first_cycle_and_stops()
+    test_runner_reports_early_exit()
@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.candle_store import CandleStore
+from api.mexc_client import MexcClient
+from utils.models import CandleBuffer
+
+logging.basicConfig(level=logging.INFO)
+
+INTERVAL_MS = 1800000
+
+
+def make_klines(first_open_time, count, close=100.0):
+    return [
+        [first_open_time + i * INTERVAL_MS, str(close), str(close + 1), str(close - 1), str(close + i),
+         "10.0", first_open_time + (i + 1) * INTERVAL_MS, "1000.0"]
+        for i in range(count)
+    ]
+
+
+class RecordingClient(MexcClient):
+    """MexcClient, отвечающий из списка свечей и запоминающий запросы"""
+
+    def __init__(self, store, exchange_klines):
+        super().__init__('test_key', 'test_secret', candle_store=store)
+        self.exchange_klines = exchange_klines
+        self.requests = []
+
+    def _fetch_klines(self, symbol, interval='30m', limit=100, start_time=None, end_time=None):
+        self.requests.append({'limit': limit, 'start_time': start_time})
+        data = self.exchange_klines
+        if start_time is not None:
+            data = [k for k in data if k[0] >= start_time]
+        return data[-limit:]
+
+
+def test_get_klines_fetches_only_new_candles():
+    """Второй вызов докачивает свечи начиная с последней сохраненной"""
+    now = int(time.time() * 1000)
+    first = now - now % INTERVAL_MS - 99 * INTERVAL_MS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CandleStore(os.path.join(tmp, 'candles.sqlite3'))
+        client = RecordingClient(store, make_klines(first, 100))
+
+        klines = client.get_klines('BTCUSDT', '30m', 100)
+        assert len(klines) == 100
+        assert client.requests[-1] == {'limit': 100, 'start_time': None}
+
+        # На бирже появилась новая свеча, а последняя была пересчитана
+        updated = make_klines(first, 101)
+        updated[99][4] = "555.0"
+        client.exchange_klines = updated
+
+        klines = client.get_klines('BTCUSDT', '30m', 100)
+        assert client.requests[-1]['start_time'] == first + 99 * INTERVAL_MS
+        assert len(klines) == 100
+        assert klines[-1][0] == first + 100 * INTERVAL_MS
+        assert klines[-2][4] == 555.0
+        assert store.count('BTCUSDT', '30m') == 101
+
+        # История глубже limit отдается из кэша
+        assert len(client.get_klines('BTCUSDT', '30m', 101)) == 101
+        store.close()
+    logging.info("✅ Кэш свечей докачивает только новые данные")
+
+
+def test_store_is_served_when_exchange_fails():
+    """При ошибке биржи отдаются сохраненные свечи, а не случайные данные"""
+    now = int(time.time() * 1000)
+    first = now - now % INTERVAL_MS - 9 * INTERVAL_MS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CandleStore(os.path.join(tmp, 'candles.sqlite3'))
+        store.upsert('BTCUSDT', '30m', make_klines(first, 10))
+
+        client = RecordingClient(store, [])
+        client._fetch_klines = lambda *args, **kwargs: None
+
+        klines = client.get_klines('BTCUSDT', '30m', 10)
+        assert [k[0] for k in klines] == [first + i * INTERVAL_MS for i in range(10)]
+        store.close()
+
+
+def test_buffer_is_served_without_rereading_store():
+    """С буфером кэш читается один раз, дальше в буфер дописываются только свечи ответа"""
+    now = int(time.time() * 1000)
+    first = now - now % INTERVAL_MS - 99 * INTERVAL_MS
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = CandleStore(os.path.join(tmp, 'candles.sqlite3'))
+        client = RecordingClient(store, make_klines(first, 100))
+        reads = []
+        get_klines = store.get_klines
+        store.get_klines = lambda *args, **kwargs: reads.append(args) or get_klines(*args, **kwargs)
+        buffer = CandleBuffer(100)
+
+        klines = client.get_klines_array('BTCUSDT', '30m', 100, buffer=buffer)
+        assert len(klines) == 100 and len(reads) == 1
+
+        updated = make_klines(first, 101)
+        updated[99][4] = "555.0"
+        client.exchange_klines = updated
+        klines = client.get_klines_array('BTCUSDT', '30m', 100, buffer=buffer)
+        assert len(reads) == 1
+        assert client.requests[-1]['start_time'] == first + 99 * INTERVAL_MS
+        assert klines['open_time'][-1] == first + 100 * INTERVAL_MS
+        assert klines['close'][-2] == 555.0
+        assert store.count('BTCUSDT', '30m') == 101
+
+        # Кэш пополнил другой процесс - буфер заполняется из кэша заново
+        store.upsert('BTCUSDT', '30m', make_klines(first + 101 * INTERVAL_MS, 1))
+        client.exchange_klines = make_klines(first, 102)
+        klines = client.get_klines_array('BTCUSDT', '30m', 100, buffer=buffer)
+        assert len(reads) == 2
+        assert list(klines['open_time']) == [first + i * INTERVAL_MS for i in range(2, 102)]
+        store.close()
+
+
+if __name__ == "__main__":
+    test_get_klines_fetches_only_new_candles()
+    test_store_is_served_when_exchange_fails()
+    test_buffer_is_served_without_rereading_store()
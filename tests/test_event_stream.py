@@ -0,0 +1,89 @@
+import os
+import sys
+import json
+import time
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.journal import RecommendationJournal
+from utils.log_tail import LogTailer
+from web.event_stream import EventBroadcaster
+
+logging.basicConfig(level=logging.INFO)
+
+
+def read_events(client, count, timeout=5.0):
+    """Собрать count событий из очереди клиента"""
+    events = []
+    deadline = time.monotonic() + timeout
+    while len(events) < count:
+        message = client.get(timeout=max(deadline - time.monotonic(), 0.01))
+        lines = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_broadcast_deltas_to_all_clients():
+    """Все клиенты получают изменения статуса, новые рекомендации и строки лога"""
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = RecommendationJournal(os.path.join(tmp, 'recommendations.jsonl'))
+        log_file = os.path.join(tmp, 'trading_bot.log')
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write("старая строка\n")
+
+        state = {'status': '🔴 STOPPED', 'current_price': 67000.0, 'last_update': ''}
+        calls = []
+
+        def status_fn():
+            calls.append(1)
+            return dict(state, last_update=str(len(calls)))
+
+        broadcaster = EventBroadcaster(status_fn, journal=journal, log_tailer=LogTailer(),
+                                       log_file=log_file, interval=0.05)
+        first = broadcaster.subscribe()
+        second = broadcaster.subscribe()
+
+        for client in (first, second):
+            event, data = read_events(client, 1)[0]
+            assert event == 'status'
+            assert data['current_price'] == 67000.0
+
+        # Меняется только цена - в событии только цена
+        state['current_price'] = 67100.0
+        journal.append('BTCUSDT', {'action': 'BUY', 'confidence': 0.8,
+                                   'analysis': {'current_price': 67100.0, 'rsi': 28.0},
+                                   'reasoning': 'RSI перепродан'})
+        with open(log_file, 'a', encoding='utf-8') as f:
+            f.write("новая строка\n")
+
+        for client in (first, second):
+            events = dict(read_events(client, 3))
+            assert events['status'] == {'current_price': 67100.0, 'last_update': events['status']['last_update']}
+            assert events['recommendation']['action'] == 'BUY'
+            assert events['log'] == ["новая строка\n"]
+
+        # Без клиентов источник останавливается
+        broadcaster.unsubscribe(first)
+        broadcaster.unsubscribe(second)
+        time.sleep(0.2)
+        polls = len(calls)
+        time.sleep(0.2)
+        assert len(calls) == polls
+        journal.close()
+
+
+def test_slow_client_drops_oldest():
+    """Переполненная очередь медленного клиента теряет самые старые сообщения"""
+    broadcaster = EventBroadcaster(lambda: {}, queue_size=3)
+    client = broadcaster.subscribe()
+    for i in range(10):
+        broadcaster.publish('log', [f"строка {i}"])
+    assert [data for _, data in read_events(client, 3)] == [["строка 7"], ["строка 8"], ["строка 9"]]
+    broadcaster.unsubscribe(client)
+
+
+if __name__ == "__main__":
+    test_broadcast_deltas_to_all_clients()
+    test_slow_client_drops_oldest()
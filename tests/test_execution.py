@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import time
+import logging
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.execution import OrderBook, OrderExecutor, UserDataStream
+
+logging.basicConfig(level=logging.INFO)
+
+
+class FakeExchange:
+    """Клиент с create_order/query_order; первые failures запросов доходят до биржи, но падают по таймауту"""
+
+    def __init__(self, failures=0, lost=False, query_failures=0):
+        self.failures = failures
+        self.lost = lost  # Ордер при ошибке не дошел до биржи
+        self.query_failures = query_failures  # Первые запросы состояния падают (ордер еще не виден)
+        self.orders = {}
+        self.create_calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def create_order(self, symbol, side, order_type, quantity, price=None, client_order_id=None):
+        self.release.wait(5)
+        self.create_calls += 1
+        if client_order_id in self.orders:
+            return {'code': 30008, 'msg': 'duplicate clientOrderId'}
+        if self.failures:
+            self.failures -= 1
+            if not self.lost:
+                self._store(symbol, side, quantity, client_order_id)
+            raise TimeoutError('read timeout')
+        return dict(self._store(symbol, side, quantity, client_order_id))
+
+    def _store(self, symbol, side, quantity, client_order_id):
+        order = {'symbol': symbol, 'orderId': str(len(self.orders) + 1), 'side': side, 'origQty': str(quantity),
+                 'clientOrderId': client_order_id}
+        self.orders[client_order_id] = order
+        return order
+
+    def query_order(self, symbol, order_id=None, client_order_id=None):
+        if self.query_failures:
+            self.query_failures -= 1
+            raise TimeoutError('read timeout')
+        order = self.orders.get(client_order_id)
+        if order is None:
+            return {'code': -2013, 'msg': 'Order does not exist'}
+        return dict(order, status='FILLED', executedQty=order['origQty'],
+                    cummulativeQuoteQty=str(float(order['origQty']) * 100.0))
+
+
+def test_submit_does_not_wait_for_exchange():
+    exchange = FakeExchange()
+    exchange.release.clear()
+    executor = OrderExecutor(exchange, retry_delay=0)
+
+    order = executor.submit('BTCUSDT', 'BUY', 'MARKET', 0.5)
+    assert order.status == 'PENDING' and len(order.client_order_id) <= 32
+    assert executor.order_book.open_orders('BTCUSDT') == [order]
+
+    exchange.release.set()
+    assert executor.wait(5)
+    assert order.status == 'NEW' and order.order_id == '1'
+    executor.stop()
+
+
+def test_retry_is_idempotent():
+    """После таймаута ордер ищется по clientOrderId, второй ордер не создается"""
+    exchange = FakeExchange(failures=1)
+    executor = OrderExecutor(exchange, retry_delay=0)
+    order = executor.submit('BTCUSDT', 'BUY', 'MARKET', 0.5)
+    assert executor.wait(5)
+    assert exchange.create_calls == 1 and len(exchange.orders) == 1
+    assert order.status == 'FILLED' and order.avg_price == 100.0
+
+    lost = FakeExchange(failures=2, lost=True)
+    executor = OrderExecutor(lost, retry_delay=0)
+    order = executor.submit('BTCUSDT', 'SELL', 'MARKET', 0.5)
+    assert executor.wait(5)
+    assert lost.create_calls == 3 and len(lost.orders) == 1
+    assert order.status == 'NEW' and order.attempts == 3
+
+    executor = OrderExecutor(FakeExchange(failures=5, lost=True), retries=2, retry_delay=0)
+    order = executor.submit('BTCUSDT', 'BUY', 'MARKET', 0.5)
+    assert executor.wait(5)
+    assert order.status == 'REJECTED' and 'timeout' in order.error
+
+
+def test_duplicate_on_retry_is_not_rejected():
+    """Первая отправка принята биржей, но упала; повтор получает "дубликат" - ордер сверяется, а не отклоняется"""
+    exchange = FakeExchange(failures=1, query_failures=1)
+    executor = OrderExecutor(exchange, retry_delay=0)
+    order = executor.submit('BTCUSDT', 'BUY', 'MARKET', 0.5)
+    assert executor.wait(5)
+    assert exchange.create_calls == 2 and len(exchange.orders) == 1
+    assert order.status == 'FILLED' and order.order_id == '1' and order.error is None
+
+    # Состояние ордера недоступно и после дубликата - ордер остается открытым до сверки
+    exchange = FakeExchange(failures=1, query_failures=2)
+    executor = OrderExecutor(exchange, retry_delay=0)
+    order = executor.submit('BTCUSDT', 'SELL', 'MARKET', 0.5)
+    assert executor.wait(5)
+    assert order.status == 'NEW' and order.is_open
+    executor.reconcile()
+    assert order.status == 'FILLED' and order.order_id == '1'
+    executor.stop()
+
+
+def test_order_book_positions_from_stream():
+    book = OrderBook()
+    executor = OrderExecutor(FakeExchange(), order_book=book)
+    order = executor.submit('BTCUSDT', 'BUY', 'LIMIT', 2.0, price=100.0)
+    executor.wait(5)
+
+    def message(status, executed, quote, side=1, client_order_id=order.client_order_id, order_id='1'):
+        return json.dumps({'c': 'spot@private.orders.v3.api', 's': 'BTCUSDT', 't': 1,
+                           'd': {'i': order_id, 'c': client_order_id, 'S': side, 'p': 100.0, 'v': 2.0,
+                                 's': status, 'cv': executed, 'ca': quote, 'o': 1}})
+
+    stream = UserDataStream(client=None, on_order=executor.on_stream_update)
+    stream.handle_message(message(3, 1.0, 100.0))
+    stream.handle_message(message(3, 1.0, 100.0))  # Повтор не меняет позицию
+    assert order.status == 'PARTIALLY_FILLED'
+    assert book.position('BTCUSDT') == {'quantity': 1.0, 'avg_price': 100.0, 'realized_pnl': 0.0}
+
+    stream.handle_message(message(2, 2.0, 220.0))
+    assert order.status == 'FILLED' and not book.open_orders()
+    assert book.position('BTCUSDT')['avg_price'] == 110.0
+
+    # Ордер, созданный вне бота, тоже попадает в книгу
+    stream.handle_message(message(2, 2.0, 240.0, side=2, client_order_id='manual', order_id='9'))
+    assert book.get('manual').side == 'SELL'
+    assert book.position('BTCUSDT') == {'quantity': 0.0, 'avg_price': None, 'realized_pnl': 20.0}
+    executor.stop()
+
+
+def test_stop_does_not_block_on_full_queue():
+    """stop() возвращается за timeout при полной очереди, поставленные ордера дописываются"""
+    exchange = FakeExchange()
+    exchange.release.clear()
+    executor = OrderExecutor(exchange, queue_size=2, retry_delay=0)
+
+    orders = [executor.submit('BTCUSDT', 'BUY', 'MARKET', 0.1) for _ in range(4)]
+    assert orders[-1].status == 'REJECTED'  # Очередь переполнена
+
+    started = time.monotonic()
+    executor.stop(timeout=0.3)
+    assert time.monotonic() - started < 1.0
+
+    exchange.release.set()
+    executor._thread.join(5)
+    assert not executor._thread.is_alive()
+    assert executor.wait(0)
+    assert sum(order.status == 'NEW' for order in orders) >= 2
+
+
+def test_reconcile_runs_under_load():
+    """Без приватного потока сверка идет по таймеру, даже когда очередь не пустеет"""
+    class SlowExchange(FakeExchange):
+        def create_order(self, *args, **kwargs):
+            time.sleep(0.01)
+            return super().create_order(*args, **kwargs)
+
+    executor = OrderExecutor(SlowExchange(), reconcile_interval=0.05, retry_delay=0)
+    backlog = []
+    executor.reconcile = lambda: backlog.append(executor._queue.qsize())
+
+    for _ in range(40):
+        executor.submit('BTCUSDT', 'BUY', 'MARKET', 0.1)
+    assert executor.wait(5)
+    executor.stop()
+    assert any(queued > 0 for queued in backlog)
+
+
+if __name__ == "__main__":
+    test_submit_does_not_wait_for_exchange()
+    test_retry_is_idempotent()
+    test_duplicate_on_retry_is_not_rejected()
+    test_order_book_positions_from_stream()
+    test_stop_does_not_block_on_full_queue()
+    test_reconcile_runs_under_load()
@@ -0,0 +1,119 @@
+import os
+import sys
+import logging
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.analysis_engine import AIAnalysisEngine
+from ai.indicators import IncrementalIndicators
+
+logging.basicConfig(level=logging.INFO)
+
+COLUMNS = [
+    'rsi', 'ma_5', 'ma_10', 'ma_20', 'ma_50', 'macd', 'macd_signal', 'macd_histogram',
+    'bb_middle', 'bb_upper', 'bb_lower', 'bb_position', 'volume_sma', 'volume_ratio',
+    'price_change_1h', 'price_change_4h'
+]
+
+
+def make_candles(rows=300, seed=42):
+    """Детерминированные 30-минутные свечи"""
+    rng = np.random.default_rng(seed)
+    close = 67500 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    return pd.DataFrame({
+        'open_time': 1700000000000 + np.arange(rows, dtype=np.int64) * 1800000,
+        'close': close,
+        'volume': rng.uniform(1000, 5000, rows),
+    })
+
+
+def assert_row_matches(expected: pd.Series, actual: dict):
+    for column in COLUMNS:
+        np.testing.assert_allclose(actual[column], expected[column], rtol=1e-9, atol=1e-9,
+                                   equal_nan=True, err_msg=column)
+
+
+def test_incremental_matches_pandas():
+    """Каждая строка потокового расчета совпадает с pandas"""
+    df = make_candles()
+    expected = AIAnalysisEngine().calculate_technical_indicators(df.copy())
+
+    state = IncrementalIndicators()
+    for i, row in enumerate(df.itertuples()):
+        actual = state.update(row.open_time, row.close, row.volume)
+        assert_row_matches(expected.iloc[i], actual)
+    logging.info("✅ Инкрементальные индикаторы совпадают с pandas")
+
+
+def test_revised_last_candle():
+    """Пересчет формирующейся свечи не портит состояние"""
+    df = make_candles()
+    state = IncrementalIndicators()
+    for row in df.iloc[:-1].itertuples():
+        state.update(row.open_time, row.close, row.volume)
+
+    last = df.iloc[-1]
+    for close in (last['close'] * 0.97, last['close'] * 1.03, last['close']):
+        actual = state.update(last['open_time'], close, last['volume'])
+
+    expected = AIAnalysisEngine().calculate_technical_indicators(df.copy())
+    assert_row_matches(expected.iloc[-1], actual)
+
+
+def test_windowed_matches_pandas_on_window():
+    """С window каждая строка совпадает с pandas на последних window свечах"""
+    df = make_candles(rows=260)
+    window = 60
+    state = IncrementalIndicators(window=window)
+    engine = AIAnalysisEngine()
+    for i, row in enumerate(df.itertuples()):
+        actual = state.update(row.open_time, row.close, row.volume)
+        if i % 10 == 0 or i == len(df) - 1:
+            frame = df.iloc[max(0, i + 1 - window):i + 1].reset_index(drop=True)
+            expected = engine.calculate_technical_indicators(frame.copy()).iloc[-1]
+            for column in COLUMNS:
+                np.testing.assert_allclose(actual[column], expected[column], rtol=1e-8, atol=1e-8,
+                                           equal_nan=True, err_msg=f"{column} @ {i}")
+
+
+def test_engine_incremental_mode():
+    """Скользящее окно из 100 свечей, как в цикле бота: все индикаторы - как pandas на окне"""
+    df = make_candles(rows=160)
+    engine = AIAnalysisEngine(incremental=True)
+
+    for end in range(100, len(df) + 1):
+        window = df.iloc[end - 100:end].reset_index(drop=True)
+        latest = engine._latest_indicators('BTCUSDT', window)
+        # Пересчет формирующейся свечи не сдвигает окно
+        revised = window.copy()
+        revised.loc[len(revised) - 1, 'close'] *= 1.01
+        engine._latest_indicators('BTCUSDT', revised)
+
+    on_window = AIAnalysisEngine().calculate_technical_indicators(window.copy()).iloc[-1]
+    latest = engine._latest_indicators('BTCUSDT', window)
+    for column in COLUMNS:
+        np.testing.assert_allclose(latest[column], on_window[column], rtol=1e-8, atol=1e-8, err_msg=column)
+
+
+def test_engine_history_gap_resets_state():
+    """При разрыве истории состояние пересчитывается по новому окну"""
+    df = make_candles(rows=400)
+    engine = AIAnalysisEngine(incremental=True)
+    engine.get_ai_recommendation('BTCUSDT', df.iloc[:100].reset_index(drop=True))
+
+    window = df.iloc[300:].reset_index(drop=True)
+    recommendation = engine.get_ai_recommendation('BTCUSDT', window)
+
+    expected = AIAnalysisEngine().get_ai_recommendation('BTCUSDT', window.copy())
+    assert recommendation['action'] == expected['action']
+    np.testing.assert_allclose(recommendation['analysis']['rsi'], expected['analysis']['rsi'], rtol=1e-9)
+
+
+if __name__ == "__main__":
+    test_incremental_matches_pandas()
+    test_revised_last_candle()
+    test_windowed_matches_pandas_on_window()
+    test_engine_incremental_mode()
+    test_engine_history_gap_resets_state()
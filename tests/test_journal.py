@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.journal import RecommendationJournal, OFFSET
+
+logging.basicConfig(level=logging.INFO)
+
+
+def make_recommendation(i):
+    return {
+        'action': ('BUY', 'SELL', 'HOLD')[i % 3],
+        'confidence': 0.5 + i % 5 / 10,
+        'analysis': {'current_price': 67000.0 + i, 'rsi': 50.0},
+        'reasoning': f'Запись {i} | Общий счет: 0.10'
+    }
+
+
+def test_read_latest_newest_first():
+    """Последние записи читаются новыми сначала с реальным временем"""
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = RecommendationJournal(os.path.join(tmp, 'recommendations.jsonl'))
+        assert journal.read_latest(5) == []
+
+        for i in range(25):
+            journal.append('BTCUSDT', make_recommendation(i), timestamp=1700000000 + i * 30)
+
+        reader = RecommendationJournal(os.path.join(tmp, 'recommendations.jsonl'))
+        latest = reader.read_latest(3)
+        assert len(reader) == 25
+        assert [entry['price'] for entry in latest] == [67024.0, 67023.0, 67022.0]
+        assert latest[0]['ts'] == 1700000000 + 24 * 30
+        assert latest[0]['reasoning'] == 'Запись 24 | Общий счет: 0.10'
+        assert len(reader.read_latest(100)) == 25
+        journal.close()
+
+
+def test_recovers_unindexed_records():
+    """После сбоя между записью данных и индекса журнал доиндексируется"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'recommendations.jsonl')
+        journal = RecommendationJournal(path)
+        for i in range(5):
+            journal.append('ETHUSDT', make_recommendation(i))
+        journal.close()
+
+        # Теряем две последние записи индекса и оставляем недописанную строку
+        with open(path + '.idx', 'r+b') as index:
+            index.truncate(3 * OFFSET.size)
+        with open(path, 'ab') as data:
+            data.write(b'{"symbol": "ETH')
+
+        journal = RecommendationJournal(path)
+        journal.append('ETHUSDT', make_recommendation(5))
+        assert len(journal) == 6
+        assert [entry['price'] for entry in journal.read_latest(6)] == [
+            67005.0, 67004.0, 67003.0, 67002.0, 67001.0, 67000.0
+        ]
+        journal.close()
+
+
+def test_read_cost_does_not_depend_on_size():
+    """Чтение последних записей не читает журнал целиком"""
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = RecommendationJournal(os.path.join(tmp, 'recommendations.jsonl'))
+        for i in range(50000):
+            journal.append('BTCUSDT', make_recommendation(i), timestamp=1700000000 + i)
+
+        started = time.perf_counter()
+        for _ in range(100):
+            latest = journal.read_latest(10)
+        elapsed = (time.perf_counter() - started) / 100
+        assert latest[0]['price'] == 67000.0 + 49999
+        assert elapsed < 0.01
+        logging.info(f"✅ read_latest(10) на 50000 записях: {elapsed * 1000:.3f} мс")
+        journal.close()
+
+
+if __name__ == "__main__":
+    test_read_latest_newest_first()
+    test_recovers_unindexed_records()
+    test_read_cost_does_not_depend_on_size()
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.kline_parser import KLINE_DTYPE, parse_klines, parse_klines_json, klines_frame
+from api.mexc_client import MexcClient
+
+logging.basicConfig(level=logging.INFO)
+
+
+def make_klines(rows, seed=5):
+    """Свечи как в ответе MEXC: время числом, цены строками"""
+    rng = np.random.default_rng(seed)
+    close = 67500 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    return [
+        [1700000000000 + i * 1800000, f"{close[i] * 0.999:.2f}", f"{close[i] * 1.002:.2f}",
+         f"{close[i] * 0.998:.2f}", f"{close[i]:.2f}", f"{rng.uniform(1000, 5000):.4f}",
+         1700000000000 + i * 1800000 + 1799999, f"{close[i] * 1000:.2f}"]
+        for i in range(rows)
+    ]
+
+
+def old_format(klines):
+    """Прежний _format_klines_data: DataFrame из строк, to_numeric и dropna"""
+    df = pd.DataFrame(klines, columns=[
+        'open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_asset_volume'
+    ])
+    for col in ['open', 'high', 'low', 'close', 'volume']:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df.dropna().reset_index(drop=True)
+
+
+def test_json_body_matches_loads():
+    """Разбор тела ответа совпадает с json.loads + поэлементным преобразованием"""
+    klines = make_klines(500)
+    for body in (json.dumps(klines), json.dumps(klines, separators=(',', ':')).encode()):
+        parsed = parse_klines_json(body)
+        assert parsed.dtype == KLINE_DTYPE
+        assert (parsed == parse_klines(klines)).all()
+        assert parsed['open_time'][-1] == klines[-1][0]
+        assert parsed['close'][-1] == float(klines[-1][4])
+
+    assert len(parse_klines_json(b'[]')) == 0
+    one = parse_klines_json(b'[[1,"2","3","4","5","6",7,"8"]]')
+    assert one.tolist() == [(1, 2.0, 3.0, 4.0, 5.0, 6.0, 7, 8.0)]
+    try:
+        parse_klines_json(b'{"code":-1121,"msg":"Invalid symbol."}')
+        assert False, "ожидалась ошибка"
+    except ValueError:
+        pass
+
+
+def test_irregular_rows_fall_back():
+    """null, лишние поля и мусор разбираются медленным путем"""
+    body = b'[[1,"2",null,"4","5","6",7,"8"],[2,"2","3","4","5","6",8,"8","0"]]'
+    parsed = parse_klines_json(body)
+    assert len(parsed) == 2
+    assert np.isnan(parsed['high'][0])
+    assert parsed['open_time'][1] == 2
+
+    parsed = parse_klines([[1, "x", "3", "4", "5", "6", 7, "8"], [2, "2", "3", "4", "5", "6", 8, "8"]])
+    assert parsed['open_time'].tolist() == [2]
+
+
+def test_frame_matches_old_format():
+    """DataFrame для движка совпадает с прежним форматированием и без строк NaN"""
+    klines = make_klines(300)
+    klines[10][4] = None
+    frame = klines_frame(klines)
+    expected = old_format(klines)
+    assert len(frame) == 299
+    for col in ['open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time']:
+        assert np.array_equal(frame[col].to_numpy(), expected[col].to_numpy(dtype=frame[col].dtype))
+    assert frame['close'].dtype == np.float64
+    assert frame['quote_asset_volume'].dtype == np.float64
+
+
+def test_fallback_data_is_numeric():
+    client = MexcClient('test_key', 'test_secret')
+    klines = client._generate_fallback_array()
+    assert klines.dtype == KLINE_DTYPE
+    assert len(klines) == 100
+    assert (np.diff(klines['open_time']) == 1800000).all()
+    assert (klines['high'] > klines['low']).all()
+
+    rows = client._generate_fallback_data()
+    assert isinstance(rows[0], list)
+    assert isinstance(rows[0][4], float)
+    client.close()
+
+
+if __name__ == "__main__":
+    test_json_body_matches_loads()
+    test_irregular_rows_fall_back()
+    test_frame_matches_old_format()
+    test_fallback_data_is_numeric()
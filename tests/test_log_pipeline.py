@@ -0,0 +1,110 @@
+import io
+import os
+import sys
+import json
+import time
+import logging
+import threading
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.log_pipeline import AsyncLogHandler, JsonFormatter
+
+logging.basicConfig(level=logging.INFO)
+
+
+class BlockingStream(io.StringIO):
+    """Поток, запись в который ждет разрешения (медленный диск)"""
+
+    def __init__(self):
+        super().__init__()
+        self.allowed = threading.Event()
+        self.writes = 0
+
+    def write(self, text):
+        self.allowed.wait(10)
+        self.writes += 1
+        return super().write(text)
+
+
+def make_logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+def test_records_written_in_batches():
+    stream = io.StringIO()
+    target = logging.StreamHandler(stream)
+    target.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+    handler = AsyncLogHandler([target], batch_size=100, flush_interval=0.05)
+    logger = make_logger('test_log_pipeline.batches', handler)
+
+    items = [1]
+    logger.info("значение %s", items)
+    items.append(2)  # Сообщение фиксируется в момент вызова
+    for i in range(249):
+        logger.info("запись %d", i)
+    assert handler.flush(5)
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 250
+    assert lines[0] == "INFO значение [1]"
+    assert lines[-1] == "INFO запись 248"
+    stats = handler.stats()
+    assert stats['written'] == 250 and stats['dropped'] == 0
+    assert stats['batches'] <= 5
+    handler.close()
+
+
+def test_overflow_policies():
+    """При медленной записи вызывающий поток не ждет, потери учитываются и логируются"""
+    for overflow, kept in (('drop_oldest', 'запись 19'), ('drop_new', 'запись 0')):
+        stream = BlockingStream()
+        target = logging.StreamHandler(stream)
+        handler = AsyncLogHandler([target], queue_size=5, overflow=overflow, batch_size=1, flush_interval=0.01)
+        logger = make_logger(f'test_log_pipeline.{overflow}', handler)
+
+        logger.info("первая")  # Писатель забирает ее и ждет на write()
+        while handler._queue:
+            time.sleep(0.001)
+        for i in range(20):
+            logger.info(f"запись {i}")
+        assert handler.stats()['dropped'] == 15
+
+        stream.allowed.set()
+        assert handler.flush(5)
+        output = stream.getvalue()
+        assert kept in output
+        assert "Очередь лога переполнена" in output
+        handler.close()
+
+
+def test_json_formatter_extra_fields():
+    record = logging.LogRecord('bot', logging.INFO, __file__, 1, "🟢 ANALYSIS %s", ('BTCUSDT',), None)
+    record.symbol = 'BTCUSDT'
+    record.confidence = 0.75
+    data = json.loads(JsonFormatter('BOT').format(record))
+    assert data['message'] == "🟢 ANALYSIS BTCUSDT"
+    assert data['level'] == 'INFO' and data['source'] == 'BOT'
+    assert data['symbol'] == 'BTCUSDT' and data['confidence'] == 0.75
+    assert 'args' not in data and 'msg' not in data
+
+
+def test_import_keeps_root_handlers():
+    """Импорт main не трогает корневой логгер: его настраивает только точка входа"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    code = ("import sys, logging; sys.path.insert(0, sys.argv[1]); logging.basicConfig(); "
+            "before = list(logging.getLogger().handlers); import main; "
+            "assert logging.getLogger().handlers == before, logging.getLogger().handlers")
+    subprocess.run([sys.executable, '-c', code, root], check=True, timeout=60, cwd=root)
+
+
+if __name__ == "__main__":
+    test_records_written_in_batches()
+    test_overflow_policies()
+    test_json_formatter_extra_fields()
+    test_import_keeps_root_handlers()
@@ -0,0 +1,62 @@
+import os
+import sys
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.log_tail import LogTailer
+
+logging.basicConfig(level=logging.INFO)
+
+
+def write_lines(path, start, count, mode='a'):
+    with open(path, mode, encoding='utf-8') as f:
+        for i in range(start, start + count):
+            f.write(f"2025-01-01 00:00:00 - BOT - INFO - 🔄 строка {i}\n")
+
+
+def expected_tail(path, lines):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.readlines()[-lines:]
+
+
+def test_tail_matches_readlines():
+    """Хвост совпадает с readlines()[-n:] при любом размере блока"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trading_bot.log')
+        write_lines(path, 0, 1000, 'w')
+        for block_size in (7, 64, 8192):
+            assert LogTailer(lines=20, block_size=block_size).tail(path) == expected_tail(path, 20)
+
+        assert LogTailer(lines=20).tail(os.path.join(tmp, 'missing.log')) == []
+
+
+def test_tail_follows_appends_and_rotation():
+    """Дописанные строки добавляются к кэшу, ротация и усечение перечитывают хвост"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'trading_bot.log')
+        tailer = LogTailer(lines=5, block_size=64)
+        write_lines(path, 0, 50, 'w')
+        assert tailer.tail(path) == expected_tail(path, 5)
+
+        write_lines(path, 50, 3)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write("недописанная")
+        tail = tailer.tail(path)
+        assert tail == expected_tail(path, 6)[:-1]
+        assert tail[-1].endswith("строка 52\n")
+
+        # Ротация: файл переименован, создан новый
+        os.rename(path, path + '.1')
+        write_lines(path, 1000, 2, 'w')
+        assert tailer.tail(path) == expected_tail(path, 5)
+
+        # Усечение того же файла
+        write_lines(path, 2000, 1, 'w')
+        assert tailer.tail(path) == expected_tail(path, 5)
+
+
+if __name__ == "__main__":
+    test_tail_matches_readlines()
+    test_tail_follows_appends_and_rotation()
@@ -0,0 +1,212 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.market_stream import MarketDataStream
+
+logging.basicConfig(level=logging.INFO)
+
+OPEN_TIME = 1699999200  # секунды, начало 30-минутного окна (кратно 1800)
+
+
+def kline_message(symbol, open_time, close, volume):
+    return {
+        'c': f'spot@public.kline.v3.api@{symbol}@Min30',
+        'd': {'k': {'t': open_time, 'T': open_time + 1800, 'o': 100.0, 'h': max(close, 100.0),
+                    'l': min(close, 100.0), 'c': close, 'v': volume, 'a': close * volume, 'i': 'Min30'},
+              'e': 'spot@public.kline.v3.api'},
+        's': symbol,
+        't': open_time * 1000
+    }
+
+
+def deals_message(symbol, trade_time_ms, price, volume):
+    return {
+        'c': f'spot@public.deals.v3.api@{symbol}',
+        'd': {'deals': [{'S': 1, 'p': str(price), 't': trade_time_ms, 'v': str(volume)}],
+              'e': 'spot@public.deals.v3.api'},
+        's': symbol,
+        't': trade_time_ms
+    }
+
+
+async def start_fake_stream(messages):
+    """Локальный заменитель wbs.mexc.com: подтверждает подписку и шлет messages"""
+    subscriptions = []
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            payload = json.loads(msg.data)
+            if payload.get('method') == 'SUBSCRIPTION':
+                subscriptions.extend(payload['params'])
+                await ws.send_json({'id': 0, 'code': 0, 'msg': ','.join(payload['params'])})
+                for message in messages:
+                    await ws.send_json(message)
+            elif payload.get('method') == 'PING':
+                await ws.send_json({'id': 0, 'code': 0, 'msg': 'PONG'})
+        return ws
+
+    app = web.Application()
+    app.router.add_get('/ws', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"ws://127.0.0.1:{port}/ws", subscriptions
+
+
+def test_stream_updates_buffer_and_notifies():
+    """Обновления свечи и ее закрытие доходят до обработчика"""
+    messages = [
+        kline_message('BTCUSDT', OPEN_TIME, 101.0, 5.0),
+        deals_message('BTCUSDT', OPEN_TIME * 1000 + 60000, 103.0, 0.5),
+        kline_message('BTCUSDT', OPEN_TIME + 1800, 99.0, 1.0),
+    ]
+    events = []
+
+    async def scenario():
+        runner, url, subscriptions = await start_fake_stream(messages)
+        stream = MarketDataStream(['BTCUSDT'], interval='30m', url=url, min_update_interval=0.0)
+
+        def on_candle(symbol, closed):
+            # Обработчик работает вне event loop: долгий анализ не задерживает прием сообщений
+            time.sleep(0.2)
+            events.append((symbol, closed, threading.current_thread().name, stream.messages_received))
+            if len(events) == len(messages):
+                stream.stop()
+
+        stream.on_candle = on_candle
+        stream.seed('BTCUSDT', [[(OPEN_TIME - 1800) * 1000, "100", "101", "99", "100", "10",
+                                 OPEN_TIME * 1000, "1000"]])
+        try:
+            await asyncio.wait_for(stream.run(), timeout=10)
+        finally:
+            await runner.cleanup()
+        return stream, subscriptions
+
+    stream, subscriptions = asyncio.run(scenario())
+
+    assert 'spot@public.kline.v3.api@BTCUSDT@Min30' in subscriptions
+    assert 'spot@public.deals.v3.api@BTCUSDT' in subscriptions
+    # Первое сообщение открывает новую свечу (закрывает засеянную),
+    # сделка обновляет ее, третье сообщение снова закрывает свечу
+    assert [event[:2] for event in events] == [('BTCUSDT', True), ('BTCUSDT', False), ('BTCUSDT', True)]
+    assert all(event[2] == 'market-stream-handler' for event in events)
+    # Пока обрабатывалось первое событие, loop уже принял все сообщения
+    assert events[0][3] == len(messages)
+
+    klines = stream.get_klines('BTCUSDT')
+    assert [k[0] for k in klines] == [(OPEN_TIME - 1800) * 1000, OPEN_TIME * 1000, (OPEN_TIME + 1800) * 1000]
+    assert klines[1][2] == 103.0  # high обновлен сделкой
+    assert klines[1][5] == 5.5
+    logging.info("✅ Буфер свечей обновляется из потока")
+
+
+def test_intermediate_updates_are_throttled():
+    """Промежуточные обновления прореживаются, закрытия - нет"""
+    stream = MarketDataStream(['BTCUSDT'], interval='30m', min_update_interval=60.0)
+    events = []
+    stream.on_candle = lambda symbol, closed: events.append(closed)
+
+    for close in (100.0, 101.0, 102.0):
+        stream.handle_message(json.dumps(kline_message('BTCUSDT', OPEN_TIME, close, 1.0)))
+    stream.handle_message(json.dumps(kline_message('BTCUSDT', OPEN_TIME + 1800, 103.0, 1.0)))
+    stream.wait_dispatched()
+
+    assert events == [False, True]
+    assert stream.get_klines('BTCUSDT')[0][4] == 102.0
+
+
+def test_deals_do_not_double_count_kline_volume():
+    """Сделки до kline-сообщения уже в его объеме, следующее сообщение заменяет досчитанный объем"""
+    stream = MarketDataStream(['BTCUSDT'], interval='30m', min_update_interval=0.0)
+    start = OPEN_TIME * 1000
+
+    message = kline_message('BTCUSDT', OPEN_TIME, 101.0, 5.0)
+    message['t'] = start + 120000
+    stream.handle_message(json.dumps(message))
+    stream.handle_message(json.dumps(deals_message('BTCUSDT', start + 60000, 100.5, 0.3)))
+    assert stream.get_klines('BTCUSDT')[-1][5] == 5.0
+
+    stream.handle_message(json.dumps(deals_message('BTCUSDT', start + 180000, 102.0, 0.5)))
+    candle = stream.get_klines('BTCUSDT')[-1]
+    assert candle[5] == 5.5 and candle[4] == 102.0
+
+    message = kline_message('BTCUSDT', OPEN_TIME, 102.0, 5.7)
+    message['t'] = start + 240000
+    stream.handle_message(json.dumps(message))
+    assert stream.get_klines('BTCUSDT')[-1][5] == 5.7
+
+
+def test_reconnect_backfills_from_rest():
+    """После переподключения буфер докачивается с open_time последней свечи"""
+    backfills = []
+    connections = []
+
+    def backfill(symbol, start_time):
+        backfills.append((symbol, start_time))
+        # За время разрыва закрылась свеча OPEN_TIME и открылась следующая
+        return [[start_time, 100.0, 104.0, 99.0, 103.0, 8.0, start_time + 1799999, 800.0],
+                [start_time + 1800000, 103.0, 103.0, 103.0, 103.0, 1.0, start_time + 3599999, 103.0]]
+
+    async def scenario():
+        async def handler(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            connections.append(request)
+            async for msg in ws:
+                if json.loads(msg.data).get('method') == 'SUBSCRIPTION' and len(connections) == 1:
+                    await ws.send_json(kline_message('BTCUSDT', OPEN_TIME, 101.0, 5.0))
+                    await ws.close()  # Разрыв соединения после первого сообщения
+            return ws
+
+        app = web.Application()
+        app.router.add_get('/ws', handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        stream = MarketDataStream(['BTCUSDT'], interval='30m', url=f"ws://127.0.0.1:{port}/ws",
+                                  min_update_interval=0.0, backfill=backfill)
+        stream.seed('BTCUSDT', [[(OPEN_TIME - 1800) * 1000, 100.0, 101.0, 99.0, 100.0, 10.0,
+                                 OPEN_TIME * 1000 - 1, 1000.0]])
+
+        async def stop_after_reconnect():
+            while len(backfills) < 2:
+                await asyncio.sleep(0.05)
+            stream.stop()
+
+        try:
+            await asyncio.wait_for(asyncio.gather(stream.run(), stop_after_reconnect()), timeout=10)
+        finally:
+            await runner.cleanup()
+        return stream
+
+    stream = asyncio.run(scenario())
+
+    assert len(connections) == 2
+    # Первое подключение - с последней засеянной свечи, второе - с последней свечи из потока
+    assert backfills == [('BTCUSDT', (OPEN_TIME - 1800) * 1000), ('BTCUSDT', OPEN_TIME * 1000)]
+    klines = stream.get_klines('BTCUSDT')
+    assert [k[0] for k in klines] == [(OPEN_TIME - 1800) * 1000, OPEN_TIME * 1000, (OPEN_TIME + 1800) * 1000]
+    assert klines[1][5] == 8.0  # Свеча, закрывшаяся во время разрыва, - из REST
+
+
+if __name__ == "__main__":
+    test_stream_updates_buffer_and_notifies()
+    test_intermediate_updates_are_throttled()
+    test_deals_do_not_double_count_kline_volume()
+    test_reconnect_backfills_from_rest()
@@ -0,0 +1,178 @@
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.metrics import (LatencyHistogram, LatencyRecorder, RingBuffer, CallCounter, ProcessSampler,
+                           MetricsRegistry, render_prometheus)
+from api.mexc_client import MexcClient
+from tests.helpers import import_dashboard
+
+logging.basicConfig(level=logging.INFO)
+
+
+def test_latency_histogram_percentiles():
+    """Квантили попадают в корзину с истинным значением"""
+    histogram = LatencyHistogram()
+    for i in range(1, 1001):
+        histogram.observe(i / 1000)  # 1мс ... 1с равномерно
+
+    assert 0.3 <= histogram.percentile(0.50) <= 0.75
+    assert 0.75 <= histogram.percentile(0.95) <= 1.0
+    assert 0.75 <= histogram.percentile(0.99) <= 1.0
+
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 1000
+    assert snapshot['max_ms'] == 1000.0
+    logging.info(f"📊 {snapshot}")
+
+
+def test_latency_recorder_per_endpoint():
+    recorder = LatencyRecorder()
+    recorder.observe('/api/v3/klines', 0.120)
+    recorder.observe('/api/v3/klines', 0.080)
+    recorder.observe('/api/v3/ticker/price', 0.030)
+
+    stats = recorder.snapshot()
+    assert stats['/api/v3/klines']['count'] == 2
+    assert stats['/api/v3/ticker/price']['count'] == 1
+    assert stats['/api/v3/ticker/price']['p99_ms'] <= 30.0
+
+
+def test_ring_buffer_keeps_last_values():
+    buffer = RingBuffer(3)
+    assert buffer.summary()['count'] == 0
+    for value in (1.0, 2.0, 3.0, 4.0, 5.0):
+        buffer.append(value)
+    assert buffer.values() == [3.0, 4.0, 5.0]
+    assert buffer.summary() == {'count': 3, 'last': 5.0, 'avg': 4.0, 'max': 5.0}
+
+
+def test_call_counter_error_rate():
+    counter = CallCounter()
+    for i in range(8):
+        counter.record('/api/v3/klines', error=(i == 0))
+    counter.record('/api/v3/ticker/price', error=True)
+    counter.record('/api/v3/ticker/price')
+
+    stats = counter.snapshot()
+    assert stats['calls'] == 10
+    assert stats['errors'] == 2
+    assert stats['error_rate'] == 0.2
+    assert stats['endpoints']['/api/v3/ticker/price'] == {'calls': 2, 'errors': 1}
+
+
+def test_mexc_client_counts_failed_calls():
+    """Недоступный API засчитывается как вызов с ошибкой"""
+    client = MexcClient('test_key', 'test_secret')
+    client.base_url = 'http://127.0.0.1:9'
+    client.session = client._create_session()
+    client.session.adapters['http://'].max_retries.total = 0
+    client.get_current_price('BTCUSDT')
+
+    stats = client.get_call_stats()
+    assert stats['calls'] == 1
+    assert stats['errors'] == 1
+    assert client.get_latency_stats()['/api/v3/ticker/price']['count'] == 1
+    client.close()
+
+
+def test_process_sampler_reads_proc():
+    """Замер текущего процесса из /proc: CPU растет под нагрузкой"""
+    if not ProcessSampler.available():
+        logging.info("⏭️ Нет /proc, пропускаем")
+        return
+
+    sampler = ProcessSampler(os.getpid())
+    first = sampler.sample()
+    assert first['cpu_percent'] == 0.0
+    assert first['rss_mb'] > 0
+    assert first['threads'] >= 1
+    assert first['open_fds'] >= 3
+
+    deadline = time.monotonic() + 0.3
+    while time.monotonic() < deadline:
+        sum(range(1000))
+    second = sampler.sample()
+    assert second['cpu_percent'] > 10
+    assert len(sampler.history['rss_mb']) == 2
+    logging.info(f"📊 {second}")
+
+
+def test_registry_renders_prometheus_text():
+    """Счетчики и гистограммы с метками в текстовом формате Prometheus"""
+    registry = MetricsRegistry()
+    requests_total = registry.counter('http_requests_total', 'Requests', ('endpoint', 'status'))
+    latency = registry.histogram('phase_seconds', 'Phase duration', ('phase',), buckets=(0.1, 1.0))
+    throttled = registry.counter('throttled_total', 'Throttled')
+
+    requests_total.labels('/api/v3/klines', 200).inc()
+    requests_total.labels('/api/v3/klines', 200).inc()
+    requests_total.labels('/api/v3/klines', 'error').inc()
+    latency.labels('fetch').observe(0.05)
+    latency.labels('fetch').observe(0.5)
+    latency.labels('fetch').observe(5.0)
+    with latency.labels('scoring').time():
+        pass
+    throttled.inc(0.5)
+
+    # Повторное объявление возвращает ту же метрику
+    assert registry.counter('throttled_total', 'Throttled') is throttled
+    try:
+        registry.histogram('throttled_total', 'Throttled')
+        assert False, "ожидалась ошибка регистрации"
+    except ValueError:
+        pass
+
+    text = render_prometheus(registry.snapshot())
+    lines = text.splitlines()
+    assert '# TYPE http_requests_total counter' in lines
+    assert 'http_requests_total{endpoint="/api/v3/klines",status="200"} 2' in lines
+    assert 'http_requests_total{endpoint="/api/v3/klines",status="error"} 1' in lines
+    assert 'phase_seconds_bucket{phase="fetch",le="0.1"} 1' in lines
+    assert 'phase_seconds_bucket{phase="fetch",le="1"} 2' in lines
+    assert 'phase_seconds_bucket{phase="fetch",le="+Inf"} 3' in lines
+    assert 'phase_seconds_sum{phase="fetch"} 5.55' in lines
+    assert 'phase_seconds_count{phase="scoring"} 1' in lines
+    assert 'throttled_total 0.5' in lines
+    assert text == registry.render()
+
+
+def test_dashboard_metrics_endpoint():
+    """/metrics отдает снимок, опубликованный ботом в хранилище состояния"""
+    from utils.shared_state import SharedStateStore
+    app, dashboard = import_dashboard()
+
+    registry = MetricsRegistry()
+    registry.counter('trading_bot_recommendations_total', 'Recommendations', ('symbol', 'action')) \
+        .labels('BTCUSDT', 'BUY').inc()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        original = dashboard.state_store
+        dashboard.state_store = SharedStateStore(os.path.join(tmp, 'state.sqlite3'))
+        try:
+            dashboard.state_store.publish_metrics('prometheus', registry.snapshot())
+            response = app.test_client().get('/metrics')
+            assert response.status_code == 200
+            assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+            text = response.get_data(as_text=True)
+            assert 'trading_bot_recommendations_total{symbol="BTCUSDT",action="BUY"} 1' in text
+            assert 'trading_bot_metrics_age_seconds' in text
+            assert '# TYPE trading_bot_up gauge' in text
+        finally:
+            dashboard.state_store.close()
+            dashboard.state_store = original
+
+
+if __name__ == "__main__":
+    test_latency_histogram_percentiles()
+    test_latency_recorder_per_endpoint()
+    test_ring_buffer_keeps_last_values()
+    test_call_counter_error_rate()
+    test_mexc_client_counts_failed_calls()
+    test_process_sampler_reads_proc()
+    test_registry_renders_prometheus_text()
+    test_dashboard_metrics_endpoint()
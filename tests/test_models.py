@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import random
+import logging
+from collections import deque
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.kline_parser import parse_klines
+from api.mexc_client import MexcClient
+from utils.models import Recommendation, CandleBuffer
+
+logging.basicConfig(level=logging.INFO)
+
+INTERVAL_MS = 1800000
+
+
+def make_klines(first_open_time, count, close=100.0):
+    return [
+        [first_open_time + i * INTERVAL_MS, str(close), str(close + 1), str(close - 1), str(close + i),
+         "10.0", first_open_time + (i + 1) * INTERVAL_MS, "1000.0"]
+        for i in range(count)
+    ]
+
+
+class RecordingClient(MexcClient):
+    """MexcClient без кэша, отвечающий из списка свечей и запоминающий запросы"""
+
+    def __init__(self, exchange_klines):
+        super().__init__('test_key', 'test_secret')
+        self.exchange_klines = exchange_klines
+        self.requests = []
+
+    def _fetch_klines(self, symbol, interval='30m', limit=100, start_time=None, end_time=None, raw=False):
+        self.requests.append({'limit': limit, 'start_time': start_time})
+        data = self.exchange_klines
+        if start_time is not None:
+            data = [k for k in data if k[0] >= start_time][:limit]
+        else:
+            data = data[-limit:]
+        return parse_klines(data) if raw else data
+
+
+def test_candle_buffer_matches_deque():
+    """Кольцевой буфер ведет себя как deque(maxlen) с заменой последней свечи"""
+    rng = random.Random(3)
+    for capacity in (1, 3, 50):
+        buffer = CandleBuffer(capacity)
+        expected = deque(maxlen=capacity)
+        open_time = 0
+        for step in range(300):
+            start = open_time - rng.randint(0, 2)
+            batch = [[start + i, 1.0, 2.0, 0.5, float(step + i), 1.0, start + i + 1, 3.0]
+                     for i in range(rng.randint(0, 5))]
+            for candle in batch:
+                if expected and candle[0] < expected[-1][0]:
+                    continue
+                if expected and candle[0] == expected[-1][0]:
+                    expected[-1] = candle
+                else:
+                    expected.append(candle)
+            buffer.extend(batch)
+            open_time = max(open_time, start + len(batch))
+            assert buffer.tolist() == [list(candle) for candle in expected]
+        assert len(buffer) == capacity
+        assert buffer.last_open_time == expected[-1][0]
+
+
+def test_candle_buffer_updates_and_trades():
+    buffer = CandleBuffer(3)
+    assert buffer.append([0, 100, 101, 99, 100, 1, INTERVAL_MS, 100]) is False
+    assert buffer.append([0, 100, 102, 99, 101, 2, INTERVAL_MS, 200]) is False
+    assert buffer.append([INTERVAL_MS, 101, 101, 101, 101, 1, 2 * INTERVAL_MS, 101]) is True
+    assert buffer.append([0, 1, 1, 1, 1, 1, 1, 1]) is None
+
+    assert buffer.add_trade(INTERVAL_MS + 5, 105.0, 2.0, INTERVAL_MS) is False
+    last = buffer.last()
+    assert (last['high'], last['close'], last['volume']) == (105.0, 105.0, 3.0)
+    assert buffer.add_trade(2 * INTERVAL_MS, 90.0, 1.0, INTERVAL_MS) is True
+    assert buffer.to_array(2)['open_time'].tolist() == [INTERVAL_MS, 2 * INTERVAL_MS]
+
+    frame = buffer.frame()
+    assert list(frame['close']) == [101.0, 105.0, 90.0]
+
+
+def test_recommendation_slots_and_compat():
+    """Слоты вместо __dict__, чтение как словаря и плоская запись"""
+    recommendation = Recommendation.from_dict({
+        'action': 'BUY',
+        'confidence': np.float64(0.8),
+        'analysis': {'current_price': np.float64(67000.5), 'rsi': 28.0, 'ma_20': float('nan')},
+        'reasoning': 'RSI перепродан'
+    }, symbol='BTCUSDT')
+
+    assert not hasattr(recommendation, '__dict__')
+    assert recommendation['action'] == 'BUY'
+    assert recommendation['analysis'] == {'current_price': 67000.5, 'rsi': 28.0}
+    assert recommendation.get('indicators') is None
+    assert type(recommendation.confidence) is float
+
+    record = recommendation.to_record(1700000000.0)
+    assert record['symbol'] == 'BTCUSDT'
+    assert record['price'] == 67000.5
+    assert Recommendation.from_record(record).to_record() == record
+
+
+def test_client_fills_buffer_incrementally():
+    """С буфером клиент докачивает только свечи с последней в буфере"""
+    now = int(time.time() * 1000)
+    # Последняя свеча буфера - предыдущий интервал, на бирже уже открыт текущий
+    first = now - now % INTERVAL_MS - 100 * INTERVAL_MS
+    client = RecordingClient(make_klines(first, 100))
+    buffer = CandleBuffer(100)
+
+    klines = client.get_klines_array('BTCUSDT', '30m', 100, buffer=buffer)
+    assert len(klines) == 100
+    assert client.requests[-1] == {'limit': 100, 'start_time': None}
+
+    updated = make_klines(first, 101)
+    updated[99][4] = "555.0"
+    client.exchange_klines = updated
+    klines = client.get_klines_array('BTCUSDT', '30m', 100, buffer=buffer)
+    assert client.requests[-1]['start_time'] == first + 99 * INTERVAL_MS
+    assert client.requests[-1]['limit'] == 2
+    assert klines['open_time'][-1] == first + 100 * INTERVAL_MS
+    assert klines['close'][-2] == 555.0
+    assert len(buffer) == 100
+
+    # Ошибка API - буфер отдается без обновления, а не тестовые данные
+    client._fetch_klines = lambda *args, **kwargs: None
+    assert (client.get_klines_array('BTCUSDT', '30m', 100, buffer=buffer) == klines).all()
+    client.close()
+
+
+if __name__ == "__main__":
+    test_candle_buffer_matches_deque()
+    test_candle_buffer_updates_and_trades()
+    test_recommendation_slots_and_compat()
+    test_client_fills_buffer_incrementally()
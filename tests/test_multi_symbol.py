@@ -0,0 +1,88 @@
+import os
+import sys
+import logging
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.kline_parser import empty_klines
+from api.simulated_client import synthetic_klines
+from config.settings import TRADING_SETTINGS
+from tests.helpers import isolated_data, data_snapshot
+
+logging.basicConfig(level=logging.INFO)
+
+
+class StubClient:
+    """Клиент без сети: свои свечи на символ, ADAUSDT падает, у XRPUSDT биржа не отвечает"""
+
+    def __init__(self, prices):
+        self.klines = {
+            symbol: synthetic_klines(200, '30m', start_price=price, seed=index)
+            for index, (symbol, price) in enumerate(prices.items())
+        }
+
+    def get_current_price(self, symbol='BTCUSDT'):
+        if symbol == 'XRPUSDT':
+            raise ConnectionError('ticker недоступен')
+        return float(self.klines[symbol]['close'][-1])
+
+    def get_klines_array(self, symbol, interval='30m', limit=100, buffer=None, fallback=True):
+        if symbol == 'ADAUSDT':
+            raise RuntimeError('ошибка разбора ответа')
+        if symbol == 'XRPUSDT':
+            return empty_klines()
+        return self.klines[symbol][-limit:]
+
+    def get_call_stats(self):
+        return {}
+
+    def get_latency_stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+def test_cycle_over_symbols_with_failures():
+    """Цикл по всем символам: у каждого своя цена, сбой одного не мешает остальным,
+    тестовые данные не попадают в журнал и дашборд"""
+    prices = {'BTCUSDT': 60000.0, 'ETHUSDT': 3000.0, 'ADAUSDT': 0.5, 'XRPUSDT': 0.6}
+    original = dict(TRADING_SETTINGS)
+    TRADING_SETTINGS.update(symbols=list(prices), multi_symbol=True, timeframes=[])
+    before = data_snapshot()
+    try:
+        with tempfile.TemporaryDirectory() as tmp, isolated_data(tmp):
+            from main import TradingBot
+            bot = TradingBot()
+            bot.trade_enabled = False
+            stub = StubClient(prices)
+            client, bot.mexc_client = bot.mexc_client, stub
+            try:
+                assert bot.multi_symbol and bot.executor is not None
+                for _ in range(2):
+                    bot.run_analysis_cycle()
+
+                # Рекомендации только по реальным свечам, цена - своя у каждого символа
+                published = {entry['symbol']: entry for entry in bot.state_store.get_latest()}
+                assert set(published) == {'BTCUSDT', 'ETHUSDT'}
+                for symbol, entry in published.items():
+                    assert entry['price'] == stub.get_current_price(symbol)
+                journal = bot.journal.read_latest(10)
+                assert len(journal) == 4
+                assert {entry['symbol'] for entry in journal} == {'BTCUSDT', 'ETHUSDT'}
+
+                # Цена без ответа биржи - последняя известная цена символа, а не BTC
+                bot.last_prices['XRPUSDT'] = 0.61
+                assert bot.get_live_price('XRPUSDT') == 0.61
+            finally:
+                bot.close()
+                client.close()
+    finally:
+        TRADING_SETTINGS.clear()
+        TRADING_SETTINGS.update(original)
+    assert data_snapshot() == before
+
+
+if __name__ == "__main__":
+    test_cycle_over_symbols_with_failures()
@@ -0,0 +1,83 @@
+import os
+import sys
+import logging
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.analysis_engine import AIAnalysisEngine
+from ai.backtest import Backtester
+from ai.optimizer import ParameterSweep, PARAM_SPACE, grid_search, random_search, refine_search
+
+logging.basicConfig(level=logging.INFO)
+
+
+def make_candles(rows, seed=11):
+    """Детерминированные свечи со случайным блужданием"""
+    rng = np.random.default_rng(seed)
+    close = 67500 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    return pd.DataFrame({
+        'open_time': np.arange(rows, dtype=np.int64) * 1800000,
+        'open': open_,
+        'high': np.maximum(open_, close) * 1.002,
+        'low': np.minimum(open_, close) * 0.998,
+        'close': close,
+        'volume': rng.uniform(1000, 5000, rows),
+    })
+
+
+def test_search_spaces():
+    """Сетка перебирает все сочетания, случайный и локальный поиск берут значения из сетки"""
+    space = {'weights.rsi': [0.1, 0.2], 'thresholds.score': [0.2, 0.3, 0.4]}
+    grid = list(grid_search(space))
+    assert len(grid) == 6
+    assert grid[0] == {'weights': {'rsi': 0.1}, 'thresholds': {'score': 0.2}}
+
+    sampled = list(random_search(PARAM_SPACE, 50, seed=1))
+    assert sampled == list(random_search(PARAM_SPACE, 50, seed=1))
+    for params in sampled + list(refine_search(sampled[:3], PARAM_SPACE, 50, seed=2)):
+        for group, values in params.items():
+            for name, value in values.items():
+                assert value in PARAM_SPACE[f"{group}.{name}"]
+
+
+def test_sweep_matches_backtester():
+    """Результаты воркеров совпадают с прямым бэктестом и отсортированы по Sharpe"""
+    candles = make_candles(3000)
+    default_params = {'weights': dict(AIAnalysisEngine.FACTOR_WEIGHTS),
+                      'thresholds': dict(AIAnalysisEngine.DEFAULT_THRESHOLDS)}
+    param_sets = [default_params] + list(random_search(PARAM_SPACE, 40, seed=3))
+
+    sweep = ParameterSweep(candles, workers=2, chunk_size=8)
+    results = sweep.run(param_sets, top=len(param_sets))
+
+    assert len(results) == len(param_sets)
+    sharpes = [result['sharpe_ratio'] for result in results]
+    assert sharpes == sorted(sharpes, reverse=True)
+
+    expected = Backtester().run(candles)
+    default_result = next(result for result in results if result['params'] == default_params)
+    assert np.isclose(default_result['sharpe_ratio'], expected['sharpe_ratio'])
+    assert default_result['total_trades'] == expected['total_trades']
+    logging.info(f"✅ Лучший Sharpe {sharpes[0]:.3f}, по умолчанию {expected['sharpe_ratio']:.3f}")
+
+
+def test_sweep_sorts_drawdown_ascending():
+    """max_drawdown - чем меньше, тем лучше: лучшие наборы идут первыми по возрастанию"""
+    candles = make_candles(1500)
+    param_sets = list(random_search(PARAM_SPACE, 20, seed=5))
+
+    results = ParameterSweep(candles, workers=2, chunk_size=8, metric='max_drawdown').run(param_sets, top=5)
+    drawdowns = [result['max_drawdown'] for result in results]
+    assert drawdowns == sorted(drawdowns)
+
+    everything = ParameterSweep(candles, workers=2, metric='max_drawdown').run(param_sets, top=len(param_sets))
+    assert drawdowns[0] == min(result['max_drawdown'] for result in everything)
+
+
+if __name__ == "__main__":
+    test_search_spaces()
+    test_sweep_matches_backtester()
+    test_sweep_sorts_drawdown_ascending()
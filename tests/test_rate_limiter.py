@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import tempfile
+import threading
+import subprocess
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.rate_limiter import RateLimiter
+
+logging.basicConfig(level=logging.INFO)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUCKETS = {'market': {'rate': 100.0, 'capacity': 5.0}, 'account': {'rate': 100.0, 'capacity': 20.0}}
+
+
+def test_weighted_buckets_threads_and_asyncio():
+    """Запас выдается сразу, дальше - со скоростью rate; веса и классы endpoint учитываются"""
+    limiter = RateLimiter(BUCKETS)
+    assert limiter.classify('GET', '/api/v3/account') == ('account', 10)
+    assert limiter.classify('GET', '/api/v3/unknown') == ('market', 1)
+
+    # Два запроса account по 10 укладываются в запас 20, третий ждет еще 10 токенов
+    assert limiter.reserve('account', 10) == 0
+    assert limiter.reserve('account', 10) == 0
+    assert 0.09 <= limiter.reserve('account', 10) <= 0.11
+
+    # 15 потоков: 5 из запаса, еще 10 - по 10 мс
+    started = time.monotonic()
+    threads = [threading.Thread(target=limiter.acquire, args=('GET', '/api/v3/klines')) for _ in range(15)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - started >= 0.09
+
+    # Корутины: bucket пуст после потоков, 10 запросов - около 100 мс без блокировки цикла событий
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        await asyncio.gather(*(limiter.acquire_async('GET', '/api/v3/klines') for _ in range(10)))
+        elapsed = time.monotonic() - started
+        task.cancel()
+        return elapsed, ticks
+
+    elapsed, ticks = asyncio.run(scenario())
+    assert elapsed >= 0.09
+    assert ticks >= 5
+
+    stats = limiter.snapshot()
+    assert stats['acquired'] == 28
+    assert stats['throttled'] >= 20
+
+
+def test_backoff_on_429():
+    """429 ставит bucket на паузу Retry-After и снижает скорость, затем она восстанавливается"""
+    limiter = RateLimiter(BUCKETS, recovery=10.0)
+
+    assert limiter.update('GET', '/api/v3/klines', 200) is None
+    assert limiter.update('GET', '/api/v3/klines', 429, retry_after='0.2') == 0.2
+    snapshot = limiter.snapshot()['buckets']
+    assert snapshot['market']['strikes'] == 1
+    assert snapshot['market']['rate'] == 50.0
+    assert snapshot['market']['paused_for'] > 0.15
+    # Другой класс endpoint не затронут
+    assert snapshot['account']['paused_for'] == 0
+    assert limiter.reserve('account', 1) == 0
+
+    # Пауза плюс токен по сниженной скорости (50/с)
+    wait = limiter.reserve('market', 1)
+    assert 0.2 <= wait <= 0.23
+
+    # Без Retry-After - экспоненциальная пауза по числу 429 подряд
+    assert limiter.update('GET', '/api/v3/klines', 429) == 2.0
+    assert limiter.snapshot()['buckets']['market']['rate'] == 25.0
+    limiter.update('GET', '/api/v3/klines', 200)
+    assert limiter.snapshot()['buckets']['market']['strikes'] == 0
+
+
+def test_budget_shared_between_processes():
+    """Два лимитера с одним state_path (здесь и в дочернем процессе) делят один bucket"""
+    # Медленное пополнение: результат не зависит от загрузки машины
+    buckets = {'market': {'rate': 1.0, 'capacity': 5.0}, 'account': {'rate': 1.0, 'capacity': 20.0}}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'rate_limit.bin')
+        first = RateLimiter(buckets, state_path=path)
+        second = RateLimiter(buckets, state_path=path)
+        assert first.snapshot()['shared']
+
+        assert first.reserve('market', 3) == 0
+        assert second.reserve('market', 2) == 0
+        assert second.reserve('market', 1) > 0.5
+
+        # Дочерний процесс получает 429: пауза видна этому процессу
+        code = ("import sys; sys.path.insert(0, sys.argv[1]); from api.rate_limiter import RateLimiter; "
+                f"RateLimiter({buckets!r}, state_path=sys.argv[2]).update('GET', '/api/v3/klines', 429, '30')")
+        subprocess.run([sys.executable, '-c', code, PROJECT_ROOT, path], check=True, timeout=30)
+        assert first.reserve('market', 1) >= 20
+
+        first.close()
+        second.close()
+
+
+if __name__ == "__main__":
+    test_weighted_buckets_threads_and_asyncio()
+    test_backoff_on_429()
+    test_budget_shared_between_processes()
@@ -0,0 +1,95 @@
+import os
+import sys
+import logging
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai.analysis_engine import AIAnalysisEngine
+from api.kline_parser import aggregate_klines, klines_frame
+from api.resampler import CandleResampler
+from api.simulated_client import synthetic_klines
+
+logging.basicConfig(level=logging.INFO)
+
+MINUTE = 60000
+TIMEFRAMES = ('5m', '15m', '30m', '60m', '4h')
+INTERVAL_MINUTES = {'5m': 5, '15m': 15, '30m': 30, '60m': 60, '4h': 240}
+
+
+def test_incremental_matches_batch():
+    """Свечи по одной (с обновлениями незакрытой) дают то же, что агрегация всей истории"""
+    # История начинается не на границе 4h: первая неполная свеча старших таймфреймов пропускается
+    klines = synthetic_klines(3000, '1m', start_price=100.0, start_time=7 * MINUTE, seed=3)
+    resampler = CandleResampler(TIMEFRAMES, '1m', capacity=100, base_capacity=50)
+    assert resampler.base.capacity == 480
+
+    resampler.update(klines[:200])
+    for i in range(200, len(klines)):
+        # Сначала незакрытая версия свечи, затем окончательная; передается весь хвост, как из буфера клиента
+        partial = klines[i:i + 1].copy()
+        partial['close'] = partial['open']
+        partial['volume'] /= 2
+        resampler.update(np.concatenate((klines[i - 5:i], partial)))
+        changed = resampler.update(klines[i - 5:i + 1])
+        assert changed['5m'] is False or changed['5m'] is True
+
+    for interval in TIMEFRAMES:
+        minutes = INTERVAL_MINUTES[interval]
+        first_full = -(-7 // minutes) * minutes
+        expected = aggregate_klines(klines[first_full - 7:], minutes * MINUTE)[-100:]
+        result = resampler.buffers[interval].to_array()
+        assert len(result) == len(expected), interval
+        assert result['open_time'][0] % (minutes * MINUTE) == 0
+        for field in ('open_time', 'open', 'high', 'low', 'close', 'close_time'):
+            assert (result[field] == expected[field]).all(), (interval, field)
+        assert np.allclose(result['volume'], expected['volume'])
+
+
+def test_seeded_history_continues_from_base_feed():
+    """Старшая история из seed (один запрос), дальше только 1m - как при полной агрегации"""
+    klines = synthetic_klines(20000, '1m', start_price=100.0, start_time=0, seed=5)
+    full_4h = aggregate_klines(klines, 240 * MINUTE)
+
+    resampler = CandleResampler(('4h',), '1m', capacity=60)
+    # Снимок биржи на момент старта: 4h до свечи 16000 (последняя - незакрытая)
+    resampler.seed('4h', aggregate_klines(klines[:16000], 240 * MINUTE))
+    resampler.update(klines[16000 - 300:16000])
+    for i in range(16000, len(klines), 7):
+        resampler.update(klines[i:i + 7])
+
+    result = resampler.buffers['4h'].to_array()
+    assert (result == full_4h[-60:]).all()
+
+
+def test_engine_multi_timeframe_mode():
+    klines = synthetic_klines(20000, '1m', start_price=100.0, start_time=0, seed=7)
+    resampler = CandleResampler(TIMEFRAMES, '1m', capacity=300, base_capacity=300)
+    resampler.seed('4h', aggregate_klines(klines[:19000], 240 * MINUTE))
+    resampler.update(klines[:19000][-300:])
+    resampler.update(klines[19000:])
+
+    engine = AIAnalysisEngine(incremental=True)
+    recommendation = engine.get_multi_timeframe_recommendation('BTCUSDT', resampler.frames(), primary='30m')
+    assert recommendation.action in ('BUY', 'SELL', 'HOLD')
+    assert recommendation.price == klines['close'][-1]
+    # 5m/15m/30m/60m собраны из 300 свечей 1m: у 30m и 60m меньше MIN_TIMEFRAME_CANDLES, они пропущены
+    assert 'Таймфреймы: 5m' in recommendation.reasoning and '4h' in recommendation.reasoning
+    assert '30m ' not in recommendation.reasoning.split('Таймфреймы: ')[1]
+    # Без primary среди учтенных - таймфрейм с наибольшим весом
+    assert recommendation.indicators['open_time'] == resampler.buffers['4h'].last_open_time
+
+    # Один таймфрейм с ненулевым весом - решение совпадает с обычным анализом его свечей
+    single = AIAnalysisEngine(timeframe_weights={'5m': 0, '15m': 0, '30m': 0, '60m': 0, '4h': 1})
+    combined = single.get_multi_timeframe_recommendation('BTCUSDT', resampler.frames())
+    plain = AIAnalysisEngine().get_ai_recommendation('BTCUSDT', klines_frame(resampler.buffers['4h'].to_array()))
+    assert combined.action == plain.action
+    assert combined.confidence == plain.confidence
+    assert combined.rsi == plain.rsi
+
+
+if __name__ == "__main__":
+    test_incremental_matches_batch()
+    test_seeded_history_continues_from_base_feed()
+    test_engine_multi_timeframe_mode()
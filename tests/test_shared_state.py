@@ -0,0 +1,129 @@
+import os
+import sys
+import logging
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.shared_state import SharedStateStore
+from utils.journal import RecommendationJournal
+from tests.helpers import import_dashboard
+
+logging.basicConfig(level=logging.INFO)
+
+
+def make_recommendation(price, action='BUY'):
+    return {
+        'action': action,
+        'confidence': 0.75,
+        'analysis': {'current_price': np.float64(price), 'rsi': np.float64(28.5), 'ma_50': np.nan},
+        'reasoning': 'RSI перепродан (28.5)'
+    }
+
+
+def test_publish_and_read_latest():
+    """Последняя рекомендация символа заменяет предыдущую, NaN сохраняется как None"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SharedStateStore(os.path.join(tmp, 'state.sqlite3'))
+        store.publish('BTCUSDT', make_recommendation(67000), updated_at=100.0)
+        store.publish('ETHUSDT', make_recommendation(3500, 'SELL'), updated_at=200.0)
+        store.publish('BTCUSDT', make_recommendation(67100, 'HOLD'), updated_at=300.0)
+
+        # Второе соединение - как у процесса дашборда
+        reader = SharedStateStore(os.path.join(tmp, 'state.sqlite3'))
+        latest = reader.get_latest()
+        assert [state['symbol'] for state in latest] == ['BTCUSDT', 'ETHUSDT']
+        assert latest[0]['action'] == 'HOLD'
+        assert latest[0]['price'] == 67100
+        assert latest[0]['analysis']['ma_50'] is None
+        assert reader.get_price('ETHUSDT') == 3500
+        assert reader.get_price('ADAUSDT') is None
+        reader.close()
+        store.close()
+
+
+def test_indicator_frame_is_trimmed():
+    """Хранятся только последние history строк индикаторов символа"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SharedStateStore(os.path.join(tmp, 'state.sqlite3'), history=5)
+        for i in range(8):
+            open_time = 1700000000000 + i * 1800000
+            indicators = {'open_time': open_time, 'close': 67000.0 + i, 'rsi': 50.0 + i}
+            store.publish('BTCUSDT', make_recommendation(67000 + i), indicators, open_time)
+
+        frame = store.get_indicator_frame('BTCUSDT')
+        assert len(frame) == 5
+        assert frame['close'].tolist() == [67003.0, 67004.0, 67005.0, 67006.0, 67007.0]
+        assert frame['open_time'].is_monotonic_increasing
+        store.close()
+
+
+def test_dashboard_reads_state_store():
+    """/api/status и /api/recommendations отдают опубликованное ботом состояние"""
+    app, dashboard = import_dashboard()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        original = dashboard.state_store, dashboard.journal
+        dashboard.state_store = SharedStateStore(os.path.join(tmp, 'state.sqlite3'))
+        dashboard.journal = RecommendationJournal(os.path.join(tmp, 'recommendations.jsonl'))
+        try:
+            dashboard.state_store.publish('BTCUSDT', make_recommendation(65432.1))
+            dashboard.journal.append('BTCUSDT', make_recommendation(65432.1))
+            client = app.test_client()
+
+            status = client.get('/api/status').get_json()
+            assert status['current_price'] == 65432.1
+            assert status['symbols'][0]['symbol'] == 'BTCUSDT'
+
+            recommendations = client.get('/api/recommendations?limit=3').get_json()
+            assert len(recommendations) == 3
+            assert recommendations[0]['price'] == 65432.1
+            assert recommendations[0]['action'] == 'BUY'
+        finally:
+            dashboard.state_store.close()
+            dashboard.journal.close()
+            dashboard.state_store, dashboard.journal = original
+
+
+def test_dashboard_derives_performance_and_pl():
+    """Статистика сигналов - из журнала, P&L и активные сделки - из книги ордеров бота"""
+    app, dashboard = import_dashboard()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        original = dashboard.state_store, dashboard.journal
+        dashboard.state_store = SharedStateStore(os.path.join(tmp, 'state.sqlite3'))
+        dashboard.journal = RecommendationJournal(os.path.join(tmp, 'recommendations.jsonl'))
+        try:
+            client = app.test_client()
+            metrics = client.get('/api/status').get_json()['trading_metrics']
+            assert metrics['total_pl'] is None and metrics['active_trades'] is None
+            assert client.get('/').status_code == 200
+
+            for action in ('BUY', 'BUY', 'BUY', 'SELL'):
+                dashboard.journal.append('BTCUSDT', make_recommendation(65432.1, action))
+            dashboard.state_store.publish_metrics('bot', {'orders': {'positions': {
+                'BTCUSDT': {'quantity': 0.5, 'avg_price': 65000.0, 'realized_pnl': 12.5},
+                'ETHUSDT': {'quantity': 0.0, 'avg_price': None, 'realized_pnl': -2.5}
+            }}})
+
+            status = client.get('/api/status').get_json()
+            performance = status['performance']
+            assert performance['total_recommendations'] == 4
+            assert (performance['buy_count'], performance['sell_count'], performance['hold_count']) == (3, 1, 0)
+            assert performance['buy_percentage'] == 75.0
+            assert performance['avg_confidence'] == 0.75
+            assert status['trading_metrics']['total_pl'] == 10.0
+            assert status['trading_metrics']['active_trades'] == 1
+            assert client.get('/').status_code == 200
+        finally:
+            dashboard.state_store.close()
+            dashboard.journal.close()
+            dashboard.state_store, dashboard.journal = original
+
+
+if __name__ == "__main__":
+    test_publish_and_read_latest()
+    test_indicator_frame_is_trimmed()
+    test_dashboard_reads_state_store()
+    test_dashboard_derives_performance_and_pl()
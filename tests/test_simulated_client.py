@@ -0,0 +1,164 @@
+import os
+import sys
+import logging
+import tempfile
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api.execution import OrderExecutor
+from api.mexc_client import MexcClient
+from api.simulated_client import SimulatedMexcClient, synthetic_klines, aggregate_klines
+from config.settings import TRADING_SETTINGS, SIMULATOR_SETTINGS
+from tests.helpers import isolated_data, data_snapshot
+
+logging.basicConfig(level=logging.INFO)
+
+MINUTE = 60000
+
+
+def make_client(**kwargs):
+    """Одна свеча 1m на каждую минуту, время двигается только через advance()"""
+    klines = synthetic_klines(3000, '1m', start_price=100.0, start_time=0, seed=1)
+    options = dict(speed=0, start_time=2000 * MINUTE, slippage=0.001, taker_fee=0.001, latency_ms=0)
+    options.update(kwargs)
+    return SimulatedMexcClient({'BTCUSDT': klines}, **options), klines
+
+
+def test_klines_replay_without_lookahead():
+    client, klines = make_client()
+    client.advance(30)  # Середина свечи 2000
+
+    minute = client.get_klines_array('BTCUSDT', '1m', 100)
+    assert len(minute) == 100 and minute['open_time'][-1] == 2000 * MINUTE
+    current = minute[-1]
+    assert current['close'] == client.get_current_price('BTCUSDT')
+    assert current['volume'] == klines['volume'][2000] / 2
+    assert klines['low'][2000] <= current['low'] and current['high'] <= klines['high'][2000]
+    assert (minute[:-1] == klines[1901:2000]).all()
+
+    # 30m собираются из 1m; последняя 30m свеча - недостроенная
+    half_hour = client.get_klines_array('BTCUSDT', '30m', 10)
+    expected = aggregate_klines(klines[:1980], 30 * MINUTE)[-9:]
+    assert len(half_hour) == 10
+    assert half_hour['open_time'][-1] == 1980 * MINUTE
+    assert (half_hour[:-1] == expected).all()
+    assert half_hour['close'][-1] == current['close']
+
+
+def test_market_orders_fees_and_balances():
+    client, _ = make_client(balances={'USDT': 1000.0})
+    price = client.get_current_price('BTCUSDT')
+
+    response = client.create_order('BTCUSDT', 'BUY', 'MARKET', 2.0, client_order_id='a1')
+    assert response['orderId'] == '1'
+    order = client.query_order('BTCUSDT', client_order_id='a1')
+    assert order['status'] == 'FILLED'
+    fill_price = float(order['cummulativeQuoteQty']) / float(order['executedQty'])
+    assert np.isclose(fill_price, price * 1.001)
+
+    balances = {b['asset']: float(b['free']) for b in client.get_account_info()['balances']}
+    assert balances['BTC'] == 2.0
+    assert np.isclose(balances['USDT'], 1000.0 - 2.0 * fill_price * 1.001)
+
+    assert client.create_order('BTCUSDT', 'BUY', 'MARKET', 2.0, client_order_id='a1')['code'] == 30008
+    assert client.create_order('BTCUSDT', 'SELL', 'MARKET', 5.0)['code'] == 30004
+    assert client.create_order('BTCUSDT', 'BUY', 'MARKET', 100.0)['code'] == 30004
+
+
+def test_limit_order_fills_through_executor():
+    """Лимитный ордер исполняется, когда цена его касается; книга исполнителя обновляется сразу"""
+    client, klines = make_client()
+    executor = OrderExecutor(client)
+    client.add_order_listener(executor.on_stream_update)
+
+    target = float(klines['low'][2000:2100].min())
+    order = executor.submit('BTCUSDT', 'BUY', 'LIMIT', 1.0, price=target)
+    assert executor.wait(5)
+    assert order.status == 'NEW'
+    locked = {b['asset']: float(b['locked']) for b in client.get_account_info()['balances']}
+    assert np.isclose(locked['USDT'], target * 1.001)
+
+    client.advance(100 * 60)
+    client.get_current_price('BTCUSDT')
+    assert order.status == 'FILLED' and order.avg_price == target
+    assert executor.order_book.position('BTCUSDT')['quantity'] == 1.0
+    executor.stop()
+
+
+def test_bot_runs_on_simulator():
+    """TradingBot целиком на симуляторе: несколько циклов без сети"""
+    original = dict(TRADING_SETTINGS), dict(SIMULATOR_SETTINGS)
+    TRADING_SETTINGS.update(exchange='simulated', klines_limit=100)
+    SIMULATOR_SETTINGS.update(speed=0, days=5, seed=7)
+    before = data_snapshot()
+    try:
+        # Хранилища бота - во временном каталоге, а не в data/ проекта
+        with tempfile.TemporaryDirectory() as tmp, isolated_data(tmp):
+            from main import TradingBot
+            bot = TradingBot()
+            try:
+                assert bot.trade_enabled and bot.time_scale == 1
+                for _ in range(3):
+                    bot.run_analysis_cycle()
+                    bot.mexc_client.advance(1800)
+                assert bot.cycle_count == 3
+                assert bot.mexc_client.get_call_stats()['errors'] == 0
+                assert bot.get_bot_status()['orders']['queued'] == 0
+                assert len(bot.journal) == 3 * len(bot.symbols)
+            finally:
+                bot.close()
+    finally:
+        for settings, values in zip((TRADING_SETTINGS, SIMULATOR_SETTINGS), original):
+            settings.clear()
+            settings.update(values)
+    assert data_snapshot() == before
+
+
+def test_fallback_candles_do_not_reach_timeframes():
+    """Без свечей биржи бот анализирует тестовые данные, но не кладет их в resampler"""
+    original = dict(TRADING_SETTINGS), dict(SIMULATOR_SETTINGS)
+    TRADING_SETTINGS.update(exchange='simulated', klines_limit=100, symbols=['BTCUSDT'],
+                            timeframes=['5m', '15m'], base_interval='1m')
+    SIMULATOR_SETTINGS.update(speed=0, days=2, seed=7)
+    offline = MexcClient('test_key', 'test_secret')
+    offline._fetch_klines = lambda *args, **kwargs: None
+    offline.get_current_price = lambda symbol='BTCUSDT': 100.0
+    before = data_snapshot()
+    try:
+        assert len(offline.get_klines_array('BTCUSDT', '1m', 100, fallback=False)) == 0
+        assert len(offline.get_klines_array('BTCUSDT', '1m', 100)) == 100
+
+        with tempfile.TemporaryDirectory() as tmp, isolated_data(tmp):
+            from main import TradingBot
+            bot = TradingBot()
+            bot.trade_enabled = False
+            simulator, bot.mexc_client = bot.mexc_client, offline
+            try:
+                resampler = bot.resamplers['BTCUSDT']
+                bot.analyze_symbol('BTCUSDT')
+                assert len(resampler.base) == 0
+                assert 'BTCUSDT' not in bot._seeded_timeframes
+
+                # Биржа снова отвечает - таймфреймы заполняются реальными свечами
+                bot.mexc_client = simulator
+                bot.analyze_symbol('BTCUSDT')
+                assert resampler.base.last_open_time == simulator.get_klines_array('BTCUSDT', '1m', 1)['open_time'][-1]
+                assert 'BTCUSDT' in bot._seeded_timeframes
+            finally:
+                bot.close()
+    finally:
+        offline.close()
+        for settings, values in zip((TRADING_SETTINGS, SIMULATOR_SETTINGS), original):
+            settings.clear()
+            settings.update(values)
+    assert data_snapshot() == before
+
+
+if __name__ == "__main__":
+    test_klines_replay_without_lookahead()
+    test_market_orders_fees_and_balances()
+    test_limit_order_fills_through_executor()
+    test_bot_runs_on_simulator()
+    test_fallback_candles_do_not_reach_timeframes()
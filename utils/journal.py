@@ -0,0 +1,135 @@
+import os
+import json
+import time
+import struct
+import threading
+import logging
+from typing import Dict, List
+
+from utils.models import Recommendation
+
+# Смещение записи в индексе: uint64 little-endian
+OFFSET = struct.Struct('<Q')
+
+
+class RecommendationJournal:
+    """Журнал рекомендаций: JSONL-файл и индекс смещений записей
+
+    Каждая рекомендация дописывается строкой JSON в path, смещение ее
+    начала - 8 байтами в path + '.idx'. read_latest(n) читает из индекса
+    последние n смещений и затем один непрерывный кусок данных, поэтому
+    стоимость чтения зависит только от n, а не от размера журнала.
+    Писатель один (бот), читателей может быть сколько угодно.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index_path = path + '.idx'
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._data = None
+        self._index = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, symbol: str, recommendation: Recommendation, timestamp: float = None) -> Dict:
+        """Дописать рекомендацию (Recommendation или словарь) с временем ее получения"""
+        entry = Recommendation.from_dict(recommendation).to_record(timestamp or time.time())
+        entry['symbol'] = symbol
+        line = json.dumps(entry, ensure_ascii=False).encode('utf-8') + b'\n'
+
+        with self._lock:
+            if self._data is None:
+                self._open_for_append()
+            offset = self._data.tell()
+            self._data.write(line)
+            self._data.flush()
+            # Индекс пишется после данных: читатель не увидит недописанную запись
+            self._index.write(OFFSET.pack(offset))
+            self._index.flush()
+        return entry
+
+    def __len__(self) -> int:
+        try:
+            return os.path.getsize(self.index_path) // OFFSET.size
+        except OSError:
+            return 0
+
+    def read_latest(self, n: int = 10) -> List[Dict]:
+        """Последние n записей, новые сначала"""
+        if n <= 0:
+            return []
+        try:
+            with open(self.index_path, 'rb') as index:
+                count = os.fstat(index.fileno()).st_size // OFFSET.size
+                n = min(n, count)
+                if n == 0:
+                    return []
+                index.seek((count - n) * OFFSET.size)
+                offsets = [value for (value,) in OFFSET.iter_unpack(index.read(n * OFFSET.size))]
+
+            with open(self.path, 'rb') as data:
+                data.seek(offsets[0])
+                # Все n записей лежат подряд, их конец - перевод строки последней
+                chunk = data.read()
+        except FileNotFoundError:
+            return []
+
+        entries = []
+        for line in chunk.split(b'\n', n)[:n]:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                self.logger.warning(f"⚠️ Поврежденная запись журнала {self.path}")
+        entries.reverse()
+        return entries
+
+    def close(self):
+        with self._lock:
+            for handle in (self._data, self._index):
+                if handle is not None:
+                    handle.close()
+            self._data = self._index = None
+
+    def _open_for_append(self):
+        self._data = open(self.path, 'ab')
+        self._index = open(self.index_path, 'ab')
+        self._recover()
+
+    def _recover(self):
+        """Доиндексировать записи после сбоя между записью данных и индекса"""
+        data_size = self._data.seek(0, os.SEEK_END)
+        index_size = self._index.seek(0, os.SEEK_END)
+        if index_size % OFFSET.size:
+            self._index.truncate(index_size - index_size % OFFSET.size)
+            index_size -= index_size % OFFSET.size
+
+        start = 0
+        if index_size:
+            with open(self.index_path, 'rb') as index:
+                index.seek(index_size - OFFSET.size)
+                (last_offset,) = OFFSET.unpack(index.read(OFFSET.size))
+            with open(self.path, 'rb') as data:
+                data.seek(last_offset)
+                data.readline()
+                start = data.tell()
+        if start >= data_size:
+            return
+
+        recovered = 0
+        with open(self.path, 'rb') as data:
+            data.seek(start)
+            offset = start
+            for line in data:
+                if not line.endswith(b'\n'):
+                    # Недописанная строка: обрезаем, следующая запись начнется с нее
+                    self._data.truncate(offset)
+                    self._data.seek(0, os.SEEK_END)
+                    break
+                self._index.write(OFFSET.pack(offset))
+                offset += len(line)
+                recovered += 1
+        self._index.flush()
+        if recovered:
+            self.logger.info(f"🩹 Восстановлено {recovered} записей индекса журнала {self.path}")
@@ -0,0 +1,264 @@
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List
+
+# Атрибуты LogRecord, которые не являются пользовательскими полями (extra=...)
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_new', 'block')
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, источник, сообщение и поля extra"""
+
+    def __init__(self, source: str = None):
+        super().__init__()
+        self.source = source
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'ts': round(record.created, 3),
+            'time': datetime.fromtimestamp(record.created).strftime('%Y-%m-%d %H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage()
+        }
+        if self.source:
+            data['source'] = self.source
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class AsyncLogHandler(logging.Handler):
+    """Логирование без ожидания диска и stdout в вызывающем потоке
+
+    emit() только кладет запись в ограниченную очередь. Фоновый поток
+    забирает записи пачками (до batch_size или раз в flush_interval
+    секунд), форматирует их форматтерами целевых обработчиков и пишет
+    каждую пачку одним write() + flush() на цель.
+
+    При переполнении очереди действует overflow:
+      drop_oldest - вытесняется самая старая запись (по умолчанию),
+      drop_new    - отбрасывается новая запись,
+      block       - вызывающий поток ждет до block_timeout, затем запись отбрасывается.
+    Число потерянных записей пишется в лог отдельным предупреждением.
+    """
+
+    def __init__(self, targets: List[logging.Handler], queue_size: int = 10000,
+                 overflow: str = 'drop_oldest', batch_size: int = 500,
+                 flush_interval: float = 0.5, block_timeout: float = 0.1):
+        super().__init__()
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Неизвестная политика переполнения: {overflow}")
+        self.targets = list(targets)
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+
+        self._queue = deque()
+        lock = threading.Lock()
+        self._condition = threading.Condition(lock)  # есть записи / закрытие
+        self._not_full = threading.Condition(lock)  # место в очереди (overflow='block')
+        self._idle = threading.Condition(lock)  # очередь пуста и пачка записана
+        self._writing = False
+        self._closed = False
+        self._dropped = 0
+        self._stats = {'queued': 0, 'written': 0, 'dropped': 0, 'batches': 0}
+
+        self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+        self._thread.start()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self._prepare(record)
+        except Exception:
+            self.handleError(record)
+            return
+
+        with self._condition:
+            if self._closed:
+                return
+            if len(self._queue) >= self.queue_size:
+                if self.overflow == 'drop_new':
+                    self._drop(1)
+                    return
+                if self.overflow == 'block':
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._queue) >= self.queue_size and not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._not_full.wait(remaining)
+                    if len(self._queue) >= self.queue_size:
+                        self._drop(1)
+                        return
+                else:
+                    self._queue.popleft()
+                    self._drop(1)
+            self._queue.append(record)
+            self._stats['queued'] += 1
+            # Будим писателя на первой записи (он подождет flush_interval) и на полной пачке
+            if len(self._queue) == 1 or len(self._queue) >= self.batch_size:
+                self._condition.notify()
+
+    @staticmethod
+    def _prepare(record: logging.LogRecord):
+        """Зафиксировать сообщение и трейсбек сейчас: аргументы могут измениться до записи"""
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+    def _drop(self, count: int):
+        self._dropped += count
+        self._stats['dropped'] += count
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._dropped and not self._closed:
+                    self._condition.wait()
+                # Копим пачку до batch_size или до истечения flush_interval
+                if len(self._queue) < self.batch_size and not self._closed:
+                    self._condition.wait(self.flush_interval)
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                dropped, self._dropped = self._dropped, 0
+                closed = self._closed and not self._queue
+                self._writing = True
+                self._not_full.notify_all()
+
+            if dropped:
+                batch.append(self._overflow_record(dropped))
+            if batch:
+                self._write(batch)
+
+            with self._condition:
+                self._writing = False
+                if not self._queue:
+                    self._idle.notify_all()
+            if closed:
+                return
+
+    def _overflow_record(self, dropped: int) -> logging.LogRecord:
+        record = logging.LogRecord('log_pipeline', logging.WARNING, __file__, 0,
+                                   f"⚠️ Очередь лога переполнена, пропущено записей: {dropped}",
+                                   None, None)
+        record.dropped = dropped
+        return record
+
+    def _write(self, batch: List[logging.LogRecord]):
+        for target in self.targets:
+            lines = []
+            for record in batch:
+                if record.levelno < target.level:
+                    continue
+                try:
+                    lines.append(target.format(record))
+                except Exception:
+                    target.handleError(record)
+            if not lines:
+                continue
+            target.acquire()
+            try:
+                stream = target.stream
+                if stream is None:
+                    stream = target.stream = target._open()
+                if getattr(stream, 'closed', False):
+                    continue  # stdout закрыт при завершении процесса раньше писателя
+                stream.write(target.terminator.join(lines) + target.terminator)
+                stream.flush()
+            except Exception:
+                target.handleError(batch[-1])
+            finally:
+                target.release()
+        with self._condition:
+            self._stats['written'] += len(batch)
+            self._stats['batches'] += 1
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Дождаться записи всего, что уже в очереди; False - не успели за timeout"""
+        with self._condition:
+            self._condition.notify()
+            return self._idle.wait_for(
+                lambda: not (self._queue or self._dropped or self._writing) or not self._thread.is_alive(),
+                timeout)
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return dict(self._stats, pending=len(self._queue))
+
+    def close(self):
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join(timeout=10)
+        for target in self.targets:
+            target.close()
+        super().close()
+
+
+def setup_logging(source: str, log_file: str, settings: Dict = None, logger: logging.Logger = None,
+                  console: bool = None, fmt: str = None) -> logging.Handler:
+    """Настроить логгер (по умолчанию корневой) по LOG_SETTINGS
+
+    mode 'async' - запись через AsyncLogHandler в фоновом потоке,
+    'sync' - прежние FileHandler/StreamHandler. format 'json' - файл
+    пишется строками JSON, консоль всегда остается текстовой.
+    Возвращает установленный обработчик.
+    """
+    settings = settings or {}
+    logger = logger if logger is not None else logging.getLogger()
+    fmt = fmt or f'%(asctime)s - {source} - %(levelname)s - %(message)s'
+    console = settings.get('console', True) if console is None else console
+
+    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    if settings.get('format') == 'json':
+        file_handler.setFormatter(JsonFormatter(source))
+    else:
+        file_handler.setFormatter(logging.Formatter(fmt))
+    targets = [file_handler]
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter(fmt))
+        targets.append(console_handler)
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    logger.setLevel(settings.get('level', logging.INFO))
+
+    if settings.get('mode', 'async') != 'async':
+        for handler in targets:
+            logger.addHandler(handler)
+        return targets[0]
+
+    handler = AsyncLogHandler(
+        targets,
+        queue_size=settings.get('queue_size', 10000),
+        overflow=settings.get('overflow', 'drop_oldest'),
+        batch_size=settings.get('batch_size', 500),
+        flush_interval=settings.get('flush_interval', 0.5)
+    )
+    logger.addHandler(handler)
+    # logging.shutdown() тоже закрывает обработчики, atexit - на случай удаления из логгера
+    atexit.register(handler.close)
+    return handler
@@ -0,0 +1,134 @@
+import os
+import threading
+from collections import deque
+from typing import Dict, List
+
+
+def split_lines(data: bytes) -> List[str]:
+    """Разбить байты на строки с '\\n' в конце, как readlines()"""
+    parts = data.split(b'\n')
+    lines = [part + b'\n' for part in parts[:-1]]
+    if parts[-1]:
+        lines.append(parts[-1])
+    return [line.decode('utf-8', errors='replace') for line in lines]
+
+
+def read_tail(handle, end: int, lines: int, block_size: int = 8192) -> List[str]:
+    """Последние lines строк файла до смещения end, чтение блоками с конца"""
+    blocks = []
+    newlines = 0
+    position = end
+    # Нужна lines + 1 граница строки, чтобы первая строка была целой
+    while position > 0 and newlines <= lines:
+        size = min(block_size, position)
+        position -= size
+        handle.seek(position)
+        block = handle.read(size)
+        newlines += block.count(b'\n')
+        blocks.append(block)
+
+    data = b''.join(reversed(blocks))
+    return split_lines(data)[-lines:] if lines else []
+
+
+class LogTailer:
+    """Кэш последних строк лог-файлов для частых опросов дашборда
+
+    На каждый запрос делается один stat(): пока размер и mtime файла не
+    изменились, строки отдаются из кэша. При дописывании читается только
+    новый хвост, при ротации (другой inode) или усечении файла хвост
+    перечитывается блоками с конца. Стоимость запроса не зависит от
+    размера лога. Недописанная последняя строка появится, когда будет
+    записан ее перевод строки.
+    """
+
+    def __init__(self, lines: int = 20, block_size: int = 8192):
+        self.lines = lines
+        self.block_size = block_size
+        self._cache: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def tail(self, path: str) -> List[str]:
+        """Последние self.lines строк файла (как readlines()[-lines:])"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._cache.pop(path, None)
+            return []
+
+        identity = (stat.st_dev, stat.st_ino)
+        with self._lock:
+            entry = self._cache.get(path)
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns \
+                    and entry['identity'] == identity:
+                return list(entry['lines'])
+
+            with open(path, 'rb') as handle:
+                if entry and entry['identity'] == identity and stat.st_size >= entry['position'] \
+                        and stat.st_size - entry['position'] <= self.block_size * 4:
+                    self._read_appended(handle, entry, stat.st_size)
+                else:
+                    entry = self._read_full(handle, stat.st_size)
+
+            entry.update(identity=identity, size=stat.st_size, mtime=stat.st_mtime_ns)
+            self._cache[path] = entry
+            return list(entry['lines'])
+
+    def _read_full(self, handle, size: int) -> Dict:
+        end = self._last_line_end(handle, size)
+        lines = read_tail(handle, end, self.lines, self.block_size) if end else []
+        return {'lines': deque(lines, maxlen=self.lines), 'position': end}
+
+    def _last_line_end(self, handle, size: int) -> int:
+        """Смещение после последнего перевода строки - до него кэшируются строки"""
+        position = size
+        while position > 0:
+            start = max(0, position - self.block_size)
+            handle.seek(start)
+            cut = handle.read(position - start).rfind(b'\n')
+            if cut >= 0:
+                return start + cut + 1
+            position = start
+        return 0
+
+    def _read_appended(self, handle, entry: Dict, size: int):
+        handle.seek(entry['position'])
+        appended = handle.read(size - entry['position'])
+        cut = appended.rfind(b'\n')
+        if cut < 0:
+            return
+        entry['lines'].extend(split_lines(appended[:cut + 1]))
+        entry['position'] += cut + 1
+
+    def read_new(self, path: str, cursor=None, max_bytes: int = 65536):
+        """Строки, дописанные после cursor; возвращает (строки, новый cursor)
+
+        cursor - (identity, position) из предыдущего вызова. Первый вызов
+        только запоминает конец файла. При ротации файл читается с начала,
+        при большом приросте - только последние max_bytes.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return [], None
+
+        identity = (stat.st_dev, stat.st_ino)
+        with open(path, 'rb') as handle:
+            if cursor is None:
+                return [], (identity, self._last_line_end(handle, stat.st_size))
+
+            position = cursor[1]
+            if cursor[0] != identity or stat.st_size < position:
+                position = 0
+            if stat.st_size - position > max_bytes:
+                position = stat.st_size - max_bytes
+                handle.seek(position)
+                position += handle.read().find(b'\n') + 1
+
+            handle.seek(position)
+            appended = handle.read(stat.st_size - position)
+        cut = appended.rfind(b'\n')
+        if cut < 0:
+            return [], (identity, position)
+        return split_lines(appended[:cut + 1]), (identity, position + cut + 1)
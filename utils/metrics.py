@@ -0,0 +1,425 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными корзинами (в секундах)
+
+    Память постоянна, percentile() оценивается линейной интерполяцией
+    внутри корзины - точности хватает для p50/p95/p99 сетевых вызовов.
+    """
+
+    DEFAULT_BUCKETS = (
+        0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5,
+        0.75, 1.0, 1.5, 2.5, 5.0, 10.0, 15.0, 30.0
+    )
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # последняя корзина - +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Оценка q-квантиля (0 < q <= 1) в секундах"""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+            maximum = self.max
+        if count == 0:
+            return 0.0
+
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else maximum
+                upper = min(upper, maximum)
+                fraction = (rank - cumulative) / bucket_count
+                return lower + (upper - lower) * fraction
+            cumulative += bucket_count
+        return maximum
+
+    def snapshot(self) -> Dict:
+        """Сводка в миллисекундах"""
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            'p50_ms': round(self.percentile(0.50) * 1000, 2),
+            'p95_ms': round(self.percentile(0.95) * 1000, 2),
+            'p99_ms': round(self.percentile(0.99) * 1000, 2),
+            'max_ms': round(self.max * 1000, 2)
+        }
+
+
+class LatencyRecorder:
+    """Набор гистограмм задержек по ключу (например, по endpoint)"""
+
+    def __init__(self, buckets=LatencyHistogram.DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, key: str) -> LatencyHistogram:
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, LatencyHistogram(self.buckets))
+        return histogram
+
+    def observe(self, key: str, seconds: float):
+        self.histogram(key).observe(seconds)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        return {key: histogram.snapshot() for key, histogram in list(self._histograms.items())}
+
+
+class RingBuffer:
+    """Последние size значений в массиве фиксированного размера"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._values = [0.0] * size
+        self._index = 0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def append(self, value: float):
+        with self._lock:
+            self._values[self._index] = value
+            self._index = (self._index + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def values(self) -> List[float]:
+        """Значения от старых к новым"""
+        with self._lock:
+            if self._count < self.size:
+                return self._values[:self._count]
+            return self._values[self._index:] + self._values[:self._index]
+
+    def summary(self) -> Dict:
+        values = self.values()
+        if not values:
+            return {'count': 0, 'last': None, 'avg': None, 'max': None}
+        return {
+            'count': len(values),
+            'last': values[-1],
+            'avg': sum(values) / len(values),
+            'max': max(values)
+        }
+
+
+class CallCounter:
+    """Счетчики вызовов и ошибок по ключу (например, по endpoint)"""
+
+    def __init__(self):
+        self._calls: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, error: bool = False):
+        with self._lock:
+            self._calls[key] = self._calls.get(key, 0) + 1
+            if error:
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            calls = dict(self._calls)
+            errors = dict(self._errors)
+        total_calls = sum(calls.values())
+        total_errors = sum(errors.values())
+        return {
+            'calls': total_calls,
+            'errors': total_errors,
+            'error_rate': round(total_errors / total_calls, 4) if total_calls else 0.0,
+            'endpoints': {key: {'calls': count, 'errors': errors.get(key, 0)} for key, count in calls.items()}
+        }
+
+
+class ProcessSampler:
+    """CPU, RSS, потоки и открытые дескрипторы процесса из /proc (Linux)
+
+    cpu_percent считается по приросту utime+stime между вызовами sample(),
+    поэтому первый замер дает 0. Последние значения хранятся в RingBuffer.
+    Без /proc (Windows, macOS) sample() возвращает пустой словарь.
+    """
+
+    def __init__(self, pid: int = None, history: int = 120):
+        self.pid = pid or os.getpid()
+        self.history = {name: RingBuffer(history) for name in ('cpu_percent', 'rss_mb', 'threads', 'open_fds')}
+        self._last_cpu = None
+        try:
+            self._clock_ticks = os.sysconf('SC_CLK_TCK')
+            self._memory_total = self._read_memory_total()
+        except (AttributeError, ValueError, OSError):
+            self._clock_ticks = None
+            self._memory_total = None
+
+    @staticmethod
+    def available() -> bool:
+        return os.path.isdir('/proc/self')
+
+    def sample(self) -> Dict:
+        if not self._clock_ticks:
+            return {}
+        try:
+            with open(f'/proc/{self.pid}/stat', 'rb') as f:
+                # Имя процесса в скобках может содержать пробелы
+                fields = f.read().rsplit(b')', 1)[1].split()
+            cpu_seconds = (int(fields[11]) + int(fields[12])) / self._clock_ticks
+
+            status = {}
+            with open(f'/proc/{self.pid}/status', 'r') as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if key in ('VmRSS', 'Threads'):
+                        status[key] = int(value.split()[0])
+            open_fds = len(os.listdir(f'/proc/{self.pid}/fd'))
+        except (OSError, IndexError, ValueError):
+            return {}
+
+        now = time.monotonic()
+        cpu_percent = 0.0
+        if self._last_cpu is not None and now > self._last_cpu[0]:
+            cpu_percent = (cpu_seconds - self._last_cpu[1]) / (now - self._last_cpu[0]) * 100
+        self._last_cpu = (now, cpu_seconds)
+
+        rss_kb = status.get('VmRSS', 0)
+        sample = {
+            'pid': self.pid,
+            'cpu_percent': round(cpu_percent, 1),
+            'rss_mb': round(rss_kb / 1024, 1),
+            'memory_percent': round(rss_kb / self._memory_total * 100, 2) if self._memory_total else None,
+            'threads': status.get('Threads', 0),
+            'open_fds': open_fds
+        }
+        for name, buffer in self.history.items():
+            buffer.append(sample[name])
+        return sample
+
+    @staticmethod
+    def _read_memory_total() -> Optional[int]:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1])
+        return None
+
+
+class _Timer:
+    """Контекстный менеджер: длительность блока в histogram.observe()"""
+
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started)
+        return False
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ('buckets', 'counts', 'sum', '_lock')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> _Timer:
+        return _Timer(self)
+
+
+class _Metric:
+    """Семейство метрик с метками; без меток методы вызываются на самом семействе"""
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _samples(self):
+        return [[list(values), self._child_value(child)] for values, child in list(self._children.items())]
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def _child_value(self, child):
+        return child.value
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LatencyHistogram.DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _child_value(self, child):
+        with child._lock:
+            return {'counts': list(child.counts), 'sum': child.sum}
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self) -> _Timer:
+        return self.labels().time()
+
+
+class MetricsRegistry:
+    """Метрики в формате Prometheus
+
+    Горячий путь - только инкремент под блокировкой; снимок и текст
+    формируются лишь при чтении (scrape). Повторная регистрация того же
+    имени возвращает существующую метрику, поэтому модули могут
+    объявлять общие семейства независимо.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames=()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames=(),
+                  buckets=LatencyHistogram.DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Метрика {name} уже зарегистрирована с другим типом или метками")
+        return metric
+
+    def snapshot(self) -> Dict:
+        """Значения всех метрик в JSON-совместимом виде (для передачи между процессами)"""
+        families = {}
+        for name, metric in list(self._metrics.items()):
+            family = {
+                'type': metric.type,
+                'help': metric.documentation,
+                'labels': list(metric.labelnames),
+                'samples': metric._samples()
+            }
+            if metric.type == 'histogram':
+                family['buckets'] = list(metric.buckets)
+            families[name] = family
+        return families
+
+    def render(self) -> str:
+        return render_prometheus(self.snapshot())
+
+
+def _format_labels(names, values, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render_prometheus(snapshot: Dict) -> str:
+    """Текстовый формат экспозиции Prometheus 0.0.4 из snapshot()"""
+    lines = []
+    for name, family in snapshot.items():
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        labels = family['labels']
+        for values, value in family['samples']:
+            if family['type'] == 'histogram':
+                cumulative = 0
+                for bound, count in zip(list(family['buckets']) + [float('inf')], value['counts']):
+                    cumulative += count
+                    le = 'le="' + _format_value(bound) + '"'
+                    lines.append(f"{name}_bucket{_format_labels(labels, values, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels, values)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labels, values)} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(labels, values)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+# Реестр процесса по умолчанию
+REGISTRY = MetricsRegistry()
+
+# Корзины для фаз цикла анализа: расчеты занимают доли миллисекунды
+PHASE_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
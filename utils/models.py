@@ -0,0 +1,304 @@
+import math
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from api.kline_parser import KLINE_DTYPE, KLINE_FIELDS, parse_klines, klines_frame
+
+
+def _number(value) -> Optional[float]:
+    """float из числа numpy/строки; None, NaN и inf -> None"""
+    if value is None:
+        return None
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if math.isfinite(value) else None
+
+
+class Recommendation:
+    """Рекомендация движка без словарей на каждый вызов
+
+    Поля лежат в __slots__. Для старого кода доступны чтение как словаря
+    (recommendation['action'], recommendation['analysis']['rsi'], .get())
+    и to_dict() в прежнем формате. to_record() - плоская запись для журнала
+    и дашборда.
+    """
+
+    __slots__ = ('action', 'confidence', 'price', 'rsi', 'ma_20', 'ma_50', 'macd', 'volume_ratio',
+                 'reasoning', 'indicators', 'symbol', 'timestamp')
+
+    # Ключи словаря analysis -> поля
+    ANALYSIS_FIELDS = {
+        'current_price': 'price', 'rsi': 'rsi', 'ma_20': 'ma_20', 'ma_50': 'ma_50',
+        'macd': 'macd', 'volume_ratio': 'volume_ratio'
+    }
+
+    def __init__(self, action: str, confidence: float, price: float = None, rsi: float = None,
+                 ma_20: float = None, ma_50: float = None, macd: float = None,
+                 volume_ratio: float = None, reasoning: str = '', indicators: Dict = None,
+                 symbol: str = None, timestamp: float = None):
+        self.action = action
+        self.confidence = float(confidence)
+        self.price = _number(price)
+        self.rsi = _number(rsi)
+        self.ma_20 = _number(ma_20)
+        self.ma_50 = _number(ma_50)
+        self.macd = _number(macd)
+        self.volume_ratio = _number(volume_ratio)
+        self.reasoning = reasoning or ''
+        self.indicators = indicators
+        self.symbol = symbol
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_dict(cls, data: Dict, symbol: str = None) -> 'Recommendation':
+        """Из прежнего формата {'action', 'confidence', 'analysis': {...}, 'reasoning'}"""
+        if isinstance(data, cls):
+            return data
+        analysis = data.get('analysis') or {}
+        fields = {field: analysis.get(key) for key, field in cls.ANALYSIS_FIELDS.items()}
+        return cls(data['action'], data['confidence'], reasoning=data.get('reasoning', ''),
+                   indicators=data.get('indicators'), symbol=symbol or data.get('symbol'),
+                   timestamp=data.get('ts'), **fields)
+
+    @classmethod
+    def from_record(cls, record: Dict) -> 'Recommendation':
+        """Из плоской записи журнала или хранилища состояния"""
+        analysis = record.get('analysis') or {}
+        fields = {field: analysis.get(key) for key, field in cls.ANALYSIS_FIELDS.items()}
+        fields['price'] = record.get('price', fields['price'])
+        fields['rsi'] = record.get('rsi', fields['rsi'])
+        return cls(record['action'], record['confidence'], reasoning=record.get('reasoning', ''),
+                   symbol=record.get('symbol'), timestamp=record.get('ts', record.get('updated_at')),
+                   **fields)
+
+    @property
+    def analysis(self) -> Dict:
+        analysis = {'current_price': self.price, 'rsi': self.rsi}
+        for key in ('ma_20', 'ma_50', 'macd', 'volume_ratio'):
+            value = getattr(self, key)
+            if value is not None:
+                analysis[key] = value
+        return analysis
+
+    def to_dict(self) -> Dict:
+        data = {
+            'action': self.action,
+            'confidence': self.confidence,
+            'analysis': self.analysis,
+            'reasoning': self.reasoning
+        }
+        if self.indicators is not None:
+            data['indicators'] = self.indicators
+        return data
+
+    def to_record(self, timestamp: float = None) -> Dict:
+        """Плоская запись: время, символ, действие, уверенность, цена, RSI, пояснение"""
+        timestamp = timestamp or self.timestamp
+        return {
+            'ts': timestamp,
+            'timestamp': datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else None,
+            'symbol': self.symbol,
+            'action': self.action,
+            'confidence': self.confidence,
+            'price': self.price,
+            'rsi': self.rsi,
+            'reasoning': self.reasoning
+        }
+
+    # Совместимость с кодом, работающим со словарем
+    def __getitem__(self, key: str):
+        if key == 'analysis':
+            return self.analysis
+        if key in ('action', 'confidence', 'reasoning') or (key == 'indicators' and self.indicators is not None):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Recommendation):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        symbol = f"{self.symbol} " if self.symbol else ''
+        return f"Recommendation({symbol}{self.action} confidence={self.confidence:.2f} price={self.price} rsi={self.rsi})"
+
+
+class CandleBuffer:
+    """Кольцевой буфер последних capacity свечей одного символа
+
+    Свечи лежат в заранее выделенном структурированном массиве KLINE_DTYPE,
+    поэтому память не растет со временем работы: новые свечи записываются
+    на место самых старых. Свеча с тем же open_time, что и последняя,
+    заменяет ее (незакрытая свеча обновляется), более старые игнорируются.
+    """
+
+    __slots__ = ('capacity', '_data', '_start', '_size')
+
+    def __init__(self, capacity: int = 500):
+        if capacity <= 0:
+            raise ValueError("Емкость буфера должна быть положительной")
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=KLINE_DTYPE)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        return int(self._data['open_time'][self._last_index()]) if self._size else None
+
+    def last(self) -> Optional[np.void]:
+        """Копия последней свечи"""
+        return self._data[self._last_index()].copy() if self._size else None
+
+    def _last_index(self) -> int:
+        return (self._start + self._size - 1) % self.capacity
+
+    def extend(self, klines) -> Optional[bool]:
+        """Добавить свечи по возрастанию open_time
+
+        Возвращает True, если появилась новая свеча (предыдущая закрыта),
+        False, если обновлена только последняя, None, если ничего не изменилось.
+        """
+        klines = parse_klines(klines)
+        if len(klines) == 0:
+            return None
+
+        changed = None
+        if self._size:
+            last_time = self._data['open_time'][self._last_index()]
+            klines = klines[klines['open_time'] >= last_time]
+            if len(klines) and klines['open_time'][0] == last_time:
+                self._data[self._last_index()] = klines[0]
+                klines = klines[1:]
+                changed = False
+            if len(klines):
+                changed = True
+        else:
+            changed = False
+
+        if len(klines) > self.capacity:
+            klines = klines[-self.capacity:]
+        count = len(klines)
+        if count:
+            end = (self._start + self._size) % self.capacity
+            first = min(count, self.capacity - end)
+            self._data[end:end + first] = klines[:first]
+            self._data[:count - first] = klines[first:]
+            overflow = max(self._size + count - self.capacity, 0)
+            self._start = (self._start + overflow) % self.capacity
+            self._size = min(self._size + count, self.capacity)
+        return changed
+
+    def append(self, candle) -> Optional[bool]:
+        """Одна свеча в формате REST (список) или строка KLINE_DTYPE"""
+        if isinstance(candle, np.void):
+            return self.extend(np.array([candle], dtype=KLINE_DTYPE))
+        return self.extend([candle])
+
+    def add_trade(self, trade_time: int, price: float, volume: float, interval_ms: int) -> Optional[bool]:
+        """Учесть сделку в свече ее интервала (агрегация потока сделок)"""
+        open_time = trade_time - trade_time % interval_ms
+        if self._size:
+            index = self._last_index()
+            last_time = self._data['open_time'][index]
+            if open_time == last_time:
+                candle = self._data[index]
+                candle['high'] = max(candle['high'], price)
+                candle['low'] = min(candle['low'], price)
+                candle['close'] = price
+                candle['volume'] += volume
+                candle['quote_asset_volume'] += price * volume
+                return False
+            if open_time < last_time:
+                return None
+        return self.append([open_time, price, price, price, price, volume,
+                            open_time + interval_ms, price * volume])
+
+    def to_array(self, limit: int = None) -> np.ndarray:
+        """Свечи по возрастанию времени (копия), последние limit"""
+        size = self._size if limit is None else min(limit, self._size)
+        start = (self._start + self._size - size) % self.capacity
+        end = start + size
+        if end <= self.capacity:
+            return self._data[start:end].copy()
+        return np.concatenate((self._data[start:], self._data[:end - self.capacity]))
+
+    def tolist(self, limit: int = None):
+        """Свечи в формате REST /api/v3/klines (списки чисел)"""
+        return [list(candle) for candle in self.to_array(limit).tolist()]
+
+    def columns(self, limit: int = None) -> Dict[str, np.ndarray]:
+        klines = self.to_array(limit)
+        return {name: klines[name] for name in KLINE_FIELDS}
+
+    def frame(self, limit: int = None) -> pd.DataFrame:
+        """DataFrame для AIAnalysisEngine"""
+        return klines_frame(self.to_array(limit))
+
+
+# Статусы ордеров MEXC; PENDING (в очереди отправки) и REJECTED (не принят) - локальные
+OPEN_ORDER_STATUSES = ('PENDING', 'NEW', 'PARTIALLY_FILLED')
+FINAL_ORDER_STATUSES = ('FILLED', 'CANCELED', 'PARTIALLY_CANCELED', 'REJECTED')
+
+
+class Order:
+    """Ордер бота, идентифицируемый client_order_id (newClientOrderId)"""
+
+    __slots__ = ('client_order_id', 'symbol', 'side', 'order_type', 'quantity', 'price', 'status',
+                 'order_id', 'executed_qty', 'quote_qty', 'error', 'attempts', 'created_at', 'updated_at')
+
+    def __init__(self, client_order_id: str, symbol: str, side: str, order_type: str = 'MARKET',
+                 quantity: float = 0.0, price: float = None, status: str = 'PENDING'):
+        self.client_order_id = client_order_id
+        self.symbol = symbol
+        self.side = side.upper()
+        self.order_type = order_type.upper()
+        self.quantity = float(quantity)
+        self.price = _number(price)
+        self.status = status
+        self.order_id = None
+        self.executed_qty = 0.0
+        self.quote_qty = 0.0
+        self.error = None
+        self.attempts = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in OPEN_ORDER_STATUSES
+
+    @property
+    def avg_price(self) -> Optional[float]:
+        return self.quote_qty / self.executed_qty if self.executed_qty else None
+
+    def to_dict(self) -> Dict:
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data['avg_price'] = self.avg_price
+        return data
+
+    def __repr__(self) -> str:
+        return (f"Order({self.client_order_id} {self.symbol} {self.side} {self.order_type} "
+                f"{self.quantity} {self.status} filled={self.executed_qty})")
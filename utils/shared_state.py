@@ -0,0 +1,161 @@
+import os
+import json
+import math
+import time
+import sqlite3
+import threading
+import logging
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+
+def _clean(value):
+    """Значение для JSON: numpy-числа -> float, NaN/inf -> None"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return value
+    return value if math.isfinite(value) else None
+
+
+class SharedStateStore:
+    """Общее состояние бота для дашборда в SQLite (режим WAL)
+
+    Бот после каждого анализа публикует последнюю рекомендацию символа
+    и строку индикаторов, из которых она получена. Дашборд читает их
+    напрямую, без разбора логов и пересчета индикаторов. WAL позволяет
+    читать базу из процесса дашборда во время записи ботом.
+    """
+
+    def __init__(self, path: str, history: int = 500):
+        self.path = path
+        self.history = history
+        self.logger = logging.getLogger(__name__)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS latest (
+                symbol TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                action TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                price REAL,
+                rsi REAL,
+                reasoning TEXT,
+                analysis TEXT
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS indicators (
+                symbol TEXT NOT NULL,
+                open_time INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (symbol, open_time)
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS metrics (
+                name TEXT PRIMARY KEY,
+                updated_at REAL NOT NULL,
+                data TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+    def publish(self, symbol: str, recommendation: Dict, indicators: Dict = None,
+                open_time: int = None, updated_at: float = None):
+        """Сохранить рекомендацию и строку индикаторов символа одной транзакцией"""
+        analysis = {key: _clean(value) for key, value in (recommendation.get('analysis') or {}).items()}
+        row = (
+            symbol,
+            updated_at or time.time(),
+            recommendation['action'],
+            float(recommendation['confidence']),
+            analysis.get('current_price'),
+            analysis.get('rsi'),
+            recommendation.get('reasoning', ''),
+            json.dumps(analysis)
+        )
+
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO latest VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row)
+            if indicators and open_time is not None:
+                data = json.dumps({key: _clean(value) for key, value in indicators.items()})
+                self.conn.execute("INSERT OR REPLACE INTO indicators VALUES (?, ?, ?)",
+                                  (symbol, int(open_time), data))
+                # Храним только последние history строк символа
+                self.conn.execute("""
+                    DELETE FROM indicators WHERE symbol = ? AND open_time < (
+                        SELECT open_time FROM indicators WHERE symbol = ?
+                        ORDER BY open_time DESC LIMIT 1 OFFSET ?
+                    )
+                """, (symbol, symbol, self.history - 1))
+            self.conn.commit()
+
+    def get_latest(self, symbol: str = None) -> List[Dict]:
+        """Последние рекомендации (всех символов или одного), новые сначала"""
+        query = ("SELECT symbol, updated_at, action, confidence, price, rsi, reasoning, analysis "
+                 "FROM latest")
+        params = []
+        if symbol is not None:
+            query += " WHERE symbol = ?"
+            params.append(symbol)
+        query += " ORDER BY updated_at DESC"
+
+        with self._lock:
+            rows = self.conn.execute(query, params).fetchall()
+
+        return [
+            {
+                'symbol': row[0],
+                'updated_at': row[1],
+                'action': row[2],
+                'confidence': row[3],
+                'price': row[4],
+                'rsi': row[5],
+                'reasoning': row[6],
+                'analysis': json.loads(row[7]) if row[7] else {}
+            }
+            for row in rows
+        ]
+
+    def get_price(self, symbol: str) -> Optional[float]:
+        """Цена из последней рекомендации символа"""
+        latest = self.get_latest(symbol)
+        return latest[0]['price'] if latest else None
+
+    def get_indicator_frame(self, symbol: str, limit: int = 100) -> pd.DataFrame:
+        """Последние limit строк индикаторов символа по возрастанию open_time"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT open_time, data FROM indicators WHERE symbol = ? "
+                "ORDER BY open_time DESC LIMIT ?", (symbol, limit)
+            ).fetchall()
+        rows.reverse()
+        return pd.DataFrame([{'open_time': open_time, **json.loads(data)} for open_time, data in rows])
+
+    def publish_metrics(self, name: str, data: Dict, updated_at: float = None):
+        """Сохранить снимок метрик под именем name (заменяет предыдущий)"""
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO metrics VALUES (?, ?, ?)",
+                              (name, updated_at or time.time(), json.dumps(data, default=_clean)))
+            self.conn.commit()
+
+    def get_metrics(self, name: str) -> Optional[Dict]:
+        """Последний снимок метрик с временем публикации в 'updated_at'"""
+        with self._lock:
+            row = self.conn.execute("SELECT updated_at, data FROM metrics WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return dict(json.loads(row[1]), updated_at=row[0])
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,227 @@
+"""Запуск TradingBot из дашборда в дочернем процессе
+
+Дочерний процесс (python -m web.bot_runner) пишет логи бота только в
+trading_bot.log (и в stderr), а в stdout - события JSON по строке:
+started, cycle (после каждого цикла анализа), stopped, error. Команды
+идут в stdin: "stop" - корректная остановка. Закрытие stdin (дашборд
+завершился) тоже останавливает бота.
+"""
+import io
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+import logging
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BotRunner:
+    """Управление процессом бота со структурированным каналом событий
+
+    Готовность (ready) наступает, как только бот завершил первый цикл
+    анализа, без фиксированных пауз. Строки лога бота через дашборд не
+    проходят - их читают из trading_bot.log.
+    """
+
+    def __init__(self, project_root: str, on_event: Callable[[str, Dict], None] = None):
+        self.project_root = project_root
+        self.on_event = on_event
+        self.command = [sys.executable, '-m', 'web.bot_runner']
+
+        self._process: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._exited = threading.Event()
+        self._state: Dict = self._initial_state()
+
+    @staticmethod
+    def _initial_state() -> Dict:
+        return {
+            'state': 'stopped',
+            'pid': None,
+            'started_at': None,
+            'ready_at': None,
+            'cycle_count': 0,
+            'last_cycle_seconds': None,
+            'last_cycle_at': None,
+            'return_code': None,
+            'error': None
+        }
+
+    def start(self) -> bool:
+        """Запустить процесс бота; False, если он уже работает"""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return False
+
+            self._ready.clear()
+            self._exited.clear()
+            self._state = self._initial_state()
+            self._process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                bufsize=1,
+                cwd=self.project_root
+            )
+            self._state.update(state='starting', pid=self._process.pid, started_at=time.time())
+            self._reader = threading.Thread(target=self._read_events, args=(self._process,),
+                                            name='bot-runner-events', daemon=True)
+            self._reader.start()
+        logger.info(f"🚀 Процесс бота запущен: {self._process.pid}")
+        return True
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """Ждать завершения первого цикла; False, если процесс завершился раньше или истек timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._ready.is_set() and not self._exited.is_set():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self._ready.wait(0.1 if remaining is None else min(remaining, 0.1))
+        return self._ready.is_set()
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """Корректно остановить бота командой stop, при зависании - terminate/kill"""
+        with self._lock:
+            process = self._process
+            if process is None or process.poll() is not None:
+                return False
+            self._state['state'] = 'stopping'
+
+        try:
+            process.stdin.write("stop\n")
+            process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.warning("⚠️ Бот не ответил на stop, отправляем TERMINATE")
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                logger.warning("⚠️ Бот не ответил, отправляем KILL")
+                process.kill()
+                process.wait()
+
+        if self._reader is not None:
+            self._reader.join(timeout=5)
+        return True
+
+    def is_running(self) -> bool:
+        process = self._process
+        return process is not None and process.poll() is None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self.is_running() else None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set() and self.is_running()
+
+    def status(self) -> Dict:
+        with self._lock:
+            return dict(self._state)
+
+    def _read_events(self, process: subprocess.Popen):
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+                event = message.pop('event')
+            except (ValueError, KeyError, AttributeError, TypeError):
+                # Посторонний вывод в stdout (например, из C-библиотек) - не событие
+                continue
+            self._handle(event, message)
+
+        return_code = process.wait()
+        with self._lock:
+            if self._process is process:
+                self._state.update(state='stopped', pid=None, return_code=return_code)
+        self._exited.set()
+        self._emit('exited', {'return_code': return_code})
+
+    def _handle(self, event: str, data: Dict):
+        with self._lock:
+            if event == 'started':
+                self._state['pid'] = data.get('pid', self._state['pid'])
+            elif event == 'cycle':
+                self._state.update(cycle_count=data.get('cycle_count', 0),
+                                   last_cycle_seconds=data.get('seconds'),
+                                   last_cycle_at=data.get('at'))
+                if not self._ready.is_set():
+                    self._state.update(state='running', ready_at=data.get('at'))
+            elif event == 'error':
+                self._state['error'] = data.get('message')
+            elif event == 'stopped':
+                self._state['state'] = 'stopping'
+        if event == 'cycle':
+            self._ready.set()
+        self._emit(event, data)
+
+    def _emit(self, event: str, data: Dict):
+        if self.on_event is None:
+            return
+        try:
+            self.on_event(event, data)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработчика событий бота: {e}")
+
+
+def run_child():
+    """Точка входа дочернего процесса: TradingBot с событиями в stdout"""
+    # stdout - только канал событий; print и StreamHandler бота уходят в stderr
+    channel = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
+    sys.stdout = sys.stderr
+    lock = threading.Lock()
+
+    def emit(event: str, **data):
+        line = json.dumps(dict(data, event=event), default=str)
+        with lock:
+            channel.write(line + "\n")
+
+    sys.path.insert(0, os.getcwd())
+    try:
+        from main import TradingBot, configure_logging
+        configure_logging()
+
+        def on_cycle(bot, seconds):
+            emit('cycle', cycle_count=bot.cycle_count, seconds=round(seconds, 4), at=time.time())
+
+        bot = TradingBot(on_cycle=on_cycle)
+    except Exception as e:
+        emit('error', message=f"Ошибка инициализации бота: {e}")
+        sys.exit(1)
+
+    def read_commands():
+        for command in sys.stdin:
+            if command.strip() == 'stop':
+                break
+        # stop или закрытый stdin (дашборд завершился)
+        logging.info("📨 Команда остановки от дашборда")
+        bot.running = False
+
+    threading.Thread(target=read_commands, name='bot-runner-commands', daemon=True).start()
+    emit('started', pid=os.getpid())
+
+    try:
+        bot.run_continuous()
+    except Exception as e:
+        emit('error', message=str(e))
+        raise
+    finally:
+        emit('stopped', cycle_count=bot.cycle_count)
+
+
+if __name__ == "__main__":
+    run_child()
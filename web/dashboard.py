@@ -1,10 +1,8 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response
 import json
 import os
 import sys
-import subprocess
 import signal
-import threading
 import random
 from datetime import datetime, timedelta
 import pandas as pd
@@ -15,6 +13,18 @@ import time
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(PROJECT_ROOT)
 
+from config.settings import TRADING_SETTINGS, DATA_SETTINGS, LOG_SETTINGS
+from api.candle_store import CandleStore
+from utils.shared_state import SharedStateStore
+from utils.journal import RecommendationJournal
+from utils.models import Recommendation
+from utils.log_tail import LogTailer
+from utils.log_pipeline import setup_logging
+from web.event_stream import EventBroadcaster
+from web.bot_runner import BotRunner
+from utils.metrics import ProcessSampler, render_prometheus
+from ai.backtest import Backtester, load_candles
+
 app = Flask(__name__)
 
 # Абсолютные пути для лог-файлов
@@ -22,38 +32,61 @@ BOT_LOG_FILE = os.path.join(PROJECT_ROOT, 'trading_bot.log')
 DASHBOARD_LOG_FILE = os.path.join(PROJECT_ROOT, 'dashboard.log')
 DEBUG_LOG_FILE = os.path.join(PROJECT_ROOT, 'debug.log')
 
+# Метрики бэктеста пересчитываются не чаще одного раза в N секунд
+BACKTEST_CACHE_SECONDS = 600
+
+# Сколько последних рекомендаций журнала учитывать в долях сигналов и средней уверенности
+PERFORMANCE_SAMPLE = 1000
+
+# Сколько ждать завершения первого цикла бота при запуске из дашборда
+BOT_READY_TIMEOUT = 60
+
 # Создаем файлы если их нет
 for log_file in [BOT_LOG_FILE, DASHBOARD_LOG_FILE, DEBUG_LOG_FILE]:
     if not os.path.exists(log_file):
         open(log_file, 'w', encoding='utf-8').close()
 
-# Настройка логирования для дашборда
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - DASHBOARD - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(DASHBOARD_LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
 logger = logging.getLogger(__name__)
 
 # Дополнительный логгер для отладки
 debug_logger = logging.getLogger('debug')
-debug_logger.setLevel(logging.DEBUG)
-debug_handler = logging.FileHandler(DEBUG_LOG_FILE, encoding='utf-8')
-debug_handler.setFormatter(logging.Formatter('%(asctime)s - DEBUG - %(message)s'))
-debug_logger.addHandler(debug_handler)
+
+
+def configure_logging():
+    """Логирование дашборда (запись в фоновом потоке, см. LOG_SETTINGS)
+
+    Вызывается при запуске дашборда, а не при импорте модуля: импорт
+    (тесты, WSGI-сервер) не заменяет обработчики корневого логгера.
+    """
+    setup_logging('DASHBOARD', DASHBOARD_LOG_FILE, LOG_SETTINGS)
+    setup_logging('DEBUG', DEBUG_LOG_FILE, LOG_SETTINGS, logger=debug_logger, console=False,
+                  fmt='%(asctime)s - DEBUG - %(message)s')
+    debug_logger.setLevel(logging.DEBUG)
+
 
 class TradingBotDashboard:
     def __init__(self):
-        self.bot_process = None
+        # Бот в дочернем процессе: события (запуск, циклы, ошибки) приходят как JSON
+        self.bot_runner = BotRunner(PROJECT_ROOT, on_event=self._on_bot_event)
         self.bot_log_file = BOT_LOG_FILE
         self.dashboard_log_file = DASHBOARD_LOG_FILE
         self.bot_status = "🔴 STOPPED"
         self.last_bot_output = ""
-        self.bot_thread = None
         self.start_time = None
+        self._backtest_cache = None
+        
+        # Рекомендации и индикаторы, опубликованные ботом
+        self.state_store = None
+        if DATA_SETTINGS.get('state_store_path'):
+            self.state_store = SharedStateStore(os.path.join(PROJECT_ROOT, DATA_SETTINGS['state_store_path']))
+        # Замеры процесса бота из /proc (пересоздается при смене pid)
+        self.process_sampler = None
+        
+        # Хвосты лог-файлов для /api/bot_logs (последние 20 строк)
+        self.log_tailer = LogTailer(lines=20)
+        self.journal = None
+        if DATA_SETTINGS.get('journal_path'):
+            self.journal = RecommendationJournal(os.path.join(PROJECT_ROOT, DATA_SETTINGS['journal_path']))
         
         debug_logger.info(f"🔄 Инициализация дашборда")
         debug_logger.info(f"📁 PROJECT_ROOT: {PROJECT_ROOT}")
@@ -63,12 +96,31 @@ class TradingBotDashboard:
         
     def is_bot_running(self):
         """Проверяет, запущен ли бот"""
-        if self.bot_process and self.bot_process.poll() is None:
-            return True
-        return False
+        return self.bot_runner.is_running()
+    
+    def _on_bot_event(self, event, data):
+        """События процесса бота (канал JSON в его stdout)"""
+        if event == 'cycle':
+            self.last_bot_output = f"Цикл #{data.get('cycle_count')} за {data.get('seconds')}с"
+            if data.get('cycle_count') == 1:
+                debug_logger.info(f"✅ Бот готов: первый цикл за {data.get('seconds')}с")
+            return
+        
+        self.last_bot_output = f"{event}: {data}"
+        if event == 'error':
+            logger.error(f"❌ Ошибка бота: {data.get('message')}")
+            debug_logger.error(f"❌ Ошибка бота: {data.get('message')}")
+        elif event == 'exited':
+            return_code = data.get('return_code')
+            if return_code != 0:
+                debug_logger.warning(f"⚠️ Бот завершился с кодом: {return_code}")
+            else:
+                debug_logger.info("✅ Бот корректно завершился")
+        else:
+            debug_logger.info(f"📨 Событие бота: {event} {data}")
     
     def start_bot(self):
-        """Запускает торгового бота в отдельном потоке"""
+        """Запускает торгового бота и ждет завершения его первого цикла"""
         try:
             debug_logger.info("▶️ НАЧАЛО ЗАПУСКА БОТА")
             
@@ -77,77 +129,27 @@ class TradingBotDashboard:
                 return False, "Bot is already running"
             
             self.start_time = datetime.now()
+            self.bot_runner.start()
+            debug_logger.info(f"📊 Процесс бота создан: {self.bot_runner.pid}")
             
-            debug_logger.info("🔄 Подготовка к запуску бота...")
-            
-            def run_bot():
-                try:
-                    debug_logger.info("🚀 ЗАПУСК ПРОЦЕССА БОТА")
-                    
-                    # Запускаем бота с абсолютным путем
-                    bot_script = os.path.join(PROJECT_ROOT, 'main.py')
-                    debug_logger.info(f"📄 Запускаем скрипт: {bot_script}")
-                    
-                    self.bot_process = subprocess.Popen(
-                        [sys.executable, bot_script],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.STDOUT,
-                        text=True,
-                        bufsize=1,
-                        universal_newlines=True,
-                        encoding='utf-8',
-                        cwd=PROJECT_ROOT  # Указываем рабочую директорию
-                    )
-                    
-                    debug_logger.info(f"📊 Процесс бота создан: {self.bot_process.pid}")
-                    
-                    # Читаем вывод в реальном времени
-                    for line in iter(self.bot_process.stdout.readline, ''):
-                        clean_line = line.strip()
-                        self.last_bot_output = clean_line
-                        debug_logger.info(f"BOT: {clean_line}")
-                        
-                        # Также записываем в основной лог
-                        logger.info(f"BOT: {clean_line}")
-                    
-                    self.bot_process.stdout.close()
-                    return_code = self.bot_process.wait()
-                    
-                    debug_logger.info(f"📤 Бот завершился с кодом: {return_code}")
-                    
-                    if return_code != 0:
-                        debug_logger.warning(f"⚠️ Бот завершился с кодом: {return_code}")
-                    else:
-                        debug_logger.info("✅ Бот корректно завершился")
-                        
-                except Exception as e:
-                    error_msg = f"❌ Ошибка в потоке бота: {e}"
-                    logger.error(error_msg)
-                    debug_logger.error(error_msg)
-                finally:
-                    self.bot_process = None
-                    debug_logger.info("🛑 Процесс бота очищен")
-            
-            # Запускаем в отдельном потоке
-            self.bot_thread = threading.Thread(target=run_bot)
-            self.bot_thread.daemon = True
-            self.bot_thread.start()
-            
-            # Ждем немного и проверяем статус
-            time.sleep(3)
-            
-            if self.is_bot_running():
+            if self.bot_runner.wait_ready(BOT_READY_TIMEOUT):
                 success_msg = "✅ Торговый бот успешно запущен"
-                logger.info(success_msg)
-                debug_logger.info(success_msg)
-                self.bot_status = "🟢 RUNNING"
-                return True, success_msg
+            elif self.is_bot_running():
+                success_msg = "✅ Торговый бот запущен, первый цикл анализа еще выполняется"
             else:
-                error_msg = "❌ Не удалось запустить бот"
+                status = self.bot_runner.status()
+                error_msg = f"❌ Не удалось запустить бот (код {status['return_code']})"
+                if status['error']:
+                    error_msg += f": {status['error']}"
                 logger.error(error_msg)
                 debug_logger.error(error_msg)
                 return False, error_msg
             
+            logger.info(success_msg)
+            debug_logger.info(success_msg)
+            self.bot_status = "🟢 RUNNING"
+            return True, success_msg
+            
         except Exception as e:
             error_msg = f"❌ Ошибка при запуске бота: {e}"
             logger.error(error_msg)
@@ -160,19 +162,9 @@ class TradingBotDashboard:
             debug_logger.info("🛑 ПОПЫТКА ОСТАНОВКИ БОТА")
             
             if self.is_bot_running():
-                debug_logger.info(f"📤 Отправляем TERMINATE процессу {self.bot_process.pid}")
-                self.bot_process.terminate()
+                debug_logger.info(f"📤 Отправляем stop процессу {self.bot_runner.pid}")
+                self.bot_runner.stop(timeout=10)
                 
-                try:
-                    self.bot_process.wait(timeout=10)
-                    debug_logger.info("✅ Бот корректно завершился")
-                except subprocess.TimeoutExpired:
-                    debug_logger.warning("⚠️ Бот не ответил, отправляем KILL")
-                    self.bot_process.kill()
-                    self.bot_process.wait()
-                    debug_logger.info("✅ Бот принудительно остановлен")
-                
-                self.bot_process = None
                 self.bot_status = "🔴 STOPPED"
                 logger.info("🛑 Бот остановлен")
                 return True, "Trading bot stopped successfully"
@@ -209,21 +201,10 @@ class TradingBotDashboard:
     def get_detailed_logs(self):
         """Получить детальные логи работы"""
         try:
-            # Читаем логи из файлов
-            bot_logs = []
-            if os.path.exists(self.bot_log_file):
-                with open(self.bot_log_file, 'r', encoding='utf-8') as f:
-                    bot_logs = f.readlines()[-20:]  # Последние 20 строк
-            
-            dashboard_logs = []
-            if os.path.exists(self.dashboard_log_file):
-                with open(self.dashboard_log_file, 'r', encoding='utf-8') as f:
-                    dashboard_logs = f.readlines()[-20:]
-            
-            debug_logs = []
-            if os.path.exists(DEBUG_LOG_FILE):
-                with open(DEBUG_LOG_FILE, 'r', encoding='utf-8') as f:
-                    debug_logs = f.readlines()[-20:]
+            # Последние 20 строк каждого лога: из кэша, пока файл не изменился
+            bot_logs = self.log_tailer.tail(self.bot_log_file)
+            dashboard_logs = self.log_tailer.tail(self.dashboard_log_file)
+            debug_logs = self.log_tailer.tail(DEBUG_LOG_FILE)
             
             logs_info = {
                 'status': self.bot_status,
@@ -245,69 +226,224 @@ class TradingBotDashboard:
             return {'error': str(e)}
 
     def get_current_price(self):
+        """Цена основного символа из последней рекомендации бота"""
+        try:
+            if self.state_store:
+                price = self.state_store.get_price(TRADING_SETTINGS['symbols'][0])
+                if price is not None:
+                    return price
+        except Exception as e:
+            debug_logger.error(f"❌ Ошибка чтения цены: {e}")
         return 121812.54
+    
+    def get_symbol_states(self):
+        """Последняя рекомендация по каждому символу из общего хранилища"""
+        try:
+            if self.state_store:
+                return [self._format_state(state) for state in self.state_store.get_latest()]
+        except Exception as e:
+            debug_logger.error(f"❌ Ошибка чтения состояния бота: {e}")
+        return []
+    
+    def _format_state(self, state):
+        recommendation = Recommendation.from_record(state)
+        return self._format_recommendation(recommendation, analysis=recommendation.analysis)
+    
+    def _format_recommendation(self, recommendation, **extra):
+        """Запись рекомендации для JSON дашборда"""
+        record = recommendation.to_record()
+        record.pop('ts', None)
+        record['timeframe'] = '30min'
+        record.update(extra)
+        return record
 
     def get_performance_stats(self):
-        return {
-            'total_recommendations': 50,
-            'buy_count': 16,
-            'sell_count': 11,
-            'hold_count': 23,
-            'buy_percentage': 32.0,
-            'sell_percentage': 22.0,
-            'hold_percentage': 46.0,
-            'avg_confidence': 0.648,
-            'win_rate': 0.688,
-            'total_trades': 50,
-            'sharpe_ratio': 1.25,
-            'max_drawdown': 0.129
+        """Доли сигналов и средняя уверенность - по журналу рекомендаций бота,
+        win_rate/total_trades/sharpe_ratio/max_drawdown - из бэктеста (None без свечей)"""
+        stats = {
+            'total_recommendations': 0,
+            'buy_count': 0,
+            'sell_count': 0,
+            'hold_count': 0,
+            'buy_percentage': 0.0,
+            'sell_percentage': 0.0,
+            'hold_percentage': 0.0,
+            'avg_confidence': 0.0,
+            'win_rate': None,
+            'total_trades': None,
+            'sharpe_ratio': None,
+            'max_drawdown': None
         }
+        stats.update(self._get_journal_stats())
+        stats.update(self._get_backtest_stats())
+        return stats
+    
+    def _get_journal_stats(self):
+        """Счетчики BUY/SELL/HOLD и средняя уверенность по последним PERFORMANCE_SAMPLE записям журнала"""
+        if self.journal is None:
+            return {}
+        try:
+            entries = self.journal.read_latest(PERFORMANCE_SAMPLE)
+            if not entries:
+                return {}
+            counts = {'BUY': 0, 'SELL': 0, 'HOLD': 0}
+            for entry in entries:
+                if entry.get('action') in counts:
+                    counts[entry['action']] += 1
+            stats = {'total_recommendations': len(self.journal),
+                     'avg_confidence': round(sum(float(entry.get('confidence') or 0.0) for entry in entries)
+                                             / len(entries), 3)}
+            for action, count in counts.items():
+                stats[f'{action.lower()}_count'] = count
+                stats[f'{action.lower()}_percentage'] = round(count / len(entries) * 100, 1)
+            return stats
+        except Exception as e:
+            debug_logger.error(f"❌ Ошибка чтения журнала для статистики: {e}")
+            return {}
+    
+    def _get_backtest_stats(self):
+        """win_rate/sharpe_ratio/max_drawdown из бэктеста по локальным свечам"""
+        now = time.time()
+        if self._backtest_cache and now - self._backtest_cache[0] < BACKTEST_CACHE_SECONDS:
+            return self._backtest_cache[1]
+        
+        stats = {}
+        try:
+            store_path = DATA_SETTINGS.get('candle_store_path')
+            if store_path and os.path.exists(os.path.join(PROJECT_ROOT, store_path)):
+                store = CandleStore(os.path.join(PROJECT_ROOT, store_path))
+                try:
+                    candles = load_candles(store, TRADING_SETTINGS['symbols'][0], '30m')
+                finally:
+                    store.close()
+                
+                if len(candles) >= 50:
+                    result = Backtester(interval='30m').run(candles)
+                    stats = {
+                        'win_rate': round(result['win_rate'], 3),
+                        'total_trades': result['total_trades'],
+                        'sharpe_ratio': round(result['sharpe_ratio'], 2),
+                        'max_drawdown': round(result['max_drawdown'], 3)
+                    }
+                    debug_logger.info(f"📊 Бэктест по {result['bars']} свечам: {stats}")
+        except Exception as e:
+            debug_logger.error(f"❌ Ошибка бэктеста: {e}")
+        
+        self._backtest_cache = (now, stats)
+        return stats
+
+    def get_bot_metrics(self):
+        """Метрики, опубликованные ботом: вызовы API, ошибки, задержки, длительности циклов"""
+        try:
+            if self.state_store:
+                return self.state_store.get_metrics('bot') or {}
+        except Exception as e:
+            debug_logger.error(f"❌ Ошибка чтения метрик бота: {e}")
+        return {}
 
     def get_trading_metrics(self):
+        """Метрики API и циклов бота; P&L и активные сделки - из его книги ордеров (None, пока бот ее не опубликовал)"""
+        bot_metrics = self.get_bot_metrics()
+        api = bot_metrics.get('api', {})
+        positions = (bot_metrics.get('orders') or {}).get('positions')
+        total_pl = active_trades = None
+        if positions is not None:
+            total_pl = round(sum(position.get('realized_pnl') or 0.0 for position in positions.values()), 2)
+            active_trades = sum(1 for position in positions.values() if position.get('quantity'))
         return {
-            'total_pl': 1084.29,
-            'active_trades': 1,
-            'api_calls': 126,
-            'error_rate': 0.023
+            'total_pl': total_pl,
+            'active_trades': active_trades,
+            'api_calls': api.get('calls', 0),
+            'api_errors': api.get('errors', 0),
+            'error_rate': api.get('error_rate', 0.0),
+            'api_latency': bot_metrics.get('api_latency', {}),
+            'cycle_seconds': bot_metrics.get('cycle_seconds', {}),
+            'cycle_history': bot_metrics.get('cycle_history', [])
         }
 
+    def get_prometheus_metrics(self):
+        """Метрики бота в текстовом формате Prometheus (формируется только при запросе)"""
+        snapshot = {}
+        age = None
+        try:
+            if self.state_store:
+                snapshot = self.state_store.get_metrics('prometheus') or {}
+                updated_at = snapshot.pop('updated_at', None)
+                if updated_at is not None:
+                    age = max(time.time() - updated_at, 0.0)
+        except Exception as e:
+            debug_logger.error(f"❌ Ошибка чтения метрик Prometheus: {e}")
+        
+        snapshot['trading_bot_up'] = {
+            'type': 'gauge',
+            'help': 'Whether the bot process is running',
+            'labels': [],
+            'samples': [[[], 1 if self.get_bot_pid() else 0]]
+        }
+        if age is not None:
+            snapshot['trading_bot_metrics_age_seconds'] = {
+                'type': 'gauge',
+                'help': 'Seconds since the bot last published metrics',
+                'labels': [],
+                'samples': [[[], round(age, 3)]]
+            }
+        return render_prometheus(snapshot)
+
+    def get_bot_pid(self):
+        """pid процесса бота: запущенного дашбордом или опубликованный самим ботом"""
+        if self.bot_runner.is_running():
+            return self.bot_runner.pid
+        pid = self.get_bot_metrics().get('pid')
+        if pid and os.path.exists(f'/proc/{pid}'):
+            return pid
+        return None
+
     def get_system_info(self):
-        return {
-            'cpu_usage': f"{random.randint(5, 25)}%",
-            'memory_usage': f"{random.randint(30, 70)}%",
+        info = {
+            'cpu_usage': 'N/A',
+            'memory_usage': 'N/A',
             'bot_uptime': self.get_bot_uptime(),
-            'status': self.get_bot_status()
+            'status': self.get_bot_status(),
+            'process': {},
+            'history': {}
+        }
+        
+        pid = self.get_bot_pid()
+        if pid is None or not ProcessSampler.available():
+            return info
+        
+        if self.process_sampler is None or self.process_sampler.pid != pid:
+            self.process_sampler = ProcessSampler(pid)
+        sample = self.process_sampler.sample()
+        if sample:
+            info['cpu_usage'] = f"{sample['cpu_percent']}%"
+            if sample['memory_percent'] is not None:
+                info['memory_usage'] = f"{sample['memory_percent']}%"
+            info['process'] = sample
+            info['history'] = {name: buffer.values() for name, buffer in self.process_sampler.history.items()}
+        return info
+
+    def get_status_snapshot(self):
+        """Данные /api/status (и событий status в /api/stream)"""
+        return {
+            'status': self.get_bot_status(),
+            'current_price': self.get_current_price(),
+            'last_update': datetime.now().isoformat(),
+            'performance': self.get_performance_stats(),
+            'trading_metrics': self.get_trading_metrics(),
+            'system_info': self.get_system_info(),
+            'symbols': self.get_symbol_states()
         }
 
     def get_recent_recommendations(self, limit=10):
-        """Получить последние рекомендации с реальными данными из логов бота"""
+        """Получить последние рекомендации из журнала бота (чтение только последних limit записей)"""
         try:
             recommendations = []
+            if self.journal is not None:
+                for entry in self.journal.read_latest(limit):
+                    recommendations.append(self._format_recommendation(Recommendation.from_record(entry)))
             
-            # Если бот запущен, пытаемся получить реальные данные из логов
-            if self.is_bot_running() and os.path.exists(self.bot_log_file):
-                with open(self.bot_log_file, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                
-                # Ищем последние записи анализа в логах
-                analysis_lines = []
-                for line in reversed(lines[-100:]):  # Проверяем последние 100 строк
-                    if 'ANALYSIS BTCUSDT:' in line:
-                        analysis_lines = []
-                        analysis_lines.append(line)
-                    elif analysis_lines and any(keyword in line for keyword in ['Action:', 'Confidence:', 'Price:', 'RSI:', 'Reasoning:']):
-                        analysis_lines.append(line)
-                    elif analysis_lines and line.strip() == '':
-                        # Конец записи анализа
-                        rec = self._parse_analysis_from_logs(analysis_lines)
-                        if rec:
-                            recommendations.append(rec)
-                        analysis_lines = []
-                        
-                        if len(recommendations) >= limit:
-                            break
-            
-            # Если не нашли реальных данных или их недостаточно, используем демо-данные
+            # Если бот еще ничего не опубликовал или данных недостаточно, используем демо-данные
             if len(recommendations) < limit:
                 demo_count = limit - len(recommendations)
                 demo_recommendations = self._generate_demo_recommendations(demo_count)
@@ -322,46 +458,6 @@ class TradingBotDashboard:
             debug_logger.error(f"❌ Ошибка получения рекомендаций: {e}")
             return self._generate_demo_recommendations(limit)
 
-    def _parse_analysis_from_logs(self, analysis_lines):
-        """Парсинг рекомендаций из логов бота"""
-        try:
-            rec = {
-                'symbol': 'BTCUSDT',
-                'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            
-            for line in analysis_lines:
-                line = line.strip()
-                if line.startswith('Action:'):
-                    rec['action'] = line.split('Action:')[1].strip()
-                elif line.startswith('Confidence:'):
-                    rec['confidence'] = float(line.split('Confidence:')[1].strip())
-                elif line.startswith('Price:'):
-                    rec['price'] = float(line.split('Price:')[1].strip())
-                elif line.startswith('RSI:'):
-                    rec['rsi'] = float(line.split('RSI:')[1].strip())
-                elif line.startswith('Reasoning:'):
-                    rec['reasoning'] = line.split('Reasoning:')[1].strip()
-                elif 'ANALYSIS BTCUSDT:' in line:
-                    # Извлекаем эмодзи если есть
-                    if '🟢' in line:
-                        rec['action'] = 'BUY'
-                    elif '🔴' in line:
-                        rec['action'] = 'SELL'
-                    elif '🟡' in line:
-                        rec['action'] = 'HOLD'
-            
-            # Проверяем, что все необходимые поля есть
-            required_fields = ['action', 'confidence', 'price']
-            if all(field in rec for field in required_fields):
-                return rec
-            else:
-                return None
-                
-        except Exception as e:
-            debug_logger.error(f"❌ Ошибка парсинга логов: {e}")
-            return None
-
     def _generate_demo_recommendations(self, count):
         """Генерация демо-рекомендаций"""
         base_price = 121812.54
@@ -386,23 +482,26 @@ class TradingBotDashboard:
                 reasoning = "Рынок в нейтральной зоне"
                 strength = "weak"
             
-            recommendations.append({
-                'timestamp': (datetime.now() - timedelta(minutes=i*30)).strftime('%Y-%m-%d %H:%M:%S'),
-                'symbol': 'BTCUSDT',
-                'action': action,
-                'confidence': confidence,
-                'price': base_price + random.uniform(-2000, 2000),
-                'rsi': rsi,
-                'reasoning': reasoning,
-                'strength': strength,
-                'timeframe': '30min'
-            })
+            recommendation = Recommendation(
+                action, confidence, price=base_price + random.uniform(-2000, 2000), rsi=rsi,
+                reasoning=reasoning, symbol='BTCUSDT',
+                timestamp=(datetime.now() - timedelta(minutes=i*30)).timestamp()
+            )
+            recommendations.append(self._format_recommendation(recommendation, strength=strength))
         
         return recommendations
 
 # Создаем экземпляр дашборда
 dashboard = TradingBotDashboard()
 
+# Общий источник push-событий для всех открытых вкладок
+event_broadcaster = EventBroadcaster(
+    dashboard.get_status_snapshot,
+    journal=dashboard.journal,
+    log_tailer=dashboard.log_tailer,
+    log_file=BOT_LOG_FILE
+)
+
 @app.route('/')
 def index():
     """Главная страница дашборда"""
@@ -425,20 +524,20 @@ def index():
 def api_status():
     """API endpoint для статуса"""
     debug_logger.debug("📊 Запрос статуса API")
-    status = dashboard.get_bot_status()
-    current_price = dashboard.get_current_price()
-    stats = dashboard.get_performance_stats()
-    trading_metrics = dashboard.get_trading_metrics()
-    system_info = dashboard.get_system_info()
-    
-    return jsonify({
-        'status': status,
-        'current_price': current_price,
-        'last_update': datetime.now().isoformat(),
-        'performance': stats,
-        'trading_metrics': trading_metrics,
-        'system_info': system_info
-    })
+    return jsonify(dashboard.get_status_snapshot())
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events: изменения статуса, новые рекомендации и строки лога"""
+    debug_logger.info("📡 Подключен клиент потока событий")
+    client = event_broadcaster.subscribe()
+    return Response(event_broadcaster.stream(client), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/metrics')
+def metrics():
+    """Метрики для Prometheus (text exposition format 0.0.4)"""
+    return Response(dashboard.get_prometheus_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/api/start_bot', methods=['POST'])
 def start_bot():
@@ -488,8 +587,7 @@ def api_debug_info():
     debug_info = {
         'dashboard_status': dashboard.bot_status,
         'process_running': dashboard.is_bot_running(),
-        'bot_process': str(dashboard.bot_process),
-        'bot_thread': str(dashboard.bot_thread),
+        'bot_runner': dashboard.bot_runner.status(),
         'start_time': str(dashboard.start_time),
         'last_output': dashboard.last_bot_output,
         'project_root': PROJECT_ROOT,
@@ -562,6 +660,8 @@ if __name__ == '__main__':
     print("Open http://localhost:5000 in your browser")
     print("========================================")
     
+    configure_logging()
+    
     # Записываем информацию о запуске
     debug_logger.info("🚀 ДАШБОРД ЗАПУЩЕН")
     debug_logger.info(f"📁 PROJECT_ROOT: {PROJECT_ROOT}")
@@ -0,0 +1,131 @@
+import json
+import time
+import queue
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+
+
+def format_event(event: str, data) -> str:
+    """Сообщение в формате Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+class EventBroadcaster:
+    """Один источник событий дашборда, раздаваемый всем SSE-клиентам
+
+    Фоновый поток раз в interval секунд снимает статус, проверяет журнал
+    рекомендаций и дописанные строки лога бота и кладет только изменения
+    в очередь каждого подписчика. Поток работает, пока есть подписчики,
+    поэтому нагрузка не зависит от числа открытых вкладок. Медленный
+    клиент теряет самые старые сообщения, а не тормозит остальных.
+    """
+
+    def __init__(self, status_fn: Callable[[], Dict], journal=None, log_tailer=None,
+                 log_file: str = None, interval: float = 1.0, queue_size: int = 100):
+        self.status_fn = status_fn
+        self.journal = journal
+        self.log_tailer = log_tailer
+        self.log_file = log_file
+        self.interval = interval
+        self.queue_size = queue_size
+        self.logger = logging.getLogger(__name__)
+
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+        self._status: Dict = {}
+        self._journal_count = None
+        self._log_cursor = None
+
+    def subscribe(self) -> queue.Queue:
+        """Новая очередь клиента; первым сообщением идет полный статус"""
+        client = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.append(client)
+            if self._thread is None or not self._thread.is_alive():
+                # Точка отсчета берется сразу, чтобы не потерять события во время первого опроса
+                self._status = {}
+                self._mark_position()
+                self._thread = threading.Thread(target=self._run, name='dashboard-events', daemon=True)
+                self._thread.start()
+            elif self._status:
+                client.put_nowait(format_event('status', self._status))
+        return client
+
+    def unsubscribe(self, client: queue.Queue):
+        with self._lock:
+            if client in self._subscribers:
+                self._subscribers.remove(client)
+
+    def stream(self, client: queue.Queue, keepalive: float = 15.0):
+        """Генератор SSE для ответа Flask"""
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    yield client.get(timeout=keepalive)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(client)
+
+    def publish(self, event: str, data):
+        message = format_event(event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for client in subscribers:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                try:
+                    client.get_nowait()
+                except queue.Empty:
+                    pass
+                try:
+                    client.put_nowait(message)
+                except queue.Full:
+                    pass
+
+    def poll(self):
+        """Один шаг источника: изменения статуса, новые рекомендации и строки лога"""
+        status = self.status_fn()
+        delta = {key: value for key, value in status.items()
+                 if key != 'last_update' and self._status.get(key) != value}
+        if delta:
+            self._status = status
+            delta['last_update'] = status.get('last_update')
+            self.publish('status', delta)
+
+        if self.journal is not None:
+            count = len(self.journal)
+            if self._journal_count is not None and count > self._journal_count:
+                for entry in reversed(self.journal.read_latest(min(count - self._journal_count, 10))):
+                    self.publish('recommendation', entry)
+            self._journal_count = count
+
+        if self.log_tailer is not None and self.log_file:
+            lines, self._log_cursor = self.log_tailer.read_new(self.log_file, self._log_cursor)
+            if lines:
+                self.publish('log', lines)
+
+    def _mark_position(self):
+        if self.journal is not None:
+            self._journal_count = len(self.journal)
+        if self.log_tailer is not None and self.log_file:
+            self._log_cursor = self.log_tailer.read_new(self.log_file)[1]
+
+    def _run(self):
+        self.logger.info("📡 Запущен источник событий дашборда")
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    break
+            try:
+                self.poll()
+            except Exception as e:
+                self.logger.error(f"❌ Ошибка источника событий: {e}")
+            time.sleep(self.interval)
+        self.logger.info("📡 Источник событий дашборда остановлен: нет клиентов")